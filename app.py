@@ -1,24 +1,25 @@
-from flask import Flask, render_template, request, jsonify, session, redirect, url_for, flash
+from flask import Flask, render_template, request, jsonify, session
 from flask_login import LoginManager, login_required, current_user
-from flask_migrate import Migrate
 from flask_wtf.csrf import CSRFProtect
 from flask_cors import CORS
 import os
 from dotenv import load_dotenv
-import openai
-import requests
-from datetime import datetime, timedelta
+from datetime import datetime
 import json
-from werkzeug.utils import secure_filename
-import base64
-from openai import OpenAI
 import logging
 from auth import auth
 from outfits import outfits
-from models import db, User, Outfit, Chat, RecommendationFeedback
+from models import db, User, bump_content_version
+from config import config
+from utils.db_utils import engine_options, configure_sqlite, instrument_engine
+from utils.server_session import init_session
+from utils import llm_client, weather_utils
 from routes.chat import chat_bp
 from routes.ai_data import ai_data_bp
-from utils.weather_utils import get_weather_data
+from routes.metrics import metrics_bp
+from routes.profiler import profiler_bp
+from routes.traffic import traffic_bp
+from utils.weather_utils import get_weather_data, get_location_weather
 from weather_recommendations import weather_recommendations
 
 # Configure logging
@@ -28,35 +29,7 @@ logger = logging.getLogger(__name__)
 # Load environment variables
 load_dotenv()
 
-app = Flask(__name__)
-# Configure CORS to be more permissive during development
-CORS(app, resources={r"/*": {"origins": "*"}}, supports_credentials=True)
-app.config['SECRET_KEY'] = os.getenv('SECRET_KEY', 'your-secret-key')
-app.config['SQLALCHEMY_DATABASE_URI'] = 'sqlite:///outfit_finder.db'
-app.config['SQLALCHEMY_TRACK_MODIFICATIONS'] = False
-app.config['UPLOAD_FOLDER'] = os.path.join('static', 'uploads')
-app.config['MAX_CONTENT_LENGTH'] = 16 * 1024 * 1024  # 16MB max file size
-
-# Create uploads directory if it doesn't exist
-os.makedirs(app.config['UPLOAD_FOLDER'], exist_ok=True)
-
-# Initialize extensions
-db.init_app(app)
-migrate = Migrate(app, db)
-csrf = CSRFProtect(app)
-login_manager = LoginManager()
-login_manager.init_app(app)
-login_manager.login_view = 'auth.login'
-
-# Register blueprints
-app.register_blueprint(auth)
-app.register_blueprint(outfits)
-app.register_blueprint(chat_bp)
-app.register_blueprint(ai_data_bp)
-app.register_blueprint(weather_recommendations)
-
-# Configure OpenAI
-client = OpenAI(api_key=os.getenv('OPENAI_API_KEY'))
+# OpenAI clients are shared through utils.llm_client
 print("OpenAI API Key configured:", "Yes" if os.getenv('OPENAI_API_KEY') else "No")
 
 # Weather API configuration
@@ -70,37 +43,23 @@ class CustomJSONEncoder(json.JSONEncoder):
             return obj.isoformat()
         return super().default(obj)
 
-app.json_encoder = CustomJSONEncoder
+csrf = CSRFProtect()
+login_manager = LoginManager()
+login_manager.login_view = 'auth.login'
 
 @login_manager.user_loader
 def load_user(user_id):
     return User.query.get(int(user_id))
 
 # Routes
-@app.route('/')
 def index():
     try:
         # Get location from session or default to None
         location = session.get('location')
-        weather_data = session.get('weather_data')
-        weather_timestamp = session.get('weather_timestamp')
-        
         #logger.info(f"[DEBUG] Session data - Location: {location}")
-        #logger.info(f"[DEBUG] Session data - Weather data: {weather_data}")
-        #logger.info(f"[DEBUG] Session data - Weather timestamp: {weather_timestamp}")
-
-        # If we have a location but no weather data, or weather data is old, fetch new weather
-        if location and (not weather_data or not weather_timestamp or 
-           (datetime.utcnow() - datetime.fromisoformat(weather_timestamp)) > timedelta(minutes=30)):
-            logger.info(f"[WEATHER CACHE MISS] Fetching new weather data for {location}")
-            weather_data = get_weather_data(city=location)
-            if weather_data:
-                session['weather_data'] = weather_data
-                session['weather_timestamp'] = datetime.utcnow().isoformat()
-                session.modified = True
-                logger.info(f"[DEBUG] Updated session with new weather data: {weather_data}")
-        elif weather_data:
-            logger.info(f"[WEATHER CACHE HIT] Using cached weather data: {weather_data}")
+
+        # The shared weather cache refreshes the weather every WEATHER_CACHE_TTL seconds
+        weather_data = get_location_weather(location)
 
         #logger.info(f"[DEBUG] Final weather data being sent to template: {weather_data}")
         return render_template('index.html',
@@ -111,7 +70,6 @@ def index():
         logger.error(f"Error in index route: {str(e)}")
         return render_template('index.html', current_location=location)
 
-@app.route('/preferences', methods=['POST'])
 @login_required
 def save_preferences(): 
     try:
@@ -144,6 +102,7 @@ def save_preferences():
         # If 'other' is not checked, do not save custom_style
 
         current_user.preferences = preferences
+        bump_content_version(current_user.id)
         try:
             db.session.commit()
             print("Successfully saved preferences to database")
@@ -159,7 +118,6 @@ def save_preferences():
     finally:
         print("=== Preferences Save Request End ===")
 
-@app.route('/update-location', methods=['POST'])
 def update_location():
     try:
         #logger.info("[UPDATE LOCATION] Starting location update")
@@ -173,7 +131,7 @@ def update_location():
         
         #logger.info(f"[UPDATE LOCATION] Fetching weather data for {location}")
         
-        # Fetch weather data first
+        # Fetch weather data first; it is cached under the location for later requests
         weather_data = get_weather_data(city=location)
         if not weather_data:
             logger.error(f"[UPDATE LOCATION] Failed to get weather data for {location}")
@@ -181,16 +139,10 @@ def update_location():
             
         #logger.info(f"[UPDATE LOCATION] Successfully got weather data: {weather_data}")
             
-        # Update session data
+        # Only the location goes in the session
         session['location'] = location
-        session['weather_data'] = weather_data
-        session['weather_timestamp'] = datetime.utcnow().isoformat()
-        
-        # Force session to be saved
-        session.modified = True
         
         #logger.info(f"[UPDATE LOCATION] Successfully updated session with location: {location}")
-        #logger.info(f"[UPDATE LOCATION] Weather data cached: {weather_data}")
         
         return jsonify({
             'success': True, 
@@ -201,14 +153,53 @@ def update_location():
         logger.error(f"[UPDATE LOCATION] Error updating location: {str(e)}")
         return jsonify({'error': str(e)}), 500
 
-@app.after_request
-def after_request(response):
-    print(f"Response headers: {response.headers}")  # Debug print
-    return response
+def create_app(config_name=None):
+    """Build the app from config[config_name] (FLASK_CONFIG, or 'default')."""
+    config_name = config_name or os.getenv('FLASK_CONFIG', 'default')
+    app = Flask(__name__)
+    app.config.from_object(config[config_name])
+    app.config['SQLALCHEMY_ENGINE_OPTIONS'] = engine_options(app.config)
+    config[config_name].init_app(app)
+    # Configure CORS to be more permissive during development
+    CORS(app, resources={r"/*": {"origins": "*"}}, supports_credentials=True)
+    app.json_encoder = CustomJSONEncoder
+    init_session(app)
+    # OpenAI and weather clients, caches and limits follow this app's config
+    llm_client.init_app(app)
+    weather_utils.init_app(app)
+
+    # Initialize extensions
+    db.init_app(app)
+    if os.getenv('FLASK_RUN_FROM_CLI'):
+        # Only the `flask db` commands need Flask-Migrate, and importing
+        # Alembic is a large part of startup time
+        from flask_migrate import Migrate
+        Migrate(app, db)
+    csrf.init_app(app)
+    login_manager.init_app(app)
+    with app.app_context():
+        if db.engine.dialect.name == 'sqlite':
+            configure_sqlite(db.engine, app.config)
+        instrument_engine(db.engine)
+
+    # Register blueprints
+    app.register_blueprint(auth)
+    app.register_blueprint(outfits)
+    app.register_blueprint(chat_bp)
+    app.register_blueprint(ai_data_bp)
+    app.register_blueprint(weather_recommendations)
+    app.register_blueprint(metrics_bp)
+    app.register_blueprint(profiler_bp)
+    app.register_blueprint(traffic_bp)
+
+    app.add_url_rule('/', 'index', index)
+    app.add_url_rule('/preferences', 'save_preferences', save_preferences, methods=['POST'])
+    app.add_url_rule('/update-location', 'update_location', update_location, methods=['POST'])
+    return app
+
+app = create_app()
 
 if __name__ == '__main__':
     with app.app_context():
         db.create_all()
-        # Create uploads directory if it doesn't exist
-        os.makedirs(app.config['UPLOAD_FOLDER'], exist_ok=True)
     app.run(debug=True, reloader_type='stat') 
\ No newline at end of file
@@ -2,6 +2,7 @@ from flask import Blueprint, render_template, request, redirect, url_for, flash
 from flask_login import login_user, login_required, logout_user, current_user
 from werkzeug.security import generate_password_hash, check_password_hash
 from models import db, User
+from utils.server_session import regenerate_session
 
 auth = Blueprint('auth', __name__)
 
@@ -14,6 +15,7 @@ def login():
         
         if user and user.check_password(password):
             login_user(user)
+            regenerate_session()
             return redirect(url_for('index'))
         flash('Invalid username or password')
     return render_template('login.html')
@@ -35,6 +37,7 @@ def register():
         db.session.commit()
         
         login_user(user)
+        regenerate_session()
         return redirect(url_for('index'))
     return render_template('register.html')
 
@@ -42,4 +45,5 @@ def register():
 @login_required
 def logout():
     logout_user()
+    regenerate_session()
     return redirect(url_for('index')) 
\ No newline at end of file
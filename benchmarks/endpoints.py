@@ -0,0 +1,471 @@
+"""Throughput and latency of the main endpoints, offline, against seeded wardrobes.
+
+Starts the stand-in OpenAI and OpenWeatherMap servers from benchmarks.stubs,
+then for each wardrobe size serves the app from a child process with a fresh
+SQLite database seeded with that many clothing items, and drives /my-outfits,
+/update-location, /get-weather-recommendations, /chat (plain and streamed)
+and /upload with concurrent logged-in clients. Per endpoint it reports
+throughput, p50/p95/p99 latency, SQL statements per request (from /metrics)
+and OpenAI/weather calls per request (from the stubs), as JSON that can be
+diffed between commits:
+
+    python -m benchmarks.endpoints --sizes 50,500,2000 --output bench.json
+    python -m benchmarks.endpoints --compare bench.json
+
+CSRF protection is turned off in the benchmarked app so the clients can post
+without scraping tokens. /upload is timed until its background job is done.
+
+--check-queries skips the load test and instead fails (exit status 1) when
+/my-outfits or the /chat context building runs more SQL statements than
+QUERY_BUDGETS allows at any of the --sizes:
+
+    python -m benchmarks.endpoints --check-queries
+"""
+import argparse
+import io
+import json
+import os
+import random
+import re
+import shutil
+import statistics
+import subprocess
+import sys
+import tempfile
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+SCENARIOS = ('my_outfits', 'update_location', 'weather_recommendations', 'chat', 'chat_stream', 'upload')
+
+# Flask endpoint each scenario's SQL statements are read for in /metrics
+SCENARIO_ENDPOINTS = {
+    'my_outfits': 'outfits.my_outfits',
+    'update_location': 'update_location',
+    'weather_recommendations': 'weather_recommendations.get_recommendations',
+    'chat': 'chat.chat_message',
+    'chat_stream': 'chat.chat_message',
+    'upload': 'outfits.upload_clothing',
+}
+
+# Seeded outfits are made of one item per slot, so the outfit engine can combine them
+SEED_OUTFIT = (('t-shirt', 'cotton'), ('jeans', 'denim'), ('sneakers', 'leather'), ('jacket', 'wool'))
+SEED_COLORS = ('black', 'white', 'navy', 'grey', 'olive', 'red', 'beige')
+
+CHAT_QUESTIONS = (
+    'What should I wear to a dinner tonight?',
+    'Which jacket goes with my black jeans?',
+    'Put together something casual for the weekend',
+    'What can I wear if it rains?',
+)
+
+USERNAME = 'bench'
+PASSWORD = 'bench-password'
+LOCATION = 'Benchmark City'
+
+UPLOAD_TIMEOUT = 120  # Seconds to wait for an upload job
+
+# Most SQL statements each may run, whatever the wardrobe size; going over
+# usually means a per-item query (N+1) crept in
+QUERY_BUDGETS = {
+    'my_outfits': 5,
+    'chat_context': 5,
+}
+
+
+def bench_username(index):
+    return USERNAME if index == 0 else f"{USERNAME}{index + 1}"
+
+
+def seed(app, size, users=1):
+    """Create `users` benchmark users, each with `size` clothing items in outfits of four, and some feedback."""
+    from models import db
+
+    with app.app_context():
+        db.create_all()
+        for index in range(users):
+            seed_user(bench_username(index), size, random.Random(f"{size}-{index}"))
+        db.session.commit()
+
+
+def seed_user(username, size, rng):
+    from datetime import datetime, timedelta
+    from models import db, User, Outfit, ClothingItem, RecommendationFeedback
+
+    now = datetime.utcnow()
+    user = User(username=username, email=f"{username}@example.com", height=70, weight=160, gender='other',
+                preferences={'styles': ['casual', 'streetwear']})
+    user.set_password(PASSWORD)
+    db.session.add(user)
+    db.session.flush()
+    for index in range(0, size, len(SEED_OUTFIT)):
+        created_at = now - timedelta(minutes=index)
+        image_url = f"/static/uploads/{user.id}/seed-{index}.jpg"
+        outfit = Outfit(user_id=user.id, image_url=image_url, analysis='Seeded outfit', items=[],
+                        created_at=created_at)
+        db.session.add(outfit)
+        db.session.flush()
+        for item_type, material in SEED_OUTFIT[:size - index]:
+            color = rng.choice(SEED_COLORS)
+            db.session.add(ClothingItem(
+                user_id=user.id, outfit_id=outfit.id, type=item_type, color=color, material=material,
+                key_features='plain', overall_vibe=rng.choice(('casual', 'sporty', 'smart casual')),
+                short_description=f"A {color} {material} {item_type}.", image_url=image_url,
+                created_at=created_at
+            ))
+    for index in range(max(size // 10, 1)):
+        db.session.add(RecommendationFeedback(
+            user_id=user.id, recommendation=f"Recommendation {index}", question=rng.choice(CHAT_QUESTIONS),
+            feedback=rng.choice(('like', 'dislike')), created_at=now - timedelta(hours=index)
+        ))
+
+
+def serve(size, ready_file, users=1):
+    """Child process: seed the database, then serve the app until killed.
+
+    The port is written to ready_file once the server is listening.
+    """
+    from werkzeug.serving import make_server
+    from app import app
+
+    app.config['WTF_CSRF_ENABLED'] = False
+    app.config['UPLOAD_FOLDER'] = os.environ['BENCH_UPLOAD_FOLDER']
+    seed(app, size, users)
+    server = make_server('127.0.0.1', 0, app, threaded=True)
+    with open(ready_file, 'w') as f:
+        f.write(str(server.port))
+    server.serve_forever()
+
+
+def start_server(size, stubs, workdir, users=1):
+    env = dict(
+        os.environ,
+        DATABASE_URL=f"sqlite:///{os.path.join(workdir, 'bench.db')}",
+        SESSION_BACKEND='sqlite',
+        SESSION_SQLITE_PATH=os.path.join(workdir, 'sessions.db'),
+        BENCH_UPLOAD_FOLDER=os.path.join(workdir, 'uploads'),
+        OPENAI_API_KEY='stub-key',
+        OPENAI_BASE_URL=stubs['openai'].base_url,
+        WEATHER_API_KEY='stub-key',
+        WEATHER_API_URL=stubs['weather'].url,
+        FLASK_DEBUG='False',
+    )
+    env.pop('FLASK_RUN_FROM_CLI', None)
+    ready_file = os.path.join(workdir, 'port')
+    process = subprocess.Popen(
+        [sys.executable, '-m', 'benchmarks.endpoints', '--serve', str(size), '--users', str(users),
+         '--ready-file', ready_file],
+        env=env, stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL
+    )
+    deadline = time.time() + 120
+    while not os.path.exists(ready_file) or not open(ready_file).read():
+        if process.poll() is not None or time.time() > deadline:
+            process.kill()
+            raise RuntimeError(f"Benchmark server for size {size} failed to start")
+        time.sleep(0.1)
+    return process, f"http://127.0.0.1:{open(ready_file).read()}"
+
+
+def check_query_budgets(sizes):
+    """Count the SQL statements of /my-outfits and the /chat context at each wardrobe size.
+
+    Runs in-process against a throwaway SQLite database with one seeded
+    user per size. Returns {size: {check: count}} and the failures.
+    """
+    workdir = tempfile.mkdtemp(prefix='bench-queries-')
+    os.environ.update(
+        DATABASE_URL=f"sqlite:///{os.path.join(workdir, 'bench.db')}",
+        SESSION_SQLITE_PATH=os.path.join(workdir, 'sessions.db'),
+        FLASK_DEBUG='False',
+    )
+    from flask_login import login_user
+    from app import app
+    from models import db, User
+    from routes.chat import build_chat_context
+    from utils.db_utils import assert_max_queries
+
+    app.config['WTF_CSRF_ENABLED'] = False
+    try:
+        with app.app_context():
+            db.create_all()
+        counts, failures = {}, []
+        for size in sizes:
+            username = f"queries{size}"
+            with app.app_context():
+                seed_user(username, size, random.Random(size))
+                db.session.commit()
+            checks = counts[size] = {}
+            test_client = app.test_client()
+            test_client.post('/login', data={'username': username, 'password': PASSWORD})
+            with app.app_context():
+                try:
+                    with assert_max_queries(QUERY_BUDGETS['my_outfits']) as queries:
+                        test_client.get('/my-outfits?page=2')
+                except AssertionError as e:
+                    failures.append(f"/my-outfits with {size} items: {e}")
+                checks['my_outfits'] = queries.count
+            with app.test_request_context('/chat', method='POST'):
+                login_user(User.query.filter_by(username=username).one())
+                try:
+                    with assert_max_queries(QUERY_BUDGETS['chat_context']) as queries:
+                        build_chat_context(CHAT_QUESTIONS[0])
+                except AssertionError as e:
+                    failures.append(f"/chat context with {size} items: {e}")
+                checks['chat_context'] = queries.count
+    finally:
+        shutil.rmtree(workdir, ignore_errors=True)
+    return counts, failures
+
+
+def client(base_url, username=USERNAME, password=PASSWORD, location=LOCATION):
+    """A logged-in requests session with the location set."""
+    import requests
+
+    session = requests.Session()
+    session.post(f"{base_url}/login", data={'username': username, 'password': password}).raise_for_status()
+    session.post(f"{base_url}/update-location", json={'location': location}).raise_for_status()
+    return session
+
+
+def image_bytes(rng):
+    """A small JPEG with a random colour, so no two uploads share an analysis cache entry."""
+    from PIL import Image
+
+    buffer = io.BytesIO()
+    Image.new('RGB', (640, 480), tuple(rng.randrange(256) for _ in range(3))).save(buffer, 'JPEG')
+    return buffer.getvalue()
+
+
+def run_request(scenario, session, base_url, index, rng):
+    """Send one request of the scenario; returns True if it succeeded."""
+    if scenario == 'my_outfits':
+        response = session.get(f"{base_url}/my-outfits", params={'page': index % 3 + 1}, allow_redirects=False)
+        return response.status_code == 200
+    if scenario == 'update_location':
+        # A new city each time, so every request misses the weather cache
+        response = session.post(f"{base_url}/update-location", json={'location': f"City {index}"})
+        return response.status_code == 200
+    if scenario == 'weather_recommendations':
+        response = session.get(f"{base_url}/get-weather-recommendations", params={'refresh': '1'})
+        return response.status_code == 200 and bool(response.json().get('recommendations'))
+    if scenario == 'chat':
+        response = session.post(f"{base_url}/chat", json={'message': CHAT_QUESTIONS[index % len(CHAT_QUESTIONS)]})
+        return response.status_code == 200 and 'chat_id' in response.json()
+    if scenario == 'chat_stream':
+        response = session.post(f"{base_url}/chat", stream=True,
+                                json={'message': CHAT_QUESTIONS[index % len(CHAT_QUESTIONS)], 'stream': True})
+        body = response.content.decode('utf-8')
+        return response.status_code == 200 and 'event: done' in body
+    if scenario == 'upload':
+        response = session.post(f"{base_url}/upload",
+                                files={'image': (f"bench-{index}.jpg", image_bytes(rng), 'image/jpeg')})
+        if response.status_code != 202:
+            return False
+        status_url = f"{base_url}{response.json()['status_url']}"
+        deadline = time.time() + UPLOAD_TIMEOUT
+        while time.time() < deadline:
+            job = session.get(status_url).json()
+            if job.get('status') == 'done':
+                return not job.get('error')
+            time.sleep(0.02)
+        return False
+    raise ValueError(f"Unknown scenario: {scenario}")
+
+
+def scrape_db_queries(base_url):
+    """{endpoint: (sum, count)} of http_request_db_queries from /metrics."""
+    import requests
+
+    text = requests.get(f"{base_url}/metrics").text
+    totals = {}
+    for line in text.splitlines():
+        match = re.match(r'http_request_db_queries_(sum|count)\{(.*)\} (\S+)$', line)
+        if not match:
+            continue
+        endpoint = re.search(r'endpoint="([^"]*)"', match.group(2)).group(1)
+        entry = totals.setdefault(endpoint, [0.0, 0.0])
+        entry[0 if match.group(1) == 'sum' else 1] += float(match.group(3))
+    return totals
+
+
+def percentile(values, pct):
+    ordered = sorted(values)
+    position = (len(ordered) - 1) * pct / 100
+    lower = int(position)
+    upper = min(lower + 1, len(ordered) - 1)
+    return ordered[lower] + (ordered[upper] - ordered[lower]) * (position - lower)
+
+
+def run_scenario(scenario, base_url, sessions, requests_count, stubs, warmup):
+    rng = random.Random(scenario)
+    rng_lock = threading.Lock()
+    for index in range(warmup):
+        run_request(scenario, sessions[0], base_url, -1 - index, rng)
+
+    before_queries = scrape_db_queries(base_url)
+    before_calls = {name: stub.requests for name, stub in stubs.items()}
+    latencies = []
+    errors = 0
+    lock = threading.Lock()
+
+    def one(index):
+        nonlocal errors
+        with rng_lock:
+            request_rng = random.Random(rng.random())
+        start = time.perf_counter()
+        try:
+            ok = run_request(scenario, sessions[index % len(sessions)], base_url, index, request_rng)
+        except Exception:
+            ok = False
+        elapsed = time.perf_counter() - start
+        with lock:
+            latencies.append(elapsed)
+            if not ok:
+                errors += 1
+
+    start = time.perf_counter()
+    with ThreadPoolExecutor(max_workers=len(sessions)) as pool:
+        list(pool.map(one, range(requests_count)))
+    wall = time.perf_counter() - start
+
+    after_queries = scrape_db_queries(base_url)
+    endpoint = SCENARIO_ENDPOINTS[scenario]
+    query_sum = after_queries.get(endpoint, [0, 0])[0] - before_queries.get(endpoint, [0, 0])[0]
+    query_count = after_queries.get(endpoint, [0, 0])[1] - before_queries.get(endpoint, [0, 0])[1]
+    return {
+        'requests': requests_count,
+        'errors': errors,
+        'throughput_rps': round(requests_count / wall, 2),
+        'mean_ms': round(statistics.mean(latencies) * 1000, 1),
+        'p50_ms': round(percentile(latencies, 50) * 1000, 1),
+        'p95_ms': round(percentile(latencies, 95) * 1000, 1),
+        'p99_ms': round(percentile(latencies, 99) * 1000, 1),
+        'db_queries_per_request': round(query_sum / query_count, 2) if query_count else None,
+        'openai_calls_per_request': round((stubs['openai'].requests - before_calls['openai']) / requests_count, 2),
+        'weather_calls_per_request': round((stubs['weather'].requests - before_calls['weather']) / requests_count, 2),
+    }
+
+
+def git_commit():
+    try:
+        return subprocess.run(['git', 'rev-parse', 'HEAD'], capture_output=True, text=True, check=True).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        return None
+
+
+def compare(baseline, results):
+    """Print the change in throughput, p95 and queries per request against a previous run."""
+    print(f"\nCompared with {baseline.get('commit') or 'baseline'}:")
+    for size, scenarios in results['results'].items():
+        for scenario, current in scenarios.items():
+            previous = baseline.get('results', {}).get(size, {}).get(scenario)
+            if not previous:
+                continue
+
+            def change(key):
+                if not previous.get(key) or current.get(key) is None:
+                    return '     n/a'
+                return f"{(current[key] - previous[key]) / previous[key] * 100:+7.1f}%"
+            print(f"  {size:>6} {scenario:<26} rps {change('throughput_rps')}  p95 {change('p95_ms')}  "
+                  f"queries {change('db_queries_per_request')}")
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--sizes', default='50,500,2000', help='comma separated wardrobe sizes in clothing items (default: 50,500,2000)')
+    parser.add_argument('--scenarios', default=','.join(SCENARIOS), help=f"comma separated (default: {','.join(SCENARIOS)})")
+    parser.add_argument('--requests', type=int, default=100, help='requests per scenario and size (default: 100)')
+    parser.add_argument('--concurrency', type=int, default=8, help='concurrent clients (default: 8)')
+    parser.add_argument('--warmup', type=int, default=3, help='untimed requests before each scenario (default: 3)')
+    parser.add_argument('--openai-latency-ms', type=float, default=300, help='stub OpenAI response time (default: 300)')
+    parser.add_argument('--weather-latency-ms', type=float, default=80, help='stub weather API response time (default: 80)')
+    parser.add_argument('--output', help='also write the JSON results to this file')
+    parser.add_argument('--compare', help='JSON results of an earlier run to compare against')
+    parser.add_argument('--json', action='store_true', help='print the results as JSON')
+    parser.add_argument('--check-queries', action='store_true', help='only check SQL statements against QUERY_BUDGETS')
+    parser.add_argument('--serve', type=int, help=argparse.SUPPRESS)
+    parser.add_argument('--users', type=int, default=1, help=argparse.SUPPRESS)
+    parser.add_argument('--ready-file', help=argparse.SUPPRESS)
+    args = parser.parse_args()
+
+    if args.serve is not None:
+        serve(args.serve, args.ready_file, args.users)
+        return
+
+    sizes = [int(size) for size in args.sizes.split(',')]
+    if args.check_queries:
+        counts, failures = check_query_budgets(sizes)
+        if args.json:
+            print(json.dumps({'budgets': QUERY_BUDGETS, 'queries': counts, 'failures': failures}, indent=2))
+        else:
+            for size, checks in counts.items():
+                print(f"{size:>6} items: " + ', '.join(
+                    f"{name} {count}/{QUERY_BUDGETS[name]}" for name, count in checks.items()
+                ))
+            for failure in failures:
+                print(f"\n{failure}")
+        sys.exit(1 if failures else 0)
+
+    from benchmarks.stubs import StubOpenAI, StubWeather
+
+    scenarios = [scenario.strip() for scenario in args.scenarios.split(',')]
+    for scenario in scenarios:
+        if scenario not in SCENARIOS:
+            parser.error(f"unknown scenario {scenario!r}")
+
+    stubs = {
+        'openai': StubOpenAI(latency_ms=args.openai_latency_ms).start(),
+        'weather': StubWeather(latency_ms=args.weather_latency_ms).start(),
+    }
+    results = {
+        'commit': git_commit(),
+        'settings': {
+            'requests': args.requests,
+            'concurrency': args.concurrency,
+            'openai_latency_ms': args.openai_latency_ms,
+            'weather_latency_ms': args.weather_latency_ms,
+        },
+        'results': {},
+    }
+    try:
+        for size in sizes:
+            with tempfile.TemporaryDirectory(prefix='bench-') as workdir:
+                process, base_url = start_server(size, stubs, workdir)
+                try:
+                    sessions = [client(base_url) for _ in range(args.concurrency)]
+                    results['results'][str(size)] = {}
+                    for scenario in scenarios:
+                        if not args.json:
+                            print(f"{size} items: {scenario}...", file=sys.stderr)
+                        results['results'][str(size)][scenario] = run_scenario(
+                            scenario, base_url, sessions, args.requests, stubs, args.warmup
+                        )
+                finally:
+                    process.terminate()
+                    process.wait()
+    finally:
+        for stub in stubs.values():
+            stub.stop()
+
+    if args.output:
+        with open(args.output, 'w') as f:
+            json.dump(results, f, indent=2)
+    if args.json:
+        print(json.dumps(results, indent=2))
+    else:
+        print(f"\n{'items':>6} {'scenario':<26}{'rps':>9}{'p50 ms':>10}{'p95 ms':>10}{'p99 ms':>10}"
+              f"{'queries':>9}{'openai':>8}{'errors':>8}")
+        for size, scenarios_results in results['results'].items():
+            for scenario, result in scenarios_results.items():
+                queries = result['db_queries_per_request']
+                print(f"{size:>6} {scenario:<26}{result['throughput_rps']:>9.1f}{result['p50_ms']:>10.1f}"
+                      f"{result['p95_ms']:>10.1f}{result['p99_ms']:>10.1f}"
+                      f"{queries if queries is not None else '-':>9}{result['openai_calls_per_request']:>8}"
+                      f"{result['errors']:>8}")
+    if args.compare:
+        with open(args.compare) as f:
+            compare(json.load(f), results)
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,181 @@
+"""Query plans and latency of the per-user hot queries, with and without indexes.
+
+Seeds a throwaway SQLite database from the models' schema, runs the queries
+the app issues on every page view against it, then adds the indexes from
+migration e8f05b3d7a19 and runs them again.
+
+    python -m benchmarks.query_plans --rows 100000 --users 200
+"""
+import argparse
+import json
+import os
+import random
+import statistics
+import tempfile
+import time
+from datetime import datetime, timedelta
+
+from sqlalchemy import create_engine, func, insert, select, text
+
+from models import db, User, Outfit, ClothingItem, Chat, RecommendationFeedback
+
+# Indexes added by the migration; dropped first to measure the baseline. The
+# login lookups are covered by the UNIQUE constraints on user.username and
+# user.email, which the baseline schema already had.
+INDEXES = [
+    ('outfit', 'ix_outfit_user_id_created_at'),
+    ('clothing_item', 'ix_clothing_item_user_id_created_at'),
+    ('clothing_item', 'ix_clothing_item_outfit_id'),
+    ('chat', 'ix_chat_user_id_updated_at'),
+    ('recommendation_feedback', 'ix_recommendation_feedback_user_id_created_at'),
+]
+
+CHUNK_SIZE = 10000
+
+
+def _chunks(rows):
+    for start in range(0, len(rows), CHUNK_SIZE):
+        yield rows[start:start + CHUNK_SIZE]
+
+
+def seed(engine, rows, users):
+    """Insert `users` users and `rows` rows into each per-user table."""
+    rng = random.Random(42)
+    now = datetime.utcnow()
+
+    def when():
+        return now - timedelta(minutes=rng.randrange(365 * 24 * 60))
+
+    with engine.begin() as conn:
+        conn.execute(insert(User), [
+            {'id': i, 'username': f'user{i}', 'email': f'user{i}@example.com', 'password_hash': 'x'}
+            for i in range(1, users + 1)
+        ])
+        outfits = [
+            {'id': i, 'user_id': rng.randint(1, users), 'image_url': f'/static/uploads/{i}.jpg',
+             'analysis': 'analysis', 'created_at': when()}
+            for i in range(1, rows + 1)
+        ]
+        for chunk in _chunks(outfits):
+            conn.execute(insert(Outfit), chunk)
+        items = []
+        for i in range(1, rows + 1):
+            outfit = outfits[rng.randrange(rows)]
+            items.append({'id': i, 'user_id': outfit['user_id'], 'outfit_id': outfit['id'], 'type': 't-shirt',
+                          'image_url': outfit['image_url'], 'created_at': outfit['created_at']})
+        for chunk in _chunks(items):
+            conn.execute(insert(ClothingItem), chunk)
+        for chunk in _chunks([
+            {'id': i, 'user_id': rng.randint(1, users), 'preview': 'What should I wear', 'message_count': 2,
+             'created_at': when(), 'updated_at': when()}
+            for i in range(1, rows + 1)
+        ]):
+            conn.execute(insert(Chat), chunk)
+        for chunk in _chunks([
+            {'id': i, 'user_id': rng.randint(1, users), 'recommendation': f'recommendation {i}',
+             'question': 'question', 'feedback': rng.choice(['like', 'dislike']), 'created_at': when()}
+            for i in range(1, rows + 1)
+        ]):
+            conn.execute(insert(RecommendationFeedback), chunk)
+
+
+def hot_queries(user_id, outfit_ids):
+    """The statements behind login, /my-outfits, /ai-data, chat history and recommendations."""
+    return {
+        'login': select(User).where(User.username == f'user{user_id}').limit(1),
+        'my_outfits_page': select(Outfit).where(Outfit.user_id == user_id)
+            .order_by(Outfit.created_at.desc()).limit(6),
+        'my_outfits_count': select(func.count()).select_from(Outfit).where(Outfit.user_id == user_id),
+        'outfit_items_selectin': select(ClothingItem).where(ClothingItem.outfit_id.in_(outfit_ids))
+            .order_by(ClothingItem.id),
+        'wardrobe_items': select(ClothingItem).where(ClothingItem.user_id == user_id),
+        'chat_history_page': select(Chat).where(Chat.user_id == user_id)
+            .order_by(Chat.updated_at.desc()).limit(8),
+        'feedback_page': select(RecommendationFeedback).where(RecommendationFeedback.user_id == user_id)
+            .order_by(RecommendationFeedback.created_at.desc()).limit(8),
+    }
+
+
+def measure(engine, users, repeat):
+    rng = random.Random(7)
+    results = {}
+    with engine.connect() as conn:
+        user_id = rng.randint(1, users)
+        outfit_ids = conn.execute(
+            select(Outfit.id).where(Outfit.user_id == user_id).order_by(Outfit.created_at.desc()).limit(6)
+        ).scalars().all()
+        for name, statement in hot_queries(user_id, outfit_ids).items():
+            compiled = statement.compile(engine, compile_kwargs={'literal_binds': True})
+            plan = [row[-1] for row in conn.execute(text(f'EXPLAIN QUERY PLAN {compiled}'))]
+            timings = []
+            for _ in range(repeat):
+                start = time.perf_counter()
+                conn.execute(statement).all()
+                timings.append((time.perf_counter() - start) * 1000)
+            timings.sort()
+            results[name] = {
+                'plan': plan,
+                'p50_ms': round(statistics.median(timings), 3),
+                'p95_ms': round(timings[int(len(timings) * 0.95) - 1], 3),
+            }
+    return results
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--rows', type=int, default=100000, help='rows per table (default: 100000)')
+    parser.add_argument('--users', type=int, default=200, help='users the rows are spread over (default: 200)')
+    parser.add_argument('--repeat', type=int, default=50, help='runs per query (default: 50)')
+    parser.add_argument('--json', action='store_true', help='print the results as JSON')
+    args = parser.parse_args()
+
+    with tempfile.TemporaryDirectory() as tmp:
+        engine = create_engine(f"sqlite:///{os.path.join(tmp, 'bench.db')}")
+        db.metadata.create_all(engine)
+        with engine.begin() as conn:
+            for _, name in INDEXES:
+                conn.execute(text(f'DROP INDEX IF EXISTS {name}'))
+        start = time.perf_counter()
+        seed(engine, args.rows, args.users)
+        seed_seconds = time.perf_counter() - start
+        with engine.begin() as conn:
+            conn.execute(text('ANALYZE'))
+
+        before = measure(engine, args.users, args.repeat)
+        start = time.perf_counter()
+        names = {name for _, name in INDEXES}
+        for table in db.metadata.sorted_tables:
+            for index in table.indexes:
+                if index.name in names:
+                    index.create(engine)
+        with engine.begin() as conn:
+            conn.execute(text('ANALYZE'))
+        index_seconds = time.perf_counter() - start
+        after = measure(engine, args.users, args.repeat)
+        engine.dispose()
+
+    if args.json:
+        print(json.dumps({
+            'rows': args.rows,
+            'users': args.users,
+            'index_build_seconds': round(index_seconds, 2),
+            'before': before,
+            'after': after
+        }, indent=2))
+        return
+
+    print(f"Seeded {args.rows} rows per table for {args.users} users in {seed_seconds:.1f}s, "
+          f"built indexes in {index_seconds:.1f}s\n")
+    print(f"{'query':<24}{'p50 before':>12}{'p50 after':>12}{'p95 before':>12}{'p95 after':>12}")
+    for name in before:
+        print(f"{name:<24}{before[name]['p50_ms']:>10.3f}ms{after[name]['p50_ms']:>10.3f}ms"
+              f"{before[name]['p95_ms']:>10.3f}ms{after[name]['p95_ms']:>10.3f}ms")
+    print()
+    for name in before:
+        print(f"{name}:")
+        print(f"  before: {'; '.join(before[name]['plan'])}")
+        print(f"  after:  {'; '.join(after[name]['plan'])}")
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,293 @@
+"""Replay recorded production traffic against a test instance.
+
+Reads a traffic log written with TRAFFIC_RECORDER_ENABLED (see
+routes/traffic.py) and re-issues its requests in the recorded order and
+spacing, sped up or slowed down by --speed. By default it starts its own
+instance like benchmarks.endpoints does: a fresh SQLite database with one
+seeded user per recorded user (up to --max-users), served from a child
+process against the stub OpenAI and weather servers. The stubs answer after
+the median OpenAI and weather latency seen in the log, unless overridden.
+
+Traces hold no content, so request bodies are synthesized from their
+recorded shape: a chat message of the recorded length with the same
+stream/wardrobe_only flags, an upload with the same number of images, and
+so on. Requests that can't be rebuilt (logins, deletes of recorded IDs) are
+counted as skipped.
+
+    python -m benchmarks.replay instance/traffic.jsonl --speed 4 --output replay.json
+    python -m benchmarks.replay traffic.jsonl --target http://staging:5000 --username loadtest --password ...
+"""
+import argparse
+import json
+import random
+import re
+import statistics
+import sys
+import tempfile
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+from benchmarks.endpoints import (
+    CHAT_QUESTIONS, PASSWORD, bench_username, client, git_commit, image_bytes, percentile, start_server
+)
+from utils.traffic_recorder import SAFE_QUERY_ARGS, read_traces, trace_timestamp
+
+# Stub latency when the log has no calls to take the median of
+DEFAULT_OPENAI_LATENCY_MS = 300
+DEFAULT_WEATHER_LATENCY_MS = 80
+
+
+def load_traces(path, endpoints=None, limit=None):
+    traces = [trace for trace in read_traces(path) if not endpoints or trace.get('endpoint') in endpoints]
+    traces.sort(key=trace_timestamp)
+    return traces[:limit] if limit else traces
+
+
+def upstream_latency(traces, service):
+    """Median duration of the successful calls to service in the log, or None."""
+    durations = [
+        call['duration_ms'] for trace in traces for call in trace.get('upstream', [])
+        if call['service'] == service and call['outcome'] == 'success'
+    ]
+    return statistics.median(durations) if durations else None
+
+
+def shape_length(value, default=40):
+    """The length recorded for a string field ('str:42'), or default."""
+    if isinstance(value, str) and value.startswith('str:'):
+        return int(value[4:])
+    return default
+
+
+def chat_message(length):
+    text = ' '.join(CHAT_QUESTIONS)
+    while len(text) < length:
+        text += ' ' + text
+    return text[:max(length, 1)]
+
+
+class Replayer:
+    """Rebuilds recorded requests for one test instance and keeps per-user state (chats, upload jobs)."""
+
+    def __init__(self, base_url, sessions):
+        self.base_url = base_url
+        self.sessions = sessions
+        self.users = {}
+        self.chats = {}
+        self.jobs = {}
+        self._lock = threading.Lock()
+
+    def user_index(self, user):
+        with self._lock:
+            if user not in self.users:
+                self.users[user] = len(self.users)
+            return self.users[user] % len(self.sessions)
+
+    def send(self, trace, rng):
+        """Issue the trace's request; returns the response, or None if it can't be rebuilt."""
+        endpoint = trace.get('endpoint')
+        rule = trace.get('rule')
+        shape = trace.get('shape', {})
+        fields = shape.get('json') if isinstance(shape.get('json'), dict) else {}
+        user = self.user_index(trace.get('user'))
+        session = self.sessions[user]
+        url = self.base_url
+
+        if endpoint == 'update_location':
+            return session.post(f"{url}/update-location", json={'location': f"City {user}"})
+        if endpoint == 'outfits.upload_clothing':
+            count = shape.get('files', {}).get('image', 1)
+            response = session.post(f"{url}/upload", files=[
+                ('image', (f"replay-{index}.jpg", image_bytes(rng), 'image/jpeg')) for index in range(count)
+            ])
+            if response.status_code == 202:
+                self.jobs[user] = response.json()['status_url']
+            return response
+        if endpoint == 'outfits.upload_status':
+            status_url = self.jobs.get(user)
+            return session.get(f"{url}{status_url}") if status_url else None
+        if endpoint == 'chat.chat_message':
+            body = {
+                'message': chat_message(shape_length(fields.get('message'))),
+                'stream': bool(fields.get('stream')),
+                'wardrobe_only': bool(fields.get('wardrobe_only')),
+            }
+            if fields.get('chat_id') is not None and self.chats.get(user):
+                body['chat_id'] = self.chats[user]
+            response = session.post(f"{url}/chat", json=body, stream=body['stream'])
+            match = re.search(r'"chat_id":\s*(\d+)', response.content.decode('utf-8', 'replace'))
+            if match:
+                self.chats[user] = int(match.group(1))
+            return response
+        if trace.get('method') == 'GET' and rule and '<' not in rule and not endpoint.startswith('auth.'):
+            # Plain pages and JSON reads: same path, with the query values that were kept
+            query = {key: value for key, value in shape.get('query', {}).items() if key in SAFE_QUERY_ARGS}
+            return session.get(f"{url}{rule}", params=query, allow_redirects=False)
+        return None
+
+
+def replay(traces, replayer, speed, max_in_flight):
+    """Send the traces on their recorded schedule divided by speed; returns per-trace results."""
+    results = []
+    lock = threading.Lock()
+    origin = trace_timestamp(traces[0])
+    start = time.perf_counter()
+
+    def one(trace, scheduled, seed):
+        sent_at = time.perf_counter()
+        result = {'trace': trace, 'lag_ms': (sent_at - start - scheduled) * 1000}
+        try:
+            response = replayer.send(trace, random.Random(seed))
+            if response is None:
+                result['skipped'] = True
+            else:
+                response.content  # Read the whole body, e.g. a streamed reply
+                result['status'] = response.status_code
+        except Exception as e:
+            result['status'] = None
+            result['error'] = str(e)
+        result['duration_ms'] = (time.perf_counter() - sent_at) * 1000
+        with lock:
+            results.append(result)
+
+    with ThreadPoolExecutor(max_workers=max_in_flight) as pool:
+        for index, trace in enumerate(traces):
+            scheduled = (trace_timestamp(trace) - origin) / speed
+            delay = scheduled - (time.perf_counter() - start)
+            if delay > 0:
+                time.sleep(delay)
+            pool.submit(one, trace, scheduled, index)
+    return results, time.perf_counter() - start
+
+
+def summarize(results, wall, traces, speed):
+    by_endpoint = {}
+    for result in results:
+        by_endpoint.setdefault(result['trace'].get('endpoint') or 'unmatched', []).append(result)
+
+    summary = {}
+    for endpoint, entries in sorted(by_endpoint.items()):
+        sent = [entry for entry in entries if not entry.get('skipped')]
+        stats = {'recorded': len(entries), 'sent': len(sent), 'skipped': len(entries) - len(sent)}
+        if sent:
+            durations = [entry['duration_ms'] for entry in sent]
+            recorded = [entry['trace']['duration_ms'] for entry in sent]
+            stats.update({
+                'errors': sum(1 for entry in sent if entry.get('status') is None or entry['status'] >= 500),
+                # Responses in a different class (2xx, 4xx, ...) than the recorded ones
+                'status_mismatches': sum(
+                    1 for entry in sent
+                    if entry.get('status') and entry['status'] // 100 != entry['trace']['status'] // 100
+                ),
+                'p50_ms': round(percentile(durations, 50), 1),
+                'p95_ms': round(percentile(durations, 95), 1),
+                'p99_ms': round(percentile(durations, 99), 1),
+                'recorded_p50_ms': round(percentile(recorded, 50), 1),
+                'recorded_p95_ms': round(percentile(recorded, 95), 1),
+                'recorded_db_queries': round(statistics.mean(entry['trace'].get('db_queries', 0) for entry in sent), 2),
+            })
+        summary[endpoint] = stats
+
+    span = trace_timestamp(traces[-1]) - trace_timestamp(traces[0])
+    lags = [result['lag_ms'] for result in results]
+    return {
+        'requests': len(results),
+        'sent': sum(stats['sent'] for stats in summary.values()),
+        'recorded_rps': round(len(traces) / span, 2) if span else None,
+        'target_rps': round(len(traces) / span * speed, 2) if span else None,
+        'achieved_rps': round(len(results) / wall, 2),
+        # How far sends fell behind schedule, e.g. because --max-in-flight was reached
+        'schedule_lag_p95_ms': round(percentile(lags, 95), 1),
+        'endpoints': summary,
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('log', help='traffic log (JSONL) written by the recorder')
+    parser.add_argument('--speed', type=float, default=1.0, help='replay rate as a multiple of the recorded rate (default: 1)')
+    parser.add_argument('--limit', type=int, help='replay only the first N requests')
+    parser.add_argument('--endpoints', help='comma separated endpoints to replay (default: all)')
+    parser.add_argument('--max-in-flight', type=int, default=64, help='concurrent requests at most (default: 64)')
+    parser.add_argument('--wardrobe-size', type=int, default=200, help='clothing items seeded per user (default: 200)')
+    parser.add_argument('--max-users', type=int, default=10, help='seeded users recorded users are spread over (default: 10)')
+    parser.add_argument('--openai-latency-ms', type=float, help='stub OpenAI response time (default: median in the log)')
+    parser.add_argument('--weather-latency-ms', type=float, help='stub weather API response time (default: median in the log)')
+    parser.add_argument('--target', help='replay against this running instance instead of starting one')
+    parser.add_argument('--username', help='account on --target every recorded user is replayed as')
+    parser.add_argument('--password', help='password of --username')
+    parser.add_argument('--output', help='also write the JSON results to this file')
+    parser.add_argument('--json', action='store_true', help='print the results as JSON')
+    args = parser.parse_args()
+    if args.target and not (args.username and args.password):
+        parser.error('--target needs --username and --password')
+
+    traces = load_traces(args.log, args.endpoints.split(',') if args.endpoints else None, args.limit)
+    if not traces:
+        parser.error(f"no traces to replay in {args.log}")
+    users = len({trace.get('user') for trace in traces})
+    openai_latency = args.openai_latency_ms or upstream_latency(traces, 'openai') or DEFAULT_OPENAI_LATENCY_MS
+    weather_latency = args.weather_latency_ms or upstream_latency(traces, 'weather') or DEFAULT_WEATHER_LATENCY_MS
+    results = {
+        'commit': git_commit(),
+        'settings': {
+            'log': args.log,
+            'speed': args.speed,
+            'target': args.target,
+            'wardrobe_size': None if args.target else args.wardrobe_size,
+            'openai_latency_ms': None if args.target else openai_latency,
+            'weather_latency_ms': None if args.target else weather_latency,
+        },
+    }
+
+    if not args.json:
+        print(f"Replaying {len(traces)} requests from {users} users at {args.speed}x...", file=sys.stderr)
+    if args.target:
+        replayer = Replayer(args.target.rstrip('/'), [client(args.target.rstrip('/'), args.username, args.password)])
+        replayed, wall = replay(traces, replayer, args.speed, args.max_in_flight)
+    else:
+        from benchmarks.stubs import StubOpenAI, StubWeather
+
+        stubs = {
+            'openai': StubOpenAI(latency_ms=openai_latency).start(),
+            'weather': StubWeather(latency_ms=weather_latency).start(),
+        }
+        seeded_users = max(1, min(users, args.max_users))
+        try:
+            with tempfile.TemporaryDirectory(prefix='replay-') as workdir:
+                process, base_url = start_server(args.wardrobe_size, stubs, workdir, users=seeded_users)
+                try:
+                    sessions = [
+                        client(base_url, bench_username(index), PASSWORD, location=f"City {index}")
+                        for index in range(seeded_users)
+                    ]
+                    replayed, wall = replay(traces, Replayer(base_url, sessions), args.speed, args.max_in_flight)
+                finally:
+                    process.terminate()
+                    process.wait()
+        finally:
+            for stub in stubs.values():
+                stub.stop()
+    results.update(summarize(replayed, wall, traces, args.speed))
+
+    if args.output:
+        with open(args.output, 'w') as f:
+            json.dump(results, f, indent=2)
+    if args.json:
+        print(json.dumps(results, indent=2))
+        return
+    print(f"Sent {results['sent']} of {results['requests']} requests at {results['achieved_rps']} req/s "
+          f"(recorded {results['recorded_rps']}, target {results['target_rps']}), "
+          f"p95 schedule lag {results['schedule_lag_p95_ms']}ms\n")
+    print(f"{'endpoint':<44}{'sent':>6}{'skip':>6}{'err':>5}{'p50 ms':>9}{'p95 ms':>9}{'rec p50':>9}{'rec p95':>9}")
+    for endpoint, stats in results['endpoints'].items():
+        if not stats['sent']:
+            print(f"{endpoint:<44}{0:>6}{stats['skipped']:>6}")
+            continue
+        print(f"{endpoint:<44}{stats['sent']:>6}{stats['skipped']:>6}{stats['errors']:>5}{stats['p50_ms']:>9.1f}"
+              f"{stats['p95_ms']:>9.1f}{stats['recorded_p50_ms']:>9.1f}{stats['recorded_p95_ms']:>9.1f}")
+
+
+if __name__ == '__main__':
+    main()
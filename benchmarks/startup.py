@@ -0,0 +1,119 @@
+"""Cold start time of the app: importing app.py and serving the first request.
+
+Each run starts a fresh interpreter with `python -X importtime`, imports the
+app, serves GET /login through the test client and checks which heavy
+libraries got imported along the way. Those are only needed by the requests
+that use them, so loading any of them at startup counts as a regression.
+
+    python -m benchmarks.startup --repeat 5 --budget-ms 1500
+
+Exits with status 1 when the median time to first request is over budget or
+a deferred library was imported at startup.
+"""
+import argparse
+import json
+import os
+import statistics
+import subprocess
+import sys
+import time
+
+# Libraries that must only be imported on first use
+DEFERRED_MODULES = ('openai', 'httpx', 'sklearn', 'scipy', 'numpy', 'requests', 'alembic', 'flask_migrate')
+
+SCRIPT = """
+import json, sys, time
+start = time.perf_counter()
+from app import app
+imported = time.perf_counter()
+response = app.test_client().get('/login')
+done = time.perf_counter()
+print(json.dumps({
+    'import_ms': (imported - start) * 1000,
+    'first_request_ms': (done - start) * 1000,
+    'status': response.status_code,
+    'deferred_loaded': sorted(name for name in %r if name in sys.modules),
+}))
+""" % (DEFERRED_MODULES,)
+
+
+def app_imports(stderr):
+    """[(module, cumulative_ms)] imported directly by app.py, from `python -X importtime` output.
+
+    importtime lists a module's imports before the module itself, indented
+    one level deeper.
+    """
+    children = []
+    for line in stderr.splitlines():
+        if not line.startswith('import time:') or 'cumulative' in line:
+            continue
+        _, cumulative, name = line[len('import time:'):].split('|')
+        depth = (len(name) - len(name.lstrip(' ')) - 1) // 2
+        if depth == 1:
+            children.append((name.strip(), int(cumulative) / 1000))
+        elif depth == 0:
+            if name.strip() == 'app':
+                return children
+            children = []
+    return []
+
+
+def run_once():
+    env = dict(os.environ, FLASK_CONFIG='testing')
+    start = time.perf_counter()
+    result = subprocess.run([sys.executable, '-X', 'importtime', '-c', SCRIPT],
+                            capture_output=True, text=True, env=env)
+    process_ms = (time.perf_counter() - start) * 1000
+    if result.returncode != 0:
+        raise RuntimeError(f"Startup run failed:\n{result.stderr[-2000:]}")
+    run = json.loads(result.stdout.strip().splitlines()[-1])
+    run['process_ms'] = process_ms
+    run['imports'] = app_imports(result.stderr)
+    return run
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--repeat', type=int, default=5, help='fresh interpreters to start (default: 5)')
+    parser.add_argument('--budget-ms', type=float, default=1500,
+                        help='allowed median time to first request (default: 1500)')
+    parser.add_argument('--top', type=int, default=10, help='heaviest imports of app.py to list (default: 10)')
+    parser.add_argument('--json', action='store_true', help='print the results as JSON')
+    args = parser.parse_args()
+
+    # The first run warms the bytecode and filesystem caches
+    run_once()
+    runs = [run_once() for _ in range(args.repeat)]
+
+    def median(key):
+        return round(statistics.median(run[key] for run in runs), 1)
+
+    heaviest = sorted(((name, round(ms, 1)) for name, ms in runs[-1]['imports']), key=lambda entry: -entry[1])[:args.top]
+    deferred_loaded = sorted({name for run in runs for name in run['deferred_loaded']})
+    results = {
+        'runs': args.repeat,
+        'process_ms': median('process_ms'),
+        'import_ms': median('import_ms'),
+        'first_request_ms': median('first_request_ms'),
+        'budget_ms': args.budget_ms,
+        'heaviest_imports_ms': dict(heaviest),
+        'deferred_loaded': deferred_loaded,
+    }
+    failed = results['first_request_ms'] > args.budget_ms or bool(deferred_loaded)
+
+    if args.json:
+        print(json.dumps(results, indent=2))
+    else:
+        print(f"Median over {args.repeat} runs: import {results['import_ms']:.1f}ms, "
+              f"first request {results['first_request_ms']:.1f}ms (budget {args.budget_ms:.0f}ms), "
+              f"whole process {results['process_ms']:.1f}ms\n")
+        print("Heaviest imports of app.py:")
+        for name, ms in heaviest:
+            print(f"  {name:<32}{ms:>10.1f}ms")
+        if deferred_loaded:
+            print(f"\nImported at startup but should be deferred: {', '.join(deferred_loaded)}")
+    sys.exit(1 if failed else 0)
+
+
+if __name__ == '__main__':
+    main()
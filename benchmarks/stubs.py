@@ -0,0 +1,270 @@
+"""Local stand-ins for the OpenAI and OpenWeatherMap APIs, for offline benchmarks.
+
+Point the app at them with OPENAI_BASE_URL and WEATHER_API_URL. Both answer
+after a configurable latency, and the OpenAI stub shapes its reply after the
+call it receives (vision analysis, chat, streamed chat, recommendation
+explanations), so the app takes the same code paths as against the real APIs.
+
+    python -m benchmarks.stubs --openai-latency-ms 300 --weather-latency-ms 80
+"""
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+import argparse
+import json
+import random
+import threading
+import time
+
+CONDITIONS = (
+    ('Clear', 'clear sky', '01d'),
+    ('Clouds', 'broken clouds', '04d'),
+    ('Rain', 'light rain', '10d'),
+    ('Snow', 'light snow', '13d'),
+)
+
+ITEM_TYPES = ('t-shirt', 'jeans', 'sneakers', 'denim jacket', 'sweater', 'chinos', 'boots', 'wool coat', 'dress', 'hat')
+COLORS = ('black', 'white', 'navy', 'grey', 'olive', 'red', 'beige')
+
+
+class StubServer:
+    """ThreadingHTTPServer on a free local port, served from a daemon thread."""
+
+    handler = None
+
+    def __init__(self, latency_ms=0, jitter_ms=0):
+        self.latency_ms = latency_ms
+        self.jitter_ms = jitter_ms
+        self.requests = 0
+        self._lock = threading.Lock()
+        self._server = None
+
+    def _count(self):
+        with self._lock:
+            self.requests += 1
+
+    def _wait(self):
+        delay = self.latency_ms + (random.uniform(-self.jitter_ms, self.jitter_ms) if self.jitter_ms else 0)
+        if delay > 0:
+            time.sleep(delay / 1000)
+
+    def start(self):
+        stub = self
+
+        class Handler(self.handler):
+            pass
+        Handler.stub = stub
+
+        self._server = ThreadingHTTPServer(('127.0.0.1', 0), Handler)
+        self._server.daemon_threads = True
+        threading.Thread(target=self._server.serve_forever, name=type(self).__name__, daemon=True).start()
+        return self
+
+    def stop(self):
+        if self._server is not None:
+            self._server.shutdown()
+            self._server.server_close()
+
+    @property
+    def port(self):
+        return self._server.server_port
+
+
+class _QuietHandler(BaseHTTPRequestHandler):
+    protocol_version = 'HTTP/1.1'
+
+    def log_message(self, format, *args):
+        pass
+
+    def _send_json(self, payload, status=200):
+        body = json.dumps(payload).encode('utf-8')
+        self.send_response(status)
+        self.send_header('Content-Type', 'application/json')
+        self.send_header('Content-Length', str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+
+def _words(count):
+    filler = ('this', 'look', 'works', 'well', 'for', 'today', 'with', 'layers', 'and', 'comfy', 'shoes')
+    return ' '.join(filler[i % len(filler)] for i in range(count))
+
+
+def _text_of(message):
+    content = message.get('content')
+    if isinstance(content, list):
+        return ' '.join(part.get('text', '') for part in content if isinstance(part, dict))
+    return content or ''
+
+
+def _has_image(messages):
+    return any(
+        isinstance(message.get('content'), list)
+        and any(part.get('type') == 'image_url' for part in message['content'] if isinstance(part, dict))
+        for message in messages
+    )
+
+
+class _OpenAIHandler(_QuietHandler):
+    def do_POST(self):
+        stub = self.stub
+        body = json.loads(self.rfile.read(int(self.headers.get('Content-Length', 0))) or b'{}')
+        stub._count()
+        if not self.path.endswith('/chat/completions'):
+            self._send_json({'error': {'message': 'Not found'}}, status=404)
+            return
+        messages = body.get('messages', [])
+        reply = stub.reply_for(messages)
+        if body.get('stream'):
+            self._stream(reply if not reply.startswith('{') else stub.stream_reply())
+            return
+        stub._wait()
+        prompt_tokens = sum(len(_text_of(message).split()) for message in messages) + (765 if _has_image(messages) else 0)
+        self._send_json({
+            'id': 'chatcmpl-stub',
+            'object': 'chat.completion',
+            'created': int(time.time()),
+            'model': body.get('model', 'gpt-4o-mini'),
+            'choices': [{'index': 0, 'message': {'role': 'assistant', 'content': reply}, 'finish_reason': 'stop'}],
+            'usage': {
+                'prompt_tokens': prompt_tokens,
+                'completion_tokens': len(reply.split()),
+                'total_tokens': prompt_tokens + len(reply.split()),
+            },
+        })
+
+    def _stream(self, reply):
+        stub = self.stub
+        self.send_response(200)
+        self.send_header('Content-Type', 'text/event-stream')
+        self.send_header('Transfer-Encoding', 'chunked')
+        self.end_headers()
+
+        def send(data):
+            chunk = f"data: {data}\n\n".encode('utf-8')
+            self.wfile.write(f"{len(chunk):x}\r\n".encode('ascii') + chunk + b"\r\n")
+            self.wfile.flush()
+
+        # Time to first token is the configured latency; the rest trickles in
+        stub._wait()
+        pieces = reply.split(' ')
+        for index, piece in enumerate(pieces):
+            delta = piece if index == len(pieces) - 1 else piece + ' '
+            send(json.dumps({
+                'id': 'chatcmpl-stub', 'object': 'chat.completion.chunk', 'created': int(time.time()),
+                'model': 'gpt-4o-mini',
+                'choices': [{'index': 0, 'delta': {'content': delta}, 'finish_reason': None}],
+            }))
+            if stub.token_interval_ms:
+                time.sleep(stub.token_interval_ms / 1000)
+        send(json.dumps({
+            'id': 'chatcmpl-stub', 'object': 'chat.completion.chunk', 'created': int(time.time()),
+            'model': 'gpt-4o-mini', 'choices': [{'index': 0, 'delta': {}, 'finish_reason': 'stop'}],
+        }))
+        send('[DONE]')
+        self.wfile.write(b"0\r\n\r\n")
+
+
+class StubOpenAI(StubServer):
+    """Chat completions API: JSON-mode vision analyses, chat replies, streams and outfit explanations.
+
+    reply_words sets the length of free-text replies; items_per_image the
+    number of clothing items each analysed image contains.
+    """
+
+    handler = _OpenAIHandler
+
+    def __init__(self, latency_ms=300, jitter_ms=0, reply_words=40, items_per_image=3, token_interval_ms=5):
+        super().__init__(latency_ms, jitter_ms)
+        self.reply_words = reply_words
+        self.items_per_image = items_per_image
+        self.token_interval_ms = token_interval_ms
+
+    @property
+    def base_url(self):
+        return f"http://127.0.0.1:{self.port}/v1"
+
+    def stream_reply(self):
+        return f"{_words(self.reply_words)}\nIMAGE_URLS: []"
+
+    def reply_for(self, messages):
+        prompt = '\n'.join(_text_of(message) for message in messages)
+        if _has_image(messages):
+            return json.dumps({'items': [
+                {
+                    'name': f"{color.title()} {item_type.title()}",
+                    'type': item_type,
+                    'style': item_type,
+                    'color': color,
+                    'brand': None,
+                    'material': 'cotton',
+                    'key_features': 'plain',
+                    'overall_vibe': 'casual',
+                    'short_description': f"A {color} {item_type}.",
+                }
+                for item_type, color in (
+                    (random.choice(ITEM_TYPES), random.choice(COLORS)) for _ in range(self.items_per_image)
+                )
+            ]})
+        if 'explains outfit picks' in prompt:
+            # One explanation per outfit listed in the prompt's JSON context
+            outfits = 3
+            for line in prompt.splitlines():
+                if line.startswith('{') and '"outfits"' in line:
+                    try:
+                        outfits = len(json.loads(line)['outfits'])
+                    except (ValueError, KeyError):
+                        pass
+            return json.dumps([_words(self.reply_words // 3 or 1) for _ in range(outfits)])
+        if 'IMAGE_URLS' in prompt:
+            return self.stream_reply()
+        if 'image_urls' in prompt:
+            return json.dumps({'response': _words(self.reply_words), 'image_urls': []})
+        return _words(self.reply_words)
+
+
+class _WeatherHandler(_QuietHandler):
+    def do_GET(self):
+        stub = self.stub
+        stub._count()
+        stub._wait()
+        rng = random.Random(self.path)
+        main, description, icon = CONDITIONS[rng.randrange(len(CONDITIONS))]
+        temperature = rng.uniform(20, 95)
+        self._send_json({
+            'weather': [{'main': main, 'description': description, 'icon': icon}],
+            'main': {'temp': temperature, 'feels_like': temperature - 2, 'humidity': rng.randint(20, 95)},
+            'wind': {'speed': rng.uniform(0, 20)},
+            'name': 'Stub City',
+        })
+
+
+class StubWeather(StubServer):
+    """OpenWeatherMap current weather API; each location gets stable made-up weather."""
+
+    handler = _WeatherHandler
+
+    def __init__(self, latency_ms=80, jitter_ms=0):
+        super().__init__(latency_ms, jitter_ms)
+
+    @property
+    def url(self):
+        return f"http://127.0.0.1:{self.port}/data/2.5/weather"
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--openai-latency-ms', type=float, default=300)
+    parser.add_argument('--weather-latency-ms', type=float, default=80)
+    args = parser.parse_args()
+
+    openai_stub = StubOpenAI(latency_ms=args.openai_latency_ms).start()
+    weather_stub = StubWeather(latency_ms=args.weather_latency_ms).start()
+    print(f"OPENAI_BASE_URL={openai_stub.base_url}")
+    print(f"WEATHER_API_URL={weather_stub.url}")
+    try:
+        threading.Event().wait()
+    except KeyboardInterrupt:
+        pass
+
+
+if __name__ == '__main__':
+    main()
@@ -8,21 +8,88 @@ class Config:
     # Flask settings
     SECRET_KEY = os.getenv('SECRET_KEY', 'your-secret-key')
     DEBUG = os.getenv('FLASK_DEBUG', 'True').lower() == 'true'
+    SESSION_BACKEND = os.getenv('SESSION_BACKEND', 'sqlite')  # 'sqlite', 'filesystem', 'redis' or 'cookie' (Flask's signed cookie)
+    SESSION_SQLITE_PATH = os.getenv('SESSION_SQLITE_PATH')  # Defaults to sessions.db in the instance folder
+    SESSION_FILE_DIR = os.getenv('SESSION_FILE_DIR')  # Defaults to sessions/ in the instance folder
+    SESSION_REDIS_URL = os.getenv('SESSION_REDIS_URL', 'redis://localhost:6379/0')  # Any Redis-compatible server
+    METRICS_TOKEN = os.getenv('METRICS_TOKEN')  # Bearer token required by /metrics when set
+    PROFILER_ENABLED = os.getenv('PROFILER_ENABLED', 'False').lower() == 'true'  # Allow profiling requests at all
+    PROFILER_TOKEN = os.getenv('PROFILER_TOKEN')  # X-Profile-Token value that profiles a request and unlocks /admin/profiles
+    PROFILE_SAMPLE_RATE = float(os.getenv('PROFILE_SAMPLE_RATE', 0))  # Share of requests profiled without the header
+    PROFILE_SAMPLE_INTERVAL_MS = float(os.getenv('PROFILE_SAMPLE_INTERVAL_MS', 5))  # Stack sampling interval
+    PROFILE_DIR = os.getenv('PROFILE_DIR')  # Defaults to profiles/ in the instance folder
+    PROFILE_MAX_PROFILES = int(os.getenv('PROFILE_MAX_PROFILES', 200))  # Older profiles are deleted
+    TRAFFIC_RECORDER_ENABLED = os.getenv('TRAFFIC_RECORDER_ENABLED', 'False').lower() == 'true'  # Log request traces for benchmarks.replay
+    TRAFFIC_RECORD_RATE = float(os.getenv('TRAFFIC_RECORD_RATE', 1.0))  # Share of requests recorded
+    TRAFFIC_LOG_PATH = os.getenv('TRAFFIC_LOG_PATH')  # Defaults to traffic.jsonl in the instance folder
+    TRAFFIC_LOG_MAX_BYTES = int(os.getenv('TRAFFIC_LOG_MAX_BYTES', 100 * 1024 * 1024))  # A full log is moved to <path>.1
     
     # Database settings
     SQLALCHEMY_DATABASE_URI = os.getenv('DATABASE_URL', 'sqlite:///outfit_finder.db')
     SQLALCHEMY_TRACK_MODIFICATIONS = False
+    DB_POOL_SIZE = int(os.getenv('DB_POOL_SIZE', 5))  # Connections kept open per process (server databases only)
+    DB_MAX_OVERFLOW = int(os.getenv('DB_MAX_OVERFLOW', 10))  # Extra connections allowed under load (server databases only)
+    DB_POOL_TIMEOUT = int(os.getenv('DB_POOL_TIMEOUT', 30))  # Seconds to wait for a free connection (server databases only)
+    DB_POOL_RECYCLE = int(os.getenv('DB_POOL_RECYCLE', 30 * 60))  # Seconds before a pooled connection is replaced
+    DB_POOL_PRE_PING = os.getenv('DB_POOL_PRE_PING', 'True').lower() == 'true'  # Test connections before handing them out
+    SQLITE_JOURNAL_MODE = os.getenv('SQLITE_JOURNAL_MODE', 'WAL')  # WAL lets readers run while a write is in progress
+    SQLITE_SYNCHRONOUS = os.getenv('SQLITE_SYNCHRONOUS', 'NORMAL')  # NORMAL is durable enough in WAL mode and fsyncs less
+    SQLITE_BUSY_TIMEOUT = int(os.getenv('SQLITE_BUSY_TIMEOUT', 5000))  # Milliseconds to wait on a locked database
     
     # OpenAI settings
     OPENAI_API_KEY = os.getenv('OPENAI_API_KEY')
+    OPENAI_BASE_URL = os.getenv('OPENAI_BASE_URL')  # None uses the default API endpoint
+    LLM_MAX_CONCURRENCY = int(os.getenv('LLM_MAX_CONCURRENCY', 8))  # OpenAI requests in flight per process
+    LLM_MAX_CONNECTIONS = int(os.getenv('LLM_MAX_CONNECTIONS', 16))  # Pooled keep-alive connections
+    LLM_MAX_RETRIES = int(os.getenv('LLM_MAX_RETRIES', 2))  # Retries with backoff on connection errors, 429 and 5xx
+    LLM_DEFAULT_TIMEOUT = float(os.getenv('LLM_DEFAULT_TIMEOUT', 30))  # Seconds
+    # Per call site timeouts in seconds
+    LLM_TIMEOUTS = {
+        'analyze_clothing_image': 60,
+        'analyze_clothing_image_structured': 60,
+        'generate_short_description': 20,
+        'chat_message': 30,
+        'weather_recommendations': 45,
+        'process_user_feedback': 30,
+    }
     
     # Weather API settings
     WEATHER_API_KEY = os.getenv('WEATHER_API_KEY')
+    WEATHER_CACHE_TTL = int(os.getenv('WEATHER_CACHE_TTL', 30 * 60))  # Seconds weather is served as fresh
+    WEATHER_CACHE_STALE_TTL = int(os.getenv('WEATHER_CACHE_STALE_TTL', 3 * 60 * 60))  # Seconds stale weather is served while refreshing
+    WEATHER_CACHE_DB = os.getenv('WEATHER_CACHE_DB')  # Optional SQLite file shared by worker processes
+    WEATHER_API_URL = os.getenv('WEATHER_API_URL', 'https://api.openweathermap.org/data/2.5/weather')
+    WEATHER_CONNECT_TIMEOUT = float(os.getenv('WEATHER_CONNECT_TIMEOUT', 3))  # Seconds
+    WEATHER_READ_TIMEOUT = float(os.getenv('WEATHER_READ_TIMEOUT', 5))  # Seconds
+    WEATHER_API_RETRIES = int(os.getenv('WEATHER_API_RETRIES', 2))  # Retries on connection errors, 429 and 5xx
+    WEATHER_BREAKER_THRESHOLD = int(os.getenv('WEATHER_BREAKER_THRESHOLD', 5))  # Consecutive failures before the circuit opens
+    WEATHER_BREAKER_RESET = int(os.getenv('WEATHER_BREAKER_RESET', 60))  # Seconds before retrying an open circuit
     
     # File upload settings
     UPLOAD_FOLDER = os.path.join(os.path.dirname(os.path.abspath(__file__)), 'static', 'uploads')
     MAX_CONTENT_LENGTH = 16 * 1024 * 1024  # 16MB max file size
     ALLOWED_EXTENSIONS = {'png', 'jpg', 'jpeg', 'gif'}
+    UPLOAD_WORKERS = int(os.getenv('UPLOAD_WORKERS', 4))  # Background image analysis threads
+    DESCRIPTION_CONCURRENCY = int(os.getenv('DESCRIPTION_CONCURRENCY', 4))  # Parallel short-description calls per image
+    DESCRIPTION_TIMEOUT = float(os.getenv('DESCRIPTION_TIMEOUT', 20))  # Seconds per short-description call
+    ANALYSIS_MODE = os.getenv('ANALYSIS_MODE', 'structured')  # 'structured' (one JSON call) or 'legacy' (bullets + per-item calls)
+    ANALYSIS_CACHE_SIZE = int(os.getenv('ANALYSIS_CACHE_SIZE', 512))  # Cached image analyses (LRU)
+    ANALYSIS_CACHE_TTL = int(os.getenv('ANALYSIS_CACHE_TTL', 7 * 24 * 60 * 60))  # Seconds before a cached analysis expires
+    VISION_MAX_EDGE = int(os.getenv('VISION_MAX_EDGE', 1024))  # Long edge (px) of images sent to the vision API
+    VISION_IMAGE_FORMAT = os.getenv('VISION_IMAGE_FORMAT', 'JPEG')  # JPEG or WEBP
+    VISION_IMAGE_QUALITY = int(os.getenv('VISION_IMAGE_QUALITY', 85))  # Re-encode quality for vision images
+    THUMBNAIL_SIZE = int(os.getenv('THUMBNAIL_SIZE', 400))  # Long edge (px) of gallery thumbnails
+    MEDIUM_IMAGE_SIZE = int(os.getenv('MEDIUM_IMAGE_SIZE', 1024))  # Long edge (px) of medium gallery images
+    IMAGE_CACHE_MAX_AGE = int(os.getenv('IMAGE_CACHE_MAX_AGE', 365 * 24 * 60 * 60))  # Cache-Control max-age for /media images
+    CHAT_CONTEXT_TOKEN_BUDGET = int(os.getenv('CHAT_CONTEXT_TOKEN_BUDGET', 3000))  # Prompt tokens for wardrobe + feedback in /chat
+    CHAT_CONTEXT_MAX_CANDIDATES = int(os.getenv('CHAT_CONTEXT_MAX_CANDIDATES', 500))  # Most recent outfits/feedback considered for /chat
+    WARDROBE_RETRIEVAL_K = int(os.getenv('WARDROBE_RETRIEVAL_K', 20))  # Most relevant clothing items sent to /chat
+    WARDROBE_INDEX_CACHE_SIZE = int(os.getenv('WARDROBE_INDEX_CACHE_SIZE', 256))  # Users whose retrieval index is kept in memory (LRU)
+    WARDROBE_INDEX_CACHE_TTL = int(os.getenv('WARDROBE_INDEX_CACHE_TTL', 60 * 60))  # Seconds before an index is rebuilt from the database
+    WEATHER_RECOMMENDATION_COUNT = int(os.getenv('WEATHER_RECOMMENDATION_COUNT', 3))  # Outfits returned by weather recommendations
+    OUTFIT_SLOT_CANDIDATES = int(os.getenv('OUTFIT_SLOT_CANDIDATES', 6))  # Best items per slot (top, bottom, ...) the outfit engine combines
+    RECOMMENDATION_CACHE_SIZE = int(os.getenv('RECOMMENDATION_CACHE_SIZE', 1024))  # Cached weather recommendation results (LRU)
+    RECOMMENDATION_CACHE_TTL = int(os.getenv('RECOMMENDATION_CACHE_TTL', 60 * 60))  # Seconds before cached recommendations expire
     
     # Application settings
     OUTFIT_CATEGORIES = [
@@ -73,6 +140,7 @@ class ProductionConfig(Config):
         
         # Production-specific initialization
         import logging
+        os.makedirs('logs', exist_ok=True)
         from logging.handlers import RotatingFileHandler
         
         # Set up logging
@@ -0,0 +1,138 @@
+"""Move chat messages from the chat.messages JSON column to a chat_message table
+
+Revision ID: d41a8c6e2f57
+Revises: b7e3f2a9c581
+Create Date: 2026-10-17 15:26:08.114730
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = 'd41a8c6e2f57'
+down_revision = 'b7e3f2a9c581'
+branch_labels = None
+depends_on = None
+
+# Chats copied per round trip, so large tables aren't loaded at once
+BATCH_SIZE = 500
+PREVIEW_LENGTH = 50
+
+chat_table = sa.table(
+    'chat',
+    sa.column('id', sa.Integer),
+    sa.column('messages', sa.JSON),
+    sa.column('preview', sa.String),
+    sa.column('message_count', sa.Integer),
+    sa.column('last_message_at', sa.DateTime),
+    sa.column('updated_at', sa.DateTime),
+)
+
+chat_message_table = sa.table(
+    'chat_message',
+    sa.column('id', sa.Integer),
+    sa.column('chat_id', sa.Integer),
+    sa.column('sender', sa.String),
+    sa.column('text', sa.Text),
+    sa.column('image_urls', sa.JSON),
+    sa.column('created_at', sa.DateTime),
+)
+
+
+def upgrade():
+    op.create_table('chat_message',
+    sa.Column('id', sa.Integer(), nullable=False),
+    sa.Column('chat_id', sa.Integer(), nullable=False),
+    sa.Column('sender', sa.String(length=10), nullable=False),
+    sa.Column('text', sa.Text(), nullable=False),
+    sa.Column('image_urls', sa.JSON(), nullable=True),
+    sa.Column('created_at', sa.DateTime(), nullable=True),
+    sa.ForeignKeyConstraint(['chat_id'], ['chat.id'], ),
+    sa.PrimaryKeyConstraint('id')
+    )
+    with op.batch_alter_table('chat_message', schema=None) as batch_op:
+        batch_op.create_index(batch_op.f('ix_chat_message_chat_id'), ['chat_id'], unique=False)
+
+    with op.batch_alter_table('chat', schema=None) as batch_op:
+        batch_op.add_column(sa.Column('preview', sa.String(length=PREVIEW_LENGTH), nullable=True))
+        batch_op.add_column(sa.Column('message_count', sa.Integer(), server_default='0', nullable=False))
+        batch_op.add_column(sa.Column('last_message_at', sa.DateTime(), nullable=True))
+
+    connection = op.get_bind()
+    last_id = 0
+    while True:
+        chats = connection.execute(
+            sa.select(chat_table.c.id, chat_table.c.messages, chat_table.c.updated_at)
+            .where(chat_table.c.id > last_id)
+            .order_by(chat_table.c.id)
+            .limit(BATCH_SIZE)
+        ).all()
+        if not chats:
+            break
+        rows = []
+        for chat in chats:
+            messages = [m for m in (chat.messages or []) if isinstance(m, dict) and m.get('text') is not None]
+            rows.extend({
+                'chat_id': chat.id,
+                'sender': message.get('sender') or 'AI',
+                'text': message['text'],
+                'image_urls': message.get('image_urls'),
+                # The blob has no per-message timestamps
+                'created_at': chat.updated_at,
+            } for message in messages)
+            connection.execute(
+                chat_table.update().where(chat_table.c.id == chat.id).values(
+                    preview=messages[0]['text'][:PREVIEW_LENGTH] if messages else None,
+                    message_count=len(messages),
+                    last_message_at=chat.updated_at if messages else None,
+                )
+            )
+        if rows:
+            connection.execute(chat_message_table.insert(), rows)
+        last_id = chats[-1].id
+
+    with op.batch_alter_table('chat', schema=None) as batch_op:
+        batch_op.drop_column('messages')
+
+
+def downgrade():
+    with op.batch_alter_table('chat', schema=None) as batch_op:
+        batch_op.add_column(sa.Column('messages', sa.JSON(), nullable=True))
+
+    connection = op.get_bind()
+    last_id = 0
+    while True:
+        chat_ids = connection.execute(
+            sa.select(chat_table.c.id)
+            .where(chat_table.c.id > last_id)
+            .order_by(chat_table.c.id)
+            .limit(BATCH_SIZE)
+        ).scalars().all()
+        if not chat_ids:
+            break
+        messages = {chat_id: [] for chat_id in chat_ids}
+        for row in connection.execute(
+            sa.select(chat_message_table)
+            .where(chat_message_table.c.chat_id.in_(chat_ids))
+            .order_by(chat_message_table.c.id)
+        ):
+            message = {'sender': row.sender, 'text': row.text}
+            if row.image_urls is not None:
+                message['image_urls'] = row.image_urls
+            messages[row.chat_id].append(message)
+        for chat_id, chat_messages in messages.items():
+            connection.execute(
+                chat_table.update().where(chat_table.c.id == chat_id).values(messages=chat_messages)
+            )
+        last_id = chat_ids[-1]
+
+    with op.batch_alter_table('chat', schema=None) as batch_op:
+        batch_op.drop_column('last_message_at')
+        batch_op.drop_column('message_count')
+        batch_op.drop_column('preview')
+
+    with op.batch_alter_table('chat_message', schema=None) as batch_op:
+        batch_op.drop_index(batch_op.f('ix_chat_message_chat_id'))
+
+    op.drop_table('chat_message')
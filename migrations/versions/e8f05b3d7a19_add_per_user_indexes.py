@@ -0,0 +1,36 @@
+"""Add per-user composite indexes and a clothing_item.outfit_id index
+
+Revision ID: e8f05b3d7a19
+Revises: d41a8c6e2f57
+Create Date: 2026-10-17 16:40:52.208317
+
+"""
+from alembic import op
+
+
+# revision identifiers, used by Alembic.
+revision = 'e8f05b3d7a19'
+down_revision = 'd41a8c6e2f57'
+branch_labels = None
+depends_on = None
+
+# (table, index name, columns)
+INDEXES = [
+    ('outfit', 'ix_outfit_user_id_created_at', ['user_id', 'created_at']),
+    ('clothing_item', 'ix_clothing_item_user_id_created_at', ['user_id', 'created_at']),
+    ('clothing_item', 'ix_clothing_item_outfit_id', ['outfit_id']),
+    ('chat', 'ix_chat_user_id_updated_at', ['user_id', 'updated_at']),
+    ('recommendation_feedback', 'ix_recommendation_feedback_user_id_created_at', ['user_id', 'created_at']),
+]
+
+
+def upgrade():
+    for table, name, columns in INDEXES:
+        with op.batch_alter_table(table, schema=None) as batch_op:
+            batch_op.create_index(name, columns, unique=False)
+
+
+def downgrade():
+    for table, name, columns in reversed(INDEXES):
+        with op.batch_alter_table(table, schema=None) as batch_op:
+            batch_op.drop_index(name)
@@ -0,0 +1,83 @@
+"""Add digest to recommendation_feedback with a unique (user_id, digest) index
+
+Revision ID: f3a6d9b2c814
+Revises: e8f05b3d7a19
+Create Date: 2026-10-17 18:02:45.930617
+
+"""
+import hashlib
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = 'f3a6d9b2c814'
+down_revision = 'e8f05b3d7a19'
+branch_labels = None
+depends_on = None
+
+BATCH_SIZE = 1000
+
+feedback_table = sa.table(
+    'recommendation_feedback',
+    sa.column('id', sa.Integer),
+    sa.column('user_id', sa.Integer),
+    sa.column('recommendation', sa.Text),
+    sa.column('question', sa.Text),
+    sa.column('digest', sa.String),
+    sa.column('created_at', sa.DateTime),
+)
+
+
+def feedback_digest(recommendation, question):
+    # Same as models.feedback_digest at the time of this migration
+    normalized = '\x1f'.join(' '.join((text or '').split()) for text in (recommendation, question))
+    return hashlib.sha1(normalized.encode('utf-8')).hexdigest()
+
+
+def upgrade():
+    with op.batch_alter_table('recommendation_feedback', schema=None) as batch_op:
+        batch_op.add_column(sa.Column('digest', sa.String(length=40), nullable=True))
+
+    connection = op.get_bind()
+    last_id = 0
+    while True:
+        rows = connection.execute(
+            sa.select(feedback_table.c.id, feedback_table.c.recommendation, feedback_table.c.question)
+            .where(feedback_table.c.id > last_id)
+            .order_by(feedback_table.c.id)
+            .limit(BATCH_SIZE)
+        ).all()
+        if not rows:
+            break
+        for row in rows:
+            connection.execute(
+                feedback_table.update().where(feedback_table.c.id == row.id)
+                .values(digest=feedback_digest(row.recommendation, row.question))
+            )
+        last_id = rows[-1].id
+
+    # Keep only the most recent entry for each (user_id, digest)
+    duplicates = connection.execute(
+        sa.select(feedback_table.c.user_id, feedback_table.c.digest)
+        .group_by(feedback_table.c.user_id, feedback_table.c.digest)
+        .having(sa.func.count() > 1)
+    ).all()
+    for user_id, digest in duplicates:
+        ids = connection.execute(
+            sa.select(feedback_table.c.id)
+            .where(feedback_table.c.user_id == user_id, feedback_table.c.digest == digest)
+            .order_by(feedback_table.c.created_at.desc(), feedback_table.c.id.desc())
+        ).scalars().all()
+        connection.execute(feedback_table.delete().where(feedback_table.c.id.in_(ids[1:])))
+
+    with op.batch_alter_table('recommendation_feedback', schema=None) as batch_op:
+        batch_op.alter_column('digest', existing_type=sa.String(length=40), nullable=False)
+        batch_op.create_index('uq_recommendation_feedback_user_id_digest', ['user_id', 'digest'], unique=True)
+
+
+def downgrade():
+    with op.batch_alter_table('recommendation_feedback', schema=None) as batch_op:
+        batch_op.drop_index('uq_recommendation_feedback_user_id_digest')
+        batch_op.drop_column('digest')
@@ -1,10 +1,30 @@
+from flask import url_for, has_request_context
 from flask_sqlalchemy import SQLAlchemy
 from flask_login import UserMixin
 from datetime import datetime
+import hashlib
 from werkzeug.security import generate_password_hash, check_password_hash
 
 db = SQLAlchemy()
 
+IMAGE_SIZES = ('thumb', 'medium', 'full')
+
+def image_urls_for(image_url):
+    """Map an upload URL (/static/uploads/<user_id>/<file>) to its resized image URLs."""
+    if not image_url:
+        return None
+    parts = image_url.rstrip('/').split('/')
+    if len(parts) < 2 or not parts[-2].isdigit():
+        return {size: image_url for size in IMAGE_SIZES}
+    user_id, filename = int(parts[-2]), parts[-1]
+    if not has_request_context():
+        # Background workers have no request to build URLs from
+        return {size: f"/media/{user_id}/{size}/{filename}" for size in IMAGE_SIZES}
+    return {
+        size: url_for('outfits.media', user_id=user_id, size=size, filename=filename)
+        for size in IMAGE_SIZES
+    }
+
 class User(UserMixin, db.Model):
     id = db.Column(db.Integer, primary_key=True)
     username = db.Column(db.String(80), unique=True, nullable=False)
@@ -15,6 +35,8 @@ class User(UserMixin, db.Model):
     gender = db.Column(db.String(20))
     preferences = db.Column(db.JSON)
     ai_notes = db.Column(db.Text)  # Add AI notes field
+    # Bumped on every wardrobe, preferences or feedback change; part of the recommendation cache key
+    content_version = db.Column(db.Integer, nullable=False, default=0, server_default='0')
     outfits = db.relationship('Outfit', backref='user', lazy=True)
     chats = db.relationship('Chat', backref='user', lazy=True)
     feedback = db.relationship('RecommendationFeedback', backref='user', lazy=True)
@@ -25,36 +47,145 @@ class User(UserMixin, db.Model):
     def check_password(self, password):
         return check_password_hash(self.password_hash, password)
 
+def bump_content_version(user_id):
+    """Invalidate the user's cached recommendations.
+
+    The increment runs in SQL, so concurrent writers can't lose an update,
+    and is committed together with the caller's change.
+    """
+    User.query.filter_by(id=user_id).update(
+        {User.content_version: User.content_version + 1},
+        synchronize_session=False
+    )
+
 class Outfit(db.Model):
+    __table_args__ = (
+        db.Index('ix_outfit_user_id_created_at', 'user_id', 'created_at'),
+    )
+
     id = db.Column(db.Integer, primary_key=True)
     user_id = db.Column(db.Integer, db.ForeignKey('user.id'), nullable=False)
     image_url = db.Column(db.String(255))
+    image_hash = db.Column(db.String(64), index=True)  # SHA-256 of the uploaded image bytes
     analysis = db.Column(db.Text)
     items = db.Column(db.JSON)
     occasion = db.Column(db.String(50))
     weather = db.Column(db.JSON)
     created_at = db.Column(db.DateTime, default=datetime.utcnow)
     rating = db.Column(db.Integer)
+    # Lazy by default; list views load it for a whole page at once with selectinload
+    clothing_items = db.relationship('ClothingItem', backref='outfit', lazy='select', order_by='ClothingItem.id')
+
+    @property
+    def image_urls(self):
+        return image_urls_for(self.image_url)
+
+    def to_dict(self):
+        return {
+            'id': self.id,
+            'image_url': self.image_url,
+            'image_urls': self.image_urls,
+            'analysis': self.analysis,
+            'items': self.items,
+            'occasion': self.occasion,
+            'weather': self.weather,
+            'rating': self.rating,
+            'created_at': self.created_at.isoformat() if self.created_at else None
+        }
+
+# Characters of the first message shown in the chat history list
+CHAT_PREVIEW_LENGTH = 50
 
 class Chat(db.Model):
+    __table_args__ = (
+        db.Index('ix_chat_user_id_updated_at', 'user_id', 'updated_at'),
+    )
+
     id = db.Column(db.Integer, primary_key=True)
     user_id = db.Column(db.Integer, db.ForeignKey('user.id'), nullable=False)
-    messages = db.Column(db.JSON)  # List of messages with sender and text
+    # Kept in sync by append_messages so listing chats never reads their messages
+    preview = db.Column(db.String(CHAT_PREVIEW_LENGTH))
+    message_count = db.Column(db.Integer, nullable=False, default=0, server_default='0')
+    last_message_at = db.Column(db.DateTime)
     created_at = db.Column(db.DateTime, default=datetime.utcnow)
     updated_at = db.Column(db.DateTime, default=datetime.utcnow, onupdate=datetime.utcnow)
 
+    def append_messages(self, messages):
+        """Add messages (dicts with sender, text and optional image_urls) to the chat.
+
+        Earlier messages are never rewritten: each message is a new
+        ChatMessage row and the counters are bumped in SQL, so concurrent
+        turns on the same chat can't overwrite each other. The caller
+        commits.
+        """
+        now = datetime.utcnow()
+        if self.id is None:
+            self.preview = messages[0]['text'][:CHAT_PREVIEW_LENGTH]
+            db.session.add(self)
+            db.session.flush()
+        for message in messages:
+            db.session.add(ChatMessage(
+                chat_id=self.id,
+                sender=message['sender'],
+                text=message['text'],
+                image_urls=message.get('image_urls'),
+                created_at=now
+            ))
+        Chat.query.filter_by(id=self.id).update({
+            Chat.message_count: Chat.message_count + len(messages),
+            Chat.last_message_at: now,
+            Chat.updated_at: now
+        }, synchronize_session=False)
+
+    def get_messages(self):
+        return ChatMessage.query.filter_by(chat_id=self.id).order_by(ChatMessage.id).all()
+
     def to_dict(self):
         return {
             'id': self.id,
-            'preview': self.messages[0]['text'][:50] + '...' if self.messages else 'New Chat',
+            'preview': self.preview + '...' if self.preview else 'New Chat',
+            'message_count': self.message_count,
             'timestamp': self.created_at.isoformat()
         }
 
+class ChatMessage(db.Model):
+    id = db.Column(db.Integer, primary_key=True)
+    chat_id = db.Column(db.Integer, db.ForeignKey('chat.id'), nullable=False, index=True)
+    sender = db.Column(db.String(10), nullable=False)  # 'You' or 'AI'
+    text = db.Column(db.Text, nullable=False)
+    image_urls = db.Column(db.JSON)  # Recommended item images on AI messages
+    created_at = db.Column(db.DateTime, default=datetime.utcnow)
+
+    def to_dict(self):
+        message = {'sender': self.sender, 'text': self.text}
+        if self.image_urls is not None:
+            message['image_urls'] = self.image_urls
+        return message
+
+def feedback_digest(recommendation, question):
+    """SHA-1 of the whitespace-normalized recommendation and question.
+
+    Feedback is looked up by this instead of comparing the full texts.
+    """
+    normalized = '\x1f'.join(' '.join((text or '').split()) for text in (recommendation, question))
+    return hashlib.sha1(normalized.encode('utf-8')).hexdigest()
+
+def _default_feedback_digest(context):
+    params = context.get_current_parameters()
+    return feedback_digest(params.get('recommendation'), params.get('question'))
+
 class RecommendationFeedback(db.Model):
+    __table_args__ = (
+        db.Index('ix_recommendation_feedback_user_id_created_at', 'user_id', 'created_at'),
+        db.Index('uq_recommendation_feedback_user_id_digest', 'user_id', 'digest', unique=True),
+    )
+
     id = db.Column(db.Integer, primary_key=True)
     user_id = db.Column(db.Integer, db.ForeignKey('user.id'), nullable=False)
     recommendation = db.Column(db.Text, nullable=False)  # The recommendation text
     question = db.Column(db.Text, nullable=False)  # The user's question that led to the recommendation
+    # feedback_digest(recommendation, question), filled in on insert
+    digest = db.Column(db.String(40), nullable=False, default=_default_feedback_digest)
     feedback = db.Column(db.String(10), nullable=False)  # 'like' or 'dislike'
     created_at = db.Column(db.DateTime, default=datetime.utcnow)
     context = db.Column(db.JSON)  # Store context like occasion, weather, etc.
@@ -70,9 +201,13 @@ class RecommendationFeedback(db.Model):
         }
 
 class ClothingItem(db.Model):
+    __table_args__ = (
+        db.Index('ix_clothing_item_user_id_created_at', 'user_id', 'created_at'),
+    )
+
     id = db.Column(db.Integer, primary_key=True)
     user_id = db.Column(db.Integer, db.ForeignKey('user.id'), nullable=False)
-    outfit_id = db.Column(db.Integer, db.ForeignKey('outfit.id'), nullable=False)
+    outfit_id = db.Column(db.Integer, db.ForeignKey('outfit.id'), nullable=False, index=True)
     type = db.Column(db.String(50))
     color = db.Column(db.String(50))
     brand = db.Column(db.String(100))
@@ -93,5 +228,6 @@ class ClothingItem(db.Model):
             'key_features': self.key_features,
             'overall_vibe': self.overall_vibe,
             'short_description': self.short_description,
-            'image_url': self.image_url
+            'image_url': self.image_url,
+            'image_urls': image_urls_for(self.image_url)
         } 
\ No newline at end of file
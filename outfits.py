@@ -1,22 +1,30 @@
-from flask import Blueprint, render_template, request, jsonify, url_for, current_app, flash, redirect
+from flask import Blueprint, render_template, request, jsonify, url_for, current_app, flash, redirect, send_file, abort
 from flask_login import login_required, current_user
 from werkzeug.utils import secure_filename
+from sqlalchemy.orm import selectinload
 import os
 from datetime import datetime
-from models import db, Outfit, ClothingItem, RecommendationFeedback, User
+from concurrent.futures import ThreadPoolExecutor
+from models import db, Outfit, ClothingItem, RecommendationFeedback, User, bump_content_version
 import base64
-from openai import OpenAI
+from utils.llm_client import chat_completion
 import json
 import logging
+import hashlib
+import threading
+from utils import upload_jobs, wardrobe_index, profiler, metrics
+from routes.profiler import profile_dir
+from utils.cache import TTLCache
+from utils.image_utils import prepare_image_for_vision, create_derivative, create_derivatives, delete_derivatives
 
 outfits = Blueprint('outfits', __name__)
 logger = logging.getLogger(__name__)
 
-def analyze_clothing_image(image_data):
+def analyze_clothing_image(image_data, mime_type='image/jpeg'):
     try:
         # Call OpenAI Vision API
-        client = OpenAI(api_key=os.getenv('OPENAI_API_KEY'))
-        response = client.chat.completions.create(
+        response = chat_completion(
+            'analyze_clothing_image',
             model="gpt-4o-mini",
             messages=[
                 {
@@ -93,7 +101,7 @@ Return the natural language description first, then the JSON array as shown abov
                         {
                             "type": "image_url",
                             "image_url": {
-                                "url": f"data:image/jpeg;base64,{base64.b64encode(image_data).decode('utf-8')}"
+                                "url": f"data:{mime_type};base64,{base64.b64encode(image_data).decode('utf-8')}"
                             }
                         }
                     ]
@@ -130,6 +138,131 @@ Return the natural language description first, then the JSON array as shown abov
         print(f"Error details: {e.__dict__ if hasattr(e, '__dict__') else 'No details available'}")
         return "Error analyzing image. Please try again.", None
 
+STRUCTURED_ITEM_FIELDS = ('name', 'type', 'style', 'color', 'brand', 'material', 'key_features', 'overall_vibe', 'short_description')
+
+STRUCTURED_ANALYSIS_PROMPT = '''Analyze all clothing items and accessories that are clearly visible in the image.
+
+Return ONLY a JSON object of this shape:
+{
+  "items": [
+    {
+      "name": "Barcelona Jersey",
+      "type": "jersey",
+      "style": "Short-sleeved sports jersey",
+      "color": "Blue with pink accents",
+      "brand": "FC Barcelona",
+      "material": "Polyester",
+      "key_features": "Barcelona logo, colorful abstract patterns",
+      "overall_vibe": "Sporty",
+      "short_description": "Likely FC Barcelona away jersey, abstract pink print."
+    }
+  ]
+}
+
+For each item:
+- name: a short title for the item (e.g., "Black Backpack", "Wireless Earbuds")
+- type: the kind of item (e.g., "t-shirt", "jeans", "hat", "shoes", "sneakers", "earbuds")
+- style: type and style (e.g., "loose-fitting crewneck t-shirt", "straight-fit cargo pants"); for shoes say what kind of shoes
+- color and material: as visible (material null if not visible)
+- brand: brand or what it's related to (if you see a Barcelona logo, it's related to Barcelona; a Nike logo, it's Nike), else null
+- key_features: design elements (e.g., "striped", "logo", "ripped knees", words on the shirt)
+- overall_vibe: e.g., "casual", "sporty", "business casual", "formal"
+- short_description: a concise, factual description (5-7 words max) of important details not already covered by the other fields, such as specific identifications (e.g., "Might be Argentina jersey b/c of colors."). No filler words.
+
+If a field is not visible, set it to null. Include accessories as well as clothes.'''
+
+def validate_structured_items(data):
+    """Validate a structured analysis response.
+
+    Returns the cleaned list of item dicts, or None if the response does not
+    match the expected shape.
+    """
+    if not isinstance(data, dict) or not isinstance(data.get('items'), list):
+        return None
+
+    items = []
+    for raw_item in data['items']:
+        if not isinstance(raw_item, dict):
+            continue
+        item = {}
+        for field in STRUCTURED_ITEM_FIELDS:
+            value = raw_item.get(field)
+            if value is None or (isinstance(value, str) and value.strip().lower() in ('', 'null', 'none')):
+                item[field] = None
+            elif isinstance(value, list):
+                item[field] = ', '.join(str(v) for v in value)
+            else:
+                item[field] = str(value).strip()
+        if not item['type']:
+            continue
+        if not item['name']:
+            item['name'] = item['type'].title()
+        items.append(item)
+
+    if data['items'] and not items:
+        return None
+    return items
+
+def format_item_bullet_points(items):
+    """Render structured items in the same <strong>/<br> format the legacy analysis uses."""
+    sections = []
+    for item in items:
+        color_material = ', '.join(v for v in (item.get('color'), item.get('material')) if v)
+        sections.append('<br>'.join([
+            f"<strong>{item['name']}:</strong>",
+            f"- Type and style: {item.get('style') or item['type']}",
+            f"- Color and material: {color_material or 'null'}",
+            f"- Key features and design elements: {item.get('key_features') or 'null'}",
+            f"- Overall vibe: {item.get('overall_vibe') or 'null'}",
+            f"- Brand or what it's related to: {item.get('brand') or 'null'}",
+        ]))
+    return '<br><br>'.join(sections)
+
+def analyze_clothing_image_structured(image_data, mime_type='image/jpeg'):
+    """Analyze an image with a single JSON-mode call.
+
+    Returns (bullet_points, items) like analyze_clothing_image, except every
+    item already carries its short_description. items is None if the
+    response did not validate. OpenAI errors (timeouts, 429s, outages) are
+    raised rather than answered with a second, legacy analysis.
+    """
+    response = chat_completion(
+        'analyze_clothing_image_structured',
+        model="gpt-4o-mini",
+        response_format={"type": "json_object"},
+        messages=[
+            {
+                "role": "system",
+                "content": "You are a precise fashion expert. You always answer with a single valid JSON object."
+            },
+            {
+                "role": "user",
+                "content": [
+                    {"type": "text", "text": STRUCTURED_ANALYSIS_PROMPT},
+                    {
+                        "type": "image_url",
+                        "image_url": {
+                            "url": f"data:{mime_type};base64,{base64.b64encode(image_data).decode('utf-8')}"
+                        }
+                    }
+                ]
+            }
+        ],
+        max_tokens=1500
+    )
+
+    content = response.choices[0].message.content
+    try:
+        items = validate_structured_items(json.loads(content))
+    except (TypeError, ValueError) as e:
+        logger.error(f"Error parsing structured analysis: {str(e)}")
+        items = None
+    if items is None:
+        logger.error(f"Invalid structured analysis response: {content}")
+        return "Error analyzing image. Please try again.", None
+
+    return format_item_bullet_points(items), items
+
 def get_item_bullet_points(bullet_points, item_type):
     """Extract bullet points for a specific item type from the full bullet points text."""
     try:
@@ -152,9 +285,8 @@ def get_item_bullet_points(bullet_points, item_type):
         print(f"Error extracting bullet points: {str(e)}")
         return None
 
-def generate_short_description(item, bullet_points):
+def generate_short_description(item, bullet_points, timeout=None):
     try:
-        client = OpenAI(api_key=os.getenv('OPENAI_API_KEY'))
         prompt = f"""Given these details about a clothing item:
         Type: {item['type']}
         Color: {item['color']}
@@ -177,13 +309,15 @@ def generate_short_description(item, bullet_points):
         
         """
         
-        response = client.chat.completions.create(
+        response = chat_completion(
+            'generate_short_description',
             model="gpt-4o-mini",
             messages=[
                 {"role": "system", "content": "You are a precise fashion expert who writes factual, concise descriptions focusing on unique and important details."},
                 {"role": "user", "content": prompt}
             ],
-            max_tokens=100
+            max_tokens=100,
+            timeout=timeout
         )
         
         return response.choices[0].message.content.strip()
@@ -191,6 +325,219 @@ def generate_short_description(item, bullet_points):
         logger.error(f"Error generating description: {str(e)}")
         return None
 
+def generate_short_descriptions(items, bullet_points, max_workers=4, timeout=20):
+    """Generate short descriptions for all items concurrently.
+
+    Returns a list aligned with `items`. An item whose call fails or takes
+    longer than `timeout` seconds gets None instead of blocking the rest.
+    The timeout applies to each OpenAI call, so time spent queued behind
+    the LLM concurrency limit doesn't count against it.
+    """
+    if not items:
+        return []
+
+    executor = ThreadPoolExecutor(max_workers=max(1, min(max_workers, len(items))))
+    try:
+        futures = [
+            executor.submit(
+                generate_short_description,
+                item,
+                # Only give the model the bullet points for this item
+                get_item_bullet_points(bullet_points, item.get('type') or ''),
+                timeout
+            )
+            for item in items
+        ]
+        descriptions = []
+        for item, future in zip(items, futures):
+            try:
+                description = future.result()
+            except Exception as e:
+                logger.error(f"Error generating description for {item.get('type')}: {str(e)}")
+                description = None
+            if description is None:
+                logger.warning(f"Storing {item.get('type')} without a short description")
+            descriptions.append(description)
+        return descriptions
+    finally:
+        executor.shutdown(wait=False)
+
+def analyze_image_with_descriptions(image_data):
+    """Run the configured analysis and return (bullet_points, items) with short descriptions."""
+    # Send a downscaled copy; the vision model doesn't need the full-size photo
+    image_data, mime_type = prepare_image_for_vision(
+        image_data,
+        max_edge=current_app.config.get('VISION_MAX_EDGE', 1024),
+        image_format=current_app.config.get('VISION_IMAGE_FORMAT', 'JPEG'),
+        quality=current_app.config.get('VISION_IMAGE_QUALITY', 85)
+    )
+
+    # Structured mode returns the short descriptions in the same call; only a
+    # response that doesn't validate falls back to the legacy calls
+    items = None
+    if current_app.config.get('ANALYSIS_MODE', 'structured') == 'structured':
+        bullet_points, items = analyze_clothing_image_structured(image_data, mime_type)
+    if items is None:
+        bullet_points, items = analyze_clothing_image(image_data, mime_type)
+        if items:
+            short_descriptions = generate_short_descriptions(
+                items,
+                bullet_points,
+                max_workers=current_app.config.get('DESCRIPTION_CONCURRENCY', 4),
+                timeout=current_app.config.get('DESCRIPTION_TIMEOUT', 20)
+            )
+            for item, short_description in zip(items, short_descriptions):
+                item['short_description'] = short_description
+    return bullet_points, items
+
+_analysis_cache = None
+_analysis_cache_lock = threading.Lock()
+
+def get_analysis_cache():
+    """Return the shared (user_id, image_hash) -> analysis cache, creating it on first use."""
+    global _analysis_cache
+    if _analysis_cache is None:
+        with _analysis_cache_lock:
+            if _analysis_cache is None:
+                _analysis_cache = TTLCache(
+                    max_entries=current_app.config.get('ANALYSIS_CACHE_SIZE', 512),
+                    ttl=current_app.config.get('ANALYSIS_CACHE_TTL', 7 * 24 * 60 * 60)
+                )
+    return _analysis_cache
+
+def _analysis_cache_stat(name):
+    # None until the first upload creates the cache, which leaves the series out of /metrics
+    return _analysis_cache.stats()[name] if _analysis_cache is not None else None
+
+# Cache hit rates, read from the analysis cache's stats() when /metrics is scraped
+for _event in ('hits', 'misses', 'evictions'):
+    metrics.counter(
+        'analysis_cache_events_total',
+        'Image analysis cache lookups by result, and evictions',
+        labels={'event': _event},
+        fn=lambda event=_event: _analysis_cache_stat(event)
+    )
+metrics.gauge('analysis_cache_entries', 'Image analyses held in the cache',
+              fn=lambda: _analysis_cache_stat('entries'))
+
+def get_cached_analysis(user_id, image_hash):
+    """Look up a previous analysis of the same image bytes for this user.
+
+    Checks the in-process cache first and then the user's stored outfits.
+    Returns (bullet_points, items) or None.
+    """
+    if not image_hash:
+        return None
+
+    cache = get_analysis_cache()
+    cached = cache.get((user_id, image_hash))
+    if cached:
+        return cached
+
+    # Skip earlier uploads of this image whose analysis failed
+    outfit = next(
+        (o for o in Outfit.query.filter_by(user_id=user_id, image_hash=image_hash)
+            .order_by(Outfit.created_at.desc()) if o.items is not None),
+        None
+    )
+    if not outfit:
+        return None
+
+    clothing_items = outfit.clothing_items
+    if clothing_items:
+        items = [
+            {
+                'type': item.type,
+                'color': item.color,
+                'brand': item.brand,
+                'material': item.material,
+                'key_features': item.key_features,
+                'overall_vibe': item.overall_vibe,
+                'short_description': item.short_description
+            }
+            for item in clothing_items
+        ]
+    else:
+        items = outfit.items
+    metrics.counter(
+        'analysis_cache_db_hits_total',
+        'Image analyses reused from a stored outfit after missing the cache'
+    ).inc()
+    cache.set((user_id, image_hash), (outfit.analysis, items))
+    return outfit.analysis, items
+
+def process_outfit_image(task):
+    """Analyze one saved upload and store the Outfit and its ClothingItems.
+
+    Runs on the upload worker pool inside an application context.
+    """
+    user_id = task['user_id']
+    image_url = task['image_url']
+    try:
+        with open(task['filepath'], 'rb') as img_file:
+            image_data = img_file.read()
+
+        # Resized copies for the gallery so it doesn't load full-size photos
+        create_derivatives(task['filepath'], get_image_sizes())
+
+        # Re-uploads of the same photo reuse the earlier analysis
+        image_hash = task.get('image_hash')
+        cached = get_cached_analysis(user_id, image_hash)
+        if cached:
+            bullet_points, items = cached
+            items = [dict(item) for item in items] if items else items
+            logger.info(f"[ANALYSIS CACHE HIT] {image_hash} for user {user_id}")
+        else:
+            bullet_points, items = analyze_image_with_descriptions(image_data)
+            if items is not None and image_hash:
+                get_analysis_cache().set((user_id, image_hash), (bullet_points, items))
+
+        # Create the outfit
+        outfit = Outfit(
+            user_id=user_id,
+            image_url=image_url,
+            image_hash=image_hash,
+            analysis=bullet_points,
+            items=items,
+            created_at=datetime.utcnow()
+        )
+        db.session.add(outfit)
+        db.session.flush()  # Get the outfit ID
+
+        # Create clothing items
+        clothing_items = []
+        if items:
+            for item in items:
+                clothing_item = ClothingItem(
+                    user_id=user_id,
+                    outfit_id=outfit.id,
+                    type=item.get('type'),
+                    color=item.get('color'),
+                    brand=item.get('brand'),
+                    material=item.get('material'),
+                    key_features=item.get('key_features'),
+                    overall_vibe=item.get('overall_vibe'),
+                    short_description=item.get('short_description'),
+                    image_url=outfit.image_url,  # Store the image link directly in the clothing_item table
+                    created_at=datetime.utcnow()
+                )
+                db.session.add(clothing_item)
+                clothing_items.append(clothing_item)
+
+        bump_content_version(user_id)
+        db.session.commit()
+        wardrobe_index.add_items(user_id, clothing_items)
+        return {
+            'message': 'Image uploaded successfully',
+            'analysis': bullet_points,
+            'items': items,
+            'image_url': outfit.image_url
+        }
+    except Exception:
+        db.session.rollback()
+        # The file is kept, but no Outfit is added; the job records the error
+        raise
+
 @outfits.route('/upload', methods=['POST'])
 @login_required
 def upload_clothing():
@@ -201,88 +548,103 @@ def upload_clothing():
     if not files or files[0].filename == '':
         return jsonify({'error': 'No selected file'}), 400
 
-    uploaded_files = []
+    # Save the files now and leave the OpenAI calls to the upload worker pool
+    tasks = []
     for file in files:
         if file and file.filename:
             try:
-                filename = secure_filename(file.filename)
+                image_data = file.read()
+                image_hash = hashlib.sha256(image_data).hexdigest()
+                # Name files by content so re-uploads of the same photo share one file
+                extension = os.path.splitext(secure_filename(file.filename))[1].lower()
+                filename = f"{image_hash[:32]}{extension}"
                 # Create user-specific upload directory
                 user_upload_dir = os.path.join(current_app.config['UPLOAD_FOLDER'], str(current_user.id))
                 os.makedirs(user_upload_dir, exist_ok=True)
                 
                 # Save file
                 filepath = os.path.join(user_upload_dir, filename)
-                file.save(filepath)
-                
-                # Process image with OpenAI Vision API
-                try:
-                    with open(filepath, 'rb') as img_file:
-                        bullet_points, items = analyze_clothing_image(img_file.read())
-                        
-                        # Create the outfit
-                        outfit = Outfit(
-                            user_id=current_user.id,
-                            image_url=url_for('static', filename=f'uploads/{current_user.id}/{filename}'),
-                            analysis=bullet_points,
-                            items=items,
-                            created_at=datetime.utcnow()
-                        )
-                        db.session.add(outfit)
-                        db.session.flush()  # Get the outfit ID
-                        
-                        # Create clothing items
-                        if items:
-                            for item in items:
-                                # Get bullet points specific to this item
-                                item_bullet_points = get_item_bullet_points(bullet_points, item.get('type', ''))
-                                # Generate short description using only this item's bullet points
-                                short_description = generate_short_description(item, item_bullet_points)
-                                print(f"Short description: {short_description}")
-                                
-                                clothing_item = ClothingItem(
-                                    user_id=current_user.id,
-                                    outfit_id=outfit.id,
-                                    type=item.get('type'),
-                                    color=item.get('color'),
-                                    brand=item.get('brand'),
-                                    material=item.get('material'),
-                                    key_features=item.get('key_features'),
-                                    overall_vibe=item.get('overall_vibe'),
-                                    short_description=short_description,
-                                    image_url=outfit.image_url,  # Store the image link directly in the clothing_item table
-                                    created_at=datetime.utcnow()
-                                )
-                                db.session.add(clothing_item)
-                        
-                        uploaded_files.append({
-                            'message': 'Image uploaded successfully',
-                            'analysis': bullet_points,
-                            'items': items,
-                            'image_url': outfit.image_url
-                        })
-                except Exception as e:
-                    print(f"Error processing image: {str(e)}")
-                    # If there's an error processing the image, still save the file, but do NOT add another Outfit
-                    uploaded_files.append({
-                        'message': 'Image uploaded successfully (processing failed)',
-                        'image_url': url_for('static', filename=f'uploads/{current_user.id}/{filename}')
-                    })
+                if not os.path.exists(filepath):
+                    with open(filepath, 'wb') as out_file:
+                        out_file.write(image_data)
+                tasks.append({
+                    'user_id': current_user.id,
+                    'filepath': filepath,
+                    'image_hash': image_hash,
+                    'image_url': url_for('static', filename=f'uploads/{current_user.id}/{filename}')
+                })
             except Exception as e:
                 print(f"Error saving file: {str(e)}")
                 return jsonify({'error': f'Error saving file: {str(e)}'}), 500
     
-    if uploaded_files:
-        try:
-            db.session.commit()
-            return jsonify({
-                'message': f'Successfully uploaded {len(uploaded_files)} images',
-                'files': uploaded_files
-            })
-        except Exception as e:
-            db.session.rollback()
-            return jsonify({'error': f'Database error: {str(e)}'}), 500
-    
-    return jsonify({'error': 'No valid files uploaded'}), 400
+    if not tasks:
+        return jsonify({'error': 'No valid files uploaded'}), 400
+
+    job_id = upload_jobs.create_job(current_user.id, len(tasks))
+    # When this request is profiled, so is the analysis of each image on the upload workers
+    process_file = profiler.follow(process_outfit_image, profile_dir(), 'upload-task')
+    upload_jobs.submit_job(current_app._get_current_object(), job_id, process_file, tasks)
+    return jsonify({
+        'message': f'Processing {len(tasks)} images',
+        'job_id': job_id,
+        'status_url': url_for('outfits.upload_status', job_id=job_id)
+    }), 202
+
+@outfits.route('/upload-status/<job_id>')
+@login_required
+def upload_status(job_id):
+    job = upload_jobs.get_job(job_id)
+    if not job or job['user_id'] != current_user.id:
+        return jsonify({'error': 'Job not found'}), 404
+
+    response = {
+        'job_id': job['id'],
+        'status': job['status'],
+        'total': job['total'],
+        'completed': job['completed'],
+        'files': job['files']
+    }
+    failed = sum(1 for result in job['files'] if result.get('error'))
+    if job['status'] == 'done' and not failed:
+        response['message'] = f"Successfully uploaded {job['total']} images"
+    elif job['status'] == 'done':
+        response['message'] = f"Uploaded {job['total']} images, {failed} could not be analyzed"
+    if job['error']:
+        response['error'] = job['error']
+    return jsonify(response)
+
+def get_image_sizes():
+    """Configured derivative sizes as {name: long edge in px}."""
+    return {
+        'thumb': current_app.config.get('THUMBNAIL_SIZE', 400),
+        'medium': current_app.config.get('MEDIUM_IMAGE_SIZE', 1024)
+    }
+
+@outfits.route('/media/<int:user_id>/<size>/<filename>')
+def media(user_id, size, filename):
+    """Serve an upload or one of its resized copies, creating the copy on first request."""
+    sizes = get_image_sizes()
+    if size != 'full' and size not in sizes:
+        abort(404)
+
+    image_path = os.path.join(current_app.config['UPLOAD_FOLDER'], str(user_id), secure_filename(filename))
+    if not os.path.exists(image_path):
+        abort(404)
+    if size != 'full':
+        image_path = create_derivative(image_path, size, sizes[size])
+        if not image_path:
+            abort(404)
+
+    # Upload filenames are content hashes, so the files never change
+    response = send_file(
+        os.path.abspath(image_path),
+        max_age=current_app.config.get('IMAGE_CACHE_MAX_AGE', 365 * 24 * 60 * 60),
+        conditional=True,
+        etag=True
+    )
+    response.cache_control.public = True
+    response.cache_control.immutable = True
+    return response
 
 @outfits.route('/my-outfits')
 @login_required
@@ -294,17 +656,12 @@ def my_outfits():
         per_page = 6  # Number of items per page
         
         # Get outfits for the current user with pagination
+        # Clothing items for the whole page come from one extra query
         outfits_pagination = Outfit.query.filter_by(user_id=current_user.id)\
+            .options(selectinload(Outfit.clothing_items))\
             .order_by(Outfit.created_at.desc())\
             .paginate(page=page, per_page=per_page, error_out=False)
         
-        # Get clothing items for each outfit
-        for outfit in outfits_pagination.items:
-            clothing_items = ClothingItem.query.filter_by(outfit_id=outfit.id).all()
-            print(f"Clothing items for outfit {outfit.id}: {clothing_items}")
-            if clothing_items:
-                outfit.items = [item.to_dict() for item in clothing_items]
-        
         # Check if the uploads directory exists
         uploads_dir = os.path.join(current_app.root_path, 'static', 'uploads', str(current_user.id))
         if not os.path.exists(uploads_dir):
@@ -332,8 +689,12 @@ def delete_outfit(outfit_id):
             print(f"Unauthorized: outfit belongs to user {outfit.user_id}, current user is {current_user.id}")
             return jsonify({'error': 'Unauthorized'}), 403
         
-        # Delete the image file
-        if outfit.image_url:
+        # Delete the image file, unless another upload of the same photo still uses it
+        shared = outfit.image_url and Outfit.query.filter(
+            Outfit.image_url == outfit.image_url,
+            Outfit.id != outfit.id
+        ).first() is not None
+        if outfit.image_url and not shared:
             try:
                 # Convert URL to filesystem path
                 image_path = os.path.join(current_app.root_path, outfit.image_url.lstrip('/'))
@@ -341,6 +702,7 @@ def delete_outfit(outfit_id):
                 if os.path.exists(image_path):
                     os.remove(image_path)
                     print(f"Successfully deleted image file: {image_path}")
+                    delete_derivatives(image_path)
                 else:
                     print(f"Image file not found: {image_path}")
             except Exception as e:
@@ -348,13 +710,16 @@ def delete_outfit(outfit_id):
                 # Continue with database deletion even if file deletion fails
         
         # Delete all related clothing items
+        item_ids = [item_id for (item_id,) in ClothingItem.query.with_entities(ClothingItem.id).filter_by(outfit_id=outfit.id)]
         ClothingItem.query.filter_by(outfit_id=outfit.id).delete()
         print(f"Deleted all clothing items for outfit {outfit.id}")
         
         # Delete from database
         print("Deleting outfit from database")
         db.session.delete(outfit)
+        bump_content_version(current_user.id)
         db.session.commit()
+        wardrobe_index.remove_items(current_user.id, item_ids)
         print("Successfully deleted outfit from database")
         
         return jsonify({'message': 'Outfit deleted successfully'})
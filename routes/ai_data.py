@@ -1,6 +1,8 @@
 from flask import Blueprint, render_template, request, jsonify, session
 from flask_login import login_required, current_user
-from models import db, Outfit, RecommendationFeedback
+from models import db, Outfit, RecommendationFeedback, bump_content_version, feedback_digest
+from utils.db_utils import upsert
+from utils.weather_utils import get_location_weather
 from datetime import datetime
 import logging
 
@@ -25,9 +27,9 @@ def ai_data():
         .order_by(RecommendationFeedback.created_at.desc())\
         .paginate(page=feedback_page, per_page=per_page, error_out=False)
     
-    # Get location and weather from session
+    # Get location from session and its weather from the weather cache
     location = session.get('location')
-    weather = session.get('weather_data')
+    weather = get_location_weather(location)
     
     return render_template('ai_data.html',
                          outfits=outfits_pagination.items,
@@ -46,6 +48,7 @@ def update_ai_notes():
         notes = data.get('notes', '').strip()
         
         current_user.ai_notes = notes
+        bump_content_version(current_user.id)
         db.session.commit()
         
         return jsonify({'message': 'Notes updated successfully'})
@@ -73,15 +76,17 @@ def save_recommendation_feedback():
             logger.error("No question provided")
             return jsonify({'error': 'No question provided'}), 400
             
+        # Entries are found through the (user_id, digest) unique index
+        digest = feedback_digest(recommendation, question)
+
         if feedback == 'remove':
             # Remove feedback entry if it exists
-            existing_feedback = RecommendationFeedback.query.filter_by(
+            removed = RecommendationFeedback.query.filter_by(
                 user_id=current_user.id,
-                recommendation=recommendation,
-                question=question
-            ).first()
-            if existing_feedback:
-                db.session.delete(existing_feedback)
+                digest=digest
+            ).delete(synchronize_session=False)
+            if removed:
+                bump_content_version(current_user.id)
                 db.session.commit()
                 logger.info(f"Deleted feedback for user {current_user.id}")
                 return jsonify({'message': 'Feedback removed successfully'})
@@ -93,30 +98,24 @@ def save_recommendation_feedback():
             return jsonify({'error': 'Invalid feedback value'}), 400
         
         try:
-            # Check if feedback already exists for this recommendation
-            existing_feedback = RecommendationFeedback.query.filter_by(
-                user_id=current_user.id,
-                recommendation=recommendation
-            ).first()
-            
-            if existing_feedback:
-                # Update existing feedback
-                existing_feedback.feedback = feedback
-                existing_feedback.context = context
-                existing_feedback.created_at = datetime.utcnow()
-                logger.info(f"Updated existing feedback for user {current_user.id}")
-            else:
-                # Create new feedback
-                feedback_entry = RecommendationFeedback(
-                    user_id=current_user.id,
-                    recommendation=recommendation,
-                    question=question,
-                    feedback=feedback,
-                    context=context
-                )
-                db.session.add(feedback_entry)
-                logger.info(f"Created new feedback for user {current_user.id}")
+            # Create the entry, or update the existing one for this recommendation and question
+            upsert(
+                RecommendationFeedback,
+                {
+                    'user_id': current_user.id,
+                    'digest': digest,
+                    'recommendation': recommendation,
+                    'question': question,
+                    'feedback': feedback,
+                    'context': context,
+                    'created_at': datetime.utcnow()
+                },
+                index_elements=['user_id', 'digest'],
+                update_fields=['feedback', 'context', 'created_at']
+            )
+            logger.info(f"Saved feedback for user {current_user.id}")
             
+            bump_content_version(current_user.id)
             db.session.commit()
             return jsonify({'message': 'Feedback saved successfully'})
         except Exception as db_error:
@@ -137,6 +136,7 @@ def delete_recommendation_feedback(feedback_id):
             return jsonify({'error': 'Unauthorized'}), 403
             
         db.session.delete(feedback)
+        bump_content_version(current_user.id)
         db.session.commit()
         return jsonify({'message': 'Feedback deleted successfully'})
     except Exception as e:
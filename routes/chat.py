@@ -1,14 +1,18 @@
-from flask import Blueprint, render_template, request, jsonify
+from flask import Blueprint, render_template, request, jsonify, session, current_app, Response, stream_with_context
 from flask_login import login_required, current_user
-from models import db, Outfit, Chat, RecommendationFeedback
+from models import db, Outfit, Chat, ChatMessage, RecommendationFeedback
 import json
-from openai import OpenAI
+import logging
+import re
+from utils.llm_client import chat_completion, stream_chat_completion
+from utils.context_builder import build_wardrobe_context, compact_json
+from utils import wardrobe_index, profiler
+from utils.weather_utils import get_location_weather
 import os
 from datetime import datetime
 
 chat_bp = Blueprint('chat', __name__)
-
-client = OpenAI(api_key=os.getenv('OPENAI_API_KEY'))
+logger = logging.getLogger(__name__)
 
 @chat_bp.route('/chat')
 @login_required
@@ -37,7 +41,7 @@ def get_chat(chat_id):
     if chat.user_id != current_user.id:
         return jsonify({'error': 'Unauthorized'}), 403
     return jsonify({
-        'messages': chat.messages
+        'messages': [message.to_dict() for message in chat.get_messages()]
     })
 
 @chat_bp.route('/chat/<int:chat_id>', methods=['DELETE'])
@@ -47,6 +51,7 @@ def delete_chat(chat_id):
         chat = Chat.query.get_or_404(chat_id)
         if chat.user_id != current_user.id:
             return jsonify({'error': 'Unauthorized'}), 403
+        ChatMessage.query.filter_by(chat_id=chat.id).delete()
         db.session.delete(chat)
         db.session.commit()
         return jsonify({'message': 'Chat deleted successfully'})
@@ -54,6 +59,137 @@ def delete_chat(chat_id):
         db.session.rollback()
         return jsonify({'error': str(e)}), 500
 
+# Ends the answer text of a streamed reply; a JSON list of image URLs follows it
+IMAGE_URLS_MARKER = 'IMAGE_URLS:'
+
+CHAT_SYSTEM_PROMPT = "You are a concise fashion assistant. Keep responses to 1-2 sentences maximum. Always format your response as valid JSON with 'response' and 'image_urls' fields."
+STREAM_SYSTEM_PROMPT = f"You are a concise fashion assistant. Keep responses to 1-2 sentences maximum. Answer in plain text, then end with a line starting with {IMAGE_URLS_MARKER} followed by a JSON list of image URLs."
+
+def build_chat_context(message):
+    """Only the outfits and feedback most relevant to this question go in
+    the prompt, within CHAT_CONTEXT_TOKEN_BUDGET tokens."""
+    max_candidates = current_app.config.get('CHAT_CONTEXT_MAX_CANDIDATES', 500)
+    user_outfits = Outfit.query.filter_by(user_id=current_user.id)\
+        .order_by(Outfit.created_at.desc())\
+        .limit(max_candidates).all()
+    feedback = RecommendationFeedback.query.filter_by(user_id=current_user.id)\
+        .order_by(RecommendationFeedback.created_at.desc())\
+        .limit(max_candidates).all()
+    relevant_items = wardrobe_index.retrieve_items(
+        current_user.id,
+        message,
+        k=current_app.config.get('WARDROBE_RETRIEVAL_K', 20)
+    )
+    outfits_info, feedback_info = build_wardrobe_context(
+        message,
+        user_outfits,
+        feedback,
+        budget_tokens=current_app.config.get('CHAT_CONTEXT_TOKEN_BUDGET', 3000),
+        weather=get_location_weather(session.get('location')),
+        items=relevant_items
+    )
+    logger.debug(f"Chat context: {len(outfits_info)}/{len(user_outfits)} outfits, {len(feedback_info)}/{len(feedback)} feedback")
+    return outfits_info, feedback_info
+
+def build_chat_prompt(message, wardrobe_only, outfits_info, feedback_info, stream=False):
+    """Create a prompt for the AI based on the mode.
+
+    Streamed replies are plain text followed by an IMAGE_URLS_MARKER line
+    instead of JSON, so the text can be shown as it is generated.
+    """
+    if wardrobe_only:
+        intro = f"""As an AI fashion assistant, help the user with their outfit question: \"{message}\"\n\nUser's uploaded clothes:\n{compact_json(outfits_info)}\n\nUser's preferences and measurements:\n{compact_json(current_user.preferences)}\nHeight: {current_user.height}inches\nWeight: {current_user.weight}lbs\nGender: {current_user.gender}\n\nUser's AI Notes:\n{current_user.ai_notes or 'No additional notes provided.'}\n\nUser's past feedback on recommendations:\n{compact_json(feedback_info)}\n\nIMPORTANT: \n1. Only recommend outfits using the clothes the user has already uploaded.\n2. Consider the user's past feedback when making recommendations.\n3. Try to avoid recommending similar outfits that were previously disliked.\n4. Prioritize styles and combinations that were previously liked."""
+        if stream:
+            tail = f"""\n\nPlease provide a VERY SHORT response (1-2 sentences maximum) that:\n1. Directly answers their question\n2. References specific items from their uploaded clothes\n\nWrite the answer as plain text, not JSON. Then, on a new last line, write {IMAGE_URLS_MARKER} followed by a JSON list of the image_url of each recommended item, for example:\n{IMAGE_URLS_MARKER} ["/static/uploads/1/example.jpg"]\n\nResponse:"""
+        else:
+            tail = f"""\n\nPlease provide a VERY SHORT response (1-2 sentences maximum) that:\n1. Directly answers their question\n2. References specific items from their uploaded clothes\n3. Includes the image_url of the recommended items\n\nFormat your response as JSON with two fields:\n1. \"response\": your short answer\n2. \"image_urls\": list of image URLs for the recommended items\n\nResponse:"""
+    else:
+        intro = f"""As an AI fashion assistant, help the user with their outfit question: \"{message}\"\n\nUser's uploaded clothes:\n{compact_json(outfits_info)}\n\nUser's preferences and measurements:\n{compact_json(current_user.preferences)}\nHeight: {current_user.height}inches\nWeight: {current_user.weight}lbs\nGender: {current_user.gender}\n\nUser's AI Notes:\n{current_user.ai_notes or 'No additional notes provided.'}\n\nUser's past feedback on recommendations:\n{compact_json(feedback_info)}\n\nYou can recommend both items the user owns and items they don't own yet. When suggesting items they don't own, clearly indicate this in your response.\n\nIMPORTANT: \n1. Consider the user's past feedback when making recommendations.\n2. Try to avoid recommending similar outfits that were previously disliked.\n3. Prioritize styles and combinations that were previously liked."""
+        if stream:
+            tail = f"""\n\nPlease provide a VERY SHORT response (1-2 sentences maximum) that:\n1. Directly answers their question\n2. References specific items from their uploaded clothes (if applicable)\n3. Suggests additional items they don't own (if relevant)\n\nWrite the answer as plain text, not JSON. Then, on a new last line, write {IMAGE_URLS_MARKER} followed by a JSON list of the image_url of any recommended items they own ([] if none), for example:\n{IMAGE_URLS_MARKER} ["/static/uploads/1/example.jpg"]\n\nResponse:"""
+        else:
+            tail = f"""\n\nPlease provide a VERY SHORT response (1-2 sentences maximum) that:\n1. Directly answers their question\n2. References specific items from their uploaded clothes (if applicable)\n3. Suggests additional items they don't own (if relevant)\n4. Includes the image_url of any recommended items they own\n\nIMPORTANT: Your response MUST be in valid JSON format with these exact fields:\n{{\n    \"response\": \"your short answer here\",\n    \"image_urls\": [\"list\", \"of\", \"image\", \"urls\", \"from\", \"user's\", \"wardrobe\"]\n}}\n\nResponse:"""
+    return intro + tail
+
+def split_image_urls(text):
+    """Split a streamed reply into its answer text and image URL list."""
+    answer, _, trailer = text.partition(IMAGE_URLS_MARKER)
+    image_urls = []
+    if trailer.strip():
+        try:
+            image_urls = json.loads(trailer.strip())
+        except json.JSONDecodeError:
+            image_urls = re.findall(r'[^\s"\',\[\]]+\.(?:jpe?g|png|gif|webp)', trailer)
+        if not isinstance(image_urls, list):
+            image_urls = []
+    return answer.strip(), [url for url in image_urls if isinstance(url, str)]
+
+def get_or_create_chat(chat_id, user_id):
+    if chat_id:
+        chat = Chat.query.get(chat_id)
+        if chat and chat.user_id == user_id:
+            return chat
+    return Chat(user_id=user_id)
+
+def sse_event(event, data):
+    return f"event: {event}\ndata: {json.dumps(data)}\n\n"
+
+def stream_chat_message(message, chat_id, prompt):
+    """Forward the reply to the browser as Server-Sent Events.
+
+    Events: 'token' ({text}) for each piece of the answer, then
+    'image_urls' ({image_urls}) and 'done' ({chat_id, response}) once the
+    Chat has been saved, or 'error' ({error}).
+    """
+    user_id = current_user.id
+
+    def generate():
+        reply = ''
+        sent = 0
+        try:
+            for delta in stream_chat_completion(
+                'chat_message',
+                model="gpt-4o-mini",
+                messages=[
+                    {"role": "system", "content": STREAM_SYSTEM_PROMPT},
+                    {"role": "user", "content": prompt}
+                ],
+                max_tokens=150
+            ):
+                reply += delta
+                # Hold back anything that could be the start of the marker
+                marker_at = reply.find(IMAGE_URLS_MARKER)
+                safe = marker_at if marker_at != -1 else len(reply) - len(IMAGE_URLS_MARKER) + 1
+                if safe > sent:
+                    yield sse_event('token', {'text': reply[sent:safe]})
+                    sent = safe
+        except Exception as e:
+            print(f"Error streaming chat response: {str(e)}")
+            yield sse_event('error', {'error': str(e)})
+            return
+
+        answer, image_urls = split_image_urls(reply)
+        yield sse_event('image_urls', {'image_urls': image_urls})
+
+        try:
+            chat = get_or_create_chat(chat_id, user_id)
+            chat.append_messages([
+                {'sender': 'You', 'text': message},
+                {'sender': 'AI', 'text': answer, 'image_urls': image_urls}
+            ])
+            db.session.commit()
+            yield sse_event('done', {'chat_id': chat.id, 'response': answer})
+        except Exception as e:
+            db.session.rollback()
+            print(f"Error saving streamed chat: {str(e)}")
+            yield sse_event('error', {'error': str(e)})
+
+    return Response(
+        stream_with_context(generate()),
+        mimetype='text/event-stream',
+        headers={'Cache-Control': 'no-cache', 'X-Accel-Buffering': 'no'}
+    )
+
 @chat_bp.route('/chat', methods=['POST'])
 @login_required
 def chat_message():
@@ -61,46 +197,28 @@ def chat_message():
     message = data.get('message', '').strip()
     chat_id = data.get('chat_id')  # Get chat_id from request if it exists
     wardrobe_only = data.get('wardrobe_only', False)  # Get wardrobe_only flag
+    stream = data.get('stream', False)  # Reply as Server-Sent Events
     print(f"wardrobe_only: {wardrobe_only}")
     
     if not message:
         return jsonify({'error': 'Message is required'}), 400
 
     try:
-        # Get user's uploaded outfits
-        user_outfits = Outfit.query.filter_by(user_id=current_user.id).all()
-        print(f"user_outfits: {user_outfits}")
-        outfits_info = []
-        for outfit in user_outfits:
-            outfits_info.append({
-                'image_url': outfit.image_url,
-                'analysis': outfit.analysis,
-                'occasion': outfit.occasion,
-                'weather': outfit.weather
-            })
-
-        # Get user's past feedback
-        feedback = RecommendationFeedback.query.filter_by(user_id=current_user.id).all()
-        feedback_info = []
-        for entry in feedback:
-            feedback_info.append({
-                'recommendation': entry.recommendation,
-                'feedback': entry.feedback,
-                'context': entry.context
-            })
-
-        # Create a prompt for the AI based on the mode
+        with profiler.section('chat_context'):
+            outfits_info, feedback_info = build_chat_context(message)
+
         print(f"wardrobe_only: {wardrobe_only}")
-        if wardrobe_only:
-            prompt = f"""As an AI fashion assistant, help the user with their outfit question: \"{message}\"\n\nUser's uploaded clothes:\n{json.dumps(outfits_info, indent=2)}\n\nUser's preferences and measurements:\n{json.dumps(current_user.preferences, indent=2)}\nHeight: {current_user.height}inches\nWeight: {current_user.weight}lbs\nGender: {current_user.gender}\n\nUser's AI Notes:\n{current_user.ai_notes or 'No additional notes provided.'}\n\nUser's past feedback on recommendations:\n{json.dumps(feedback_info, indent=2)}\n\nIMPORTANT: \n1. Only recommend outfits using the clothes the user has already uploaded.\n2. Consider the user's past feedback when making recommendations.\n3. Try to avoid recommending similar outfits that were previously disliked.\n4. Prioritize styles and combinations that were previously liked.\n\nPlease provide a VERY SHORT response (1-2 sentences maximum) that:\n1. Directly answers their question\n2. References specific items from their uploaded clothes\n3. Includes the image_url of the recommended items\n\nFormat your response as JSON with two fields:\n1. \"response\": your short answer\n2. \"image_urls\": list of image URLs for the recommended items\n\nResponse:"""
-        else:
-            prompt = f"""As an AI fashion assistant, help the user with their outfit question: \"{message}\"\n\nUser's uploaded clothes:\n{json.dumps(outfits_info, indent=2)}\n\nUser's preferences and measurements:\n{json.dumps(current_user.preferences, indent=2)}\nHeight: {current_user.height}inches\nWeight: {current_user.weight}lbs\nGender: {current_user.gender}\n\nUser's AI Notes:\n{current_user.ai_notes or 'No additional notes provided.'}\n\nUser's past feedback on recommendations:\n{json.dumps(feedback_info, indent=2)}\n\nYou can recommend both items the user owns and items they don't own yet. When suggesting items they don't own, clearly indicate this in your response.\n\nIMPORTANT: \n1. Consider the user's past feedback when making recommendations.\n2. Try to avoid recommending similar outfits that were previously disliked.\n3. Prioritize styles and combinations that were previously liked.\n\nPlease provide a VERY SHORT response (1-2 sentences maximum) that:\n1. Directly answers their question\n2. References specific items from their uploaded clothes (if applicable)\n3. Suggests additional items they don't own (if relevant)\n4. Includes the image_url of any recommended items they own\n\nIMPORTANT: Your response MUST be in valid JSON format with these exact fields:\n{{\n    \"response\": \"your short answer here\",\n    \"image_urls\": [\"list\", \"of\", \"image\", \"urls\", \"from\", \"user's\", \"wardrobe\"]\n}}\n\nResponse:"""
+        with profiler.section('chat_prompt'):
+            prompt = build_chat_prompt(message, wardrobe_only, outfits_info, feedback_info, stream=stream)
+        if stream:
+            return stream_chat_message(message, chat_id, prompt)
 
         # Get AI response
-        response = client.chat.completions.create(
+        response = chat_completion(
+            'chat_message',
             model="gpt-4o-mini",
             messages=[
-                {"role": "system", "content": "You are a concise fashion assistant. Keep responses to 1-2 sentences maximum. Always format your response as valid JSON with 'response' and 'image_urls' fields."},
+                {"role": "system", "content": CHAT_SYSTEM_PROMPT},
                 {"role": "user", "content": prompt}
             ],
             max_tokens=150
@@ -121,20 +239,13 @@ def chat_message():
                 response_data['image_urls'] = []
             
             # Get or create chat
-            if chat_id:
-                chat = Chat.query.get(chat_id)
-                if not chat or chat.user_id != current_user.id:
-                    chat = Chat(user_id=current_user.id, messages=[])
-            else:
-                chat = Chat(user_id=current_user.id, messages=[])
+            chat = get_or_create_chat(chat_id, current_user.id)
             
             # Add new messages
-            chat.messages.extend([
+            chat.append_messages([
                 {'sender': 'You', 'text': message},
                 {'sender': 'AI', 'text': response_data['response'], 'image_urls': response_data['image_urls']}
             ])
-            
-            db.session.add(chat)
             db.session.commit()
             
             # Add chat_id to response
@@ -147,7 +258,6 @@ def chat_message():
             # If parsing fails, try to extract a meaningful response
             try:
                 # Try to find JSON-like structure in the response
-                import re
                 json_match = re.search(r'\{.*\}', ai_response, re.DOTALL)
                 if json_match:
                     response_data = json.loads(json_match.group())
@@ -0,0 +1,68 @@
+from flask import Blueprint, Response, current_app, g, request, abort
+import hmac
+import time
+from utils import metrics
+
+metrics_bp = Blueprint('metrics', __name__)
+
+# Buckets for the number of SQL statements a request runs
+QUERY_COUNT_BUCKETS = (0, 1, 2, 5, 10, 20, 50, 100, 250)
+
+
+@metrics_bp.before_app_request
+def start_request_timer():
+    g.request_start = time.perf_counter()
+
+
+@metrics_bp.after_app_request
+def record_request(response):
+    """Latency, count and SQL statements of every request, per blueprint and route.
+
+    Routes are labelled by endpoint rather than path so IDs in URLs don't
+    create a series each. Streamed responses are timed until their headers
+    are sent.
+    """
+    start = g.pop('request_start', None)
+    if start is None:
+        return response
+    labels = {
+        'blueprint': request.blueprint or 'app',
+        'endpoint': request.endpoint or 'unmatched',
+        'method': request.method,
+    }
+    metrics.histogram(
+        'http_request_duration_seconds',
+        'Request latency per blueprint and route',
+        labels=labels
+    ).observe(time.perf_counter() - start)
+    metrics.counter(
+        'http_requests_total',
+        'Requests per blueprint, route and status code',
+        labels=dict(labels, status=str(response.status_code))
+    ).inc()
+    metrics.histogram(
+        'http_request_db_queries',
+        'SQL statements run per request',
+        labels=labels,
+        buckets=QUERY_COUNT_BUCKETS
+    ).observe(g.get('db_queries', 0))
+    metrics.histogram(
+        'http_request_db_seconds',
+        'Time per request spent in SQL statements',
+        labels=labels
+    ).observe(g.get('db_time', 0.0))
+    return response
+
+
+@metrics_bp.route('/metrics')
+def prometheus_metrics():
+    """All metrics in the Prometheus text format.
+
+    When METRICS_TOKEN is set, scrapers must send it as a bearer token.
+    """
+    token = current_app.config.get('METRICS_TOKEN')
+    if token:
+        supplied = request.headers.get('Authorization', '')
+        if not hmac.compare_digest(supplied, f"Bearer {token}"):
+            abort(401)
+    return Response(metrics.render_prometheus(), mimetype='text/plain; version=0.0.4; charset=utf-8')
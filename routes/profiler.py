@@ -0,0 +1,105 @@
+from flask import Blueprint, current_app, request, jsonify, send_from_directory, abort, g
+import hmac
+import os
+import random
+from utils import profiler
+
+profiler_bp = Blueprint('profiler', __name__)
+
+# Never sampled: they'd only profile the profiler and the scraper
+EXCLUDED_PATH_PREFIXES = ('/static/', '/metrics', '/admin/profiles')
+
+
+def profile_dir():
+    return current_app.config.get('PROFILE_DIR') or os.path.join(current_app.instance_path, 'profiles')
+
+
+def has_admin_token():
+    token = current_app.config.get('PROFILER_TOKEN')
+    supplied = request.headers.get('X-Profile-Token')
+    return bool(token and supplied and hmac.compare_digest(supplied, token))
+
+
+def start_profile_if_requested():
+    """Profile the request when it carries the admin token, or when picked by PROFILE_SAMPLE_RATE.
+
+    X-Profile-Modes (cprofile, sample, memory; comma separated) picks what
+    to capture on token requests; sampled requests get the defaults.
+    """
+    config = current_app.config
+    if not config.get('PROFILER_ENABLED') or request.path.startswith(EXCLUDED_PATH_PREFIXES):
+        return
+    if has_admin_token():
+        trigger = 'header'
+        modes = request.headers.get('X-Profile-Modes')
+        modes = [mode.strip() for mode in modes.split(',')] if modes else profiler.DEFAULT_MODES
+    elif random.random() < config.get('PROFILE_SAMPLE_RATE', 0.0):
+        trigger = 'sample'
+        modes = profiler.DEFAULT_MODES
+    else:
+        return
+
+    profile = profiler.Profile(
+        profiler.new_profile_id(request.endpoint or request.path),
+        modes,
+        sample_interval=config.get('PROFILE_SAMPLE_INTERVAL_MS', 5) / 1000
+    )
+    g.profile_trigger = trigger
+    profiler.set_current_profile(profile)
+    profile.start()
+
+
+@profiler_bp.before_app_request
+def before_request():
+    start_profile_if_requested()
+
+
+@profiler_bp.after_app_request
+def add_profile_header(response):
+    profile = profiler.current_profile()
+    if profile is not None:
+        response.headers['X-Profile-Id'] = profile.profile_id
+        g.profile_status = response.status_code
+    return response
+
+
+@profiler_bp.teardown_app_request
+def save_profile(error=None):
+    """Stop and save the request's profile.
+
+    Teardown runs after a streamed response has been sent, so streamed
+    /chat replies are profiled until their last token.
+    """
+    profile = profiler.current_profile()
+    if profile is None:
+        return
+    profiler.set_current_profile(None)
+    profile.stop()
+    directory = profile_dir()
+    try:
+        profile.save(
+            directory,
+            method=request.method,
+            path=request.path,
+            endpoint=request.endpoint,
+            status=g.get('profile_status'),
+            trigger=g.get('profile_trigger'),
+        )
+        profiler.prune_profiles(directory, current_app.config.get('PROFILE_MAX_PROFILES', 200))
+    except Exception as e:
+        current_app.logger.error(f"Error saving profile {profile.profile_id}: {str(e)}")
+
+
+@profiler_bp.route('/admin/profiles')
+def list_profiles():
+    if not has_admin_token():
+        abort(404)
+    return jsonify({'profiles': profiler.list_profiles(profile_dir())})
+
+
+@profiler_bp.route('/admin/profiles/<filename>')
+def download_profile(filename):
+    """Download a .prof (snakeviz, pstats), .folded (flamegraph.pl, speedscope), .memory.txt or .json file."""
+    if not has_admin_token():
+        abort(404)
+    return send_from_directory(profile_dir(), filename, as_attachment=True)
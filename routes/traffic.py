@@ -0,0 +1,83 @@
+from flask import Blueprint, current_app, request, g
+from flask_login import current_user
+import os
+import random
+from utils import traffic_recorder
+
+traffic_bp = Blueprint('traffic', __name__)
+
+# Not recorded: assets, the scraper and the admin endpoints
+EXCLUDED_PATH_PREFIXES = ('/static/', '/metrics', '/admin/')
+
+
+def traffic_log_path():
+    return current_app.config.get('TRAFFIC_LOG_PATH') or os.path.join(current_app.instance_path, 'traffic.jsonl')
+
+
+def request_shape():
+    """The request's query, body and files reduced to field names, types and sizes (see traffic_recorder.describe)."""
+    shape = {}
+    if request.args:
+        shape['query'] = traffic_recorder.describe_query(request.args.to_dict())
+    body = request.get_json(silent=True) if request.is_json else None
+    if body is not None:
+        shape['json'] = traffic_recorder.describe(body)
+    if request.form:
+        # Field names only: form values include passwords
+        shape['form'] = sorted(request.form.keys())
+    if request.files:
+        shape['files'] = {name: len(request.files.getlist(name)) for name in request.files}
+    return shape
+
+
+@traffic_bp.before_app_request
+def start_trace():
+    config = current_app.config
+    if not config.get('TRAFFIC_RECORDER_ENABLED') or request.path.startswith(EXCLUDED_PATH_PREFIXES):
+        return
+    if random.random() >= config.get('TRAFFIC_RECORD_RATE', 1.0):
+        return
+    traffic_recorder.set_current_trace(traffic_recorder.Trace())
+
+
+@traffic_bp.after_app_request
+def capture_response(response):
+    trace = traffic_recorder.current_trace()
+    if trace is not None:
+        g.traffic_status = response.status_code
+        # None for streamed responses
+        g.traffic_response_bytes = response.content_length
+        g.traffic_shape = request_shape()
+    return response
+
+
+@traffic_bp.teardown_app_request
+def save_trace(error=None):
+    """Write the request's trace to the traffic log.
+
+    Teardown runs after a streamed response has been sent, so the duration
+    of streamed /chat replies covers the whole stream.
+    """
+    trace = traffic_recorder.current_trace()
+    if trace is None:
+        return
+    traffic_recorder.set_current_trace(None)
+    entry = {
+        'ts': trace.timestamp,
+        'method': request.method,
+        'endpoint': request.endpoint,
+        'rule': request.url_rule.rule if request.url_rule else None,
+        'user': traffic_recorder.pseudonymize(current_user.get_id(), current_app.config['SECRET_KEY']),
+        'status': g.get('traffic_status', 500),
+        'duration_ms': trace.elapsed_ms(),
+        'request_bytes': request.content_length or 0,
+        'response_bytes': g.get('traffic_response_bytes'),
+        'db_queries': g.get('db_queries', 0),
+        'db_ms': round(g.get('db_time', 0.0) * 1000, 2),
+        'upstream': trace.upstream,
+        'shape': g.get('traffic_shape', {}),
+    }
+    try:
+        traffic_recorder.write_trace(traffic_log_path(), entry, current_app.config.get('TRAFFIC_LOG_MAX_BYTES'))
+    except Exception as e:
+        current_app.logger.error(f"Error writing traffic trace: {str(e)}")
@@ -171,7 +171,7 @@ document.addEventListener('DOMContentLoaded', function() {
 
             // Create the full-size image element
             const fullSizeImage = document.createElement('img');
-            fullSizeImage.src = clickableImage.src;
+            fullSizeImage.src = clickableImage.dataset.fullSrc || clickableImage.src;
             fullSizeImage.style.maxWidth = '90%';
             fullSizeImage.style.maxHeight = '90%';
             fullSizeImage.style.objectFit = 'contain';
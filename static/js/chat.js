@@ -112,30 +112,91 @@ document.addEventListener('DOMContentLoaded', () => {
                 body: JSON.stringify({ 
                     message,
                     chat_id: currentChatId,  // Include current chat ID if it exists
-                    wardrobe_only: recommendationMode.checked  // Include recommendation mode
+                    wardrobe_only: recommendationMode.checked,  // Include recommendation mode
+                    stream: true  // Show the reply as it is generated
                 })
             });
 
-            const data = await response.json();
-            
-            if (response.ok) {
-                // Update current chat ID
-                currentChatId = data.chat_id;
-                
-                // Add AI response to chat
-                addMessage('AI', data.response, data.image_urls, true);
-                
-                // Update chat history
-                loadChatHistory();
-            } else {
+            if (!response.ok || !response.body) {
+                addMessage('AI', 'Sorry, I encountered an error. Please try again.', true);
+                return;
+            }
+
+            // Show tokens in a temporary bubble, replaced by the full message once done
+            const streamingDiv = addStreamingMessage();
+            let text = '';
+            let imageUrls = [];
+            let failed = false;
+            await readEventStream(response, (event, data) => {
+                if (event === 'token') {
+                    text += data.text;
+                    streamingDiv.querySelector('.text-sm').textContent = text;
+                    chatMessages.scrollTop = chatMessages.scrollHeight;
+                } else if (event === 'image_urls') {
+                    imageUrls = data.image_urls;
+                } else if (event === 'done') {
+                    currentChatId = data.chat_id;
+                    text = data.response;
+                } else if (event === 'error') {
+                    failed = true;
+                }
+            });
+            streamingDiv.remove();
+
+            if (failed) {
                 addMessage('AI', 'Sorry, I encountered an error. Please try again.', true);
+                return;
             }
+
+            // Add AI response to chat
+            addMessage('AI', text, imageUrls, true);
+            
+            // Update chat history
+            loadChatHistory();
         } catch (error) {
             console.error('Error:', error);
             addMessage('AI', 'Sorry, I encountered an error. Please try again.', true);
         }
     });
 
+    // Read Server-Sent Events from a fetch response, calling onEvent(event, data) for each
+    async function readEventStream(response, onEvent) {
+        const reader = response.body.getReader();
+        const decoder = new TextDecoder();
+        let buffer = '';
+        while (true) {
+            const { value, done } = await reader.read();
+            if (done) break;
+            buffer += decoder.decode(value, { stream: true });
+            let boundary;
+            while ((boundary = buffer.indexOf('\n\n')) !== -1) {
+                const block = buffer.slice(0, boundary);
+                buffer = buffer.slice(boundary + 2);
+                let event = 'message';
+                let data = '';
+                block.split('\n').forEach(line => {
+                    if (line.startsWith('event: ')) event = line.slice(7);
+                    else if (line.startsWith('data: ')) data += line.slice(6);
+                });
+                if (data) onEvent(event, JSON.parse(data));
+            }
+        }
+    }
+
+    // Empty AI bubble that streamed text is written into
+    function addStreamingMessage() {
+        const messageDiv = document.createElement('div');
+        messageDiv.className = 'flex justify-start';
+        messageDiv.innerHTML = `
+            <div class="max-w-[70%] bg-gray-100 text-gray-800 rounded-lg p-3">
+                <p class="text-sm">...</p>
+            </div>
+        `;
+        chatMessages.appendChild(messageDiv);
+        chatMessages.scrollTop = chatMessages.scrollHeight;
+        return messageDiv;
+    }
+
     // Function to add a message to the chat
     function addMessage(sender, text, imageUrls = [], isRecommendation = false, question = null) {
         const messagesDiv = document.getElementById('chat-messages');
@@ -144,6 +144,31 @@ document.addEventListener('DOMContentLoaded', () => {
         });
     }
 
+    // Poll an upload job until the server has finished analyzing the images.
+    // Jobs only live in the memory of the server process that accepted the
+    // upload, so give up after a while or once the job is unknown (404).
+    const UPLOAD_POLL_INTERVAL_MS = 2000;
+    const UPLOAD_POLL_MAX_ATTEMPTS = 150;  // 5 minutes
+
+    async function waitForUploadJob(statusUrl) {
+        for (let attempt = 0; attempt < UPLOAD_POLL_MAX_ATTEMPTS; attempt++) {
+            await new Promise(resolve => setTimeout(resolve, UPLOAD_POLL_INTERVAL_MS));
+            const response = await fetch(statusUrl);
+            if (response.status === 404) {
+                throw new Error('Lost track of the upload. Reload the page to see which images were added.');
+            }
+            const job = await response.json();
+            if (!response.ok) {
+                throw new Error(job.error || 'Upload failed');
+            }
+            if (job.status === 'done' || job.status === 'failed') {
+                return job;
+            }
+            confirmUpload.textContent = `Analyzing... (${job.completed}/${job.total})`;
+        }
+        throw new Error('The images are taking too long to analyze. Reload the page later to see them.');
+    }
+
     // Handle confirm upload
     if (confirmUpload) {
         confirmUpload.addEventListener('click', async () => {
@@ -171,10 +196,15 @@ document.addEventListener('DOMContentLoaded', () => {
                     body: formData
                 });
 
-                const data = await response.json();
+                let data = await response.json();
                 
                 if (response.ok) {
-                    alert(data.message);
+                    // Analysis runs in the background; poll until the job finishes
+                    if (data.status_url) {
+                        confirmUpload.textContent = 'Analyzing...';
+                        data = await waitForUploadJob(data.status_url);
+                    }
+                    alert(data.message || data.error);
                     // Reset the form
                     clothingUpload.value = '';
                     selectedFiles = [];
@@ -605,7 +635,7 @@ document.addEventListener('DOMContentLoaded', function() {
         // Refresh button handler
         refreshBtn.addEventListener('click', async function() {
             try {
-                const response = await fetch('/get-weather-recommendations');
+                const response = await fetch('/get-weather-recommendations?refresh=1');
                 const data = await response.json();
                 if (data.error) {
                     console.error('Error:', data.error);
@@ -621,7 +651,7 @@ document.addEventListener('DOMContentLoaded', function() {
 });
 
 function refreshRecommendations() {
-    fetch('/get-weather-recommendations')
+    fetch('/get-weather-recommendations?refresh=1')
         .then(response => response.json())
         .then(data => {
             const recommendationsDiv = document.getElementById('weather-recommendations');
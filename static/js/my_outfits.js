@@ -76,7 +76,7 @@ document.addEventListener('DOMContentLoaded', () => {
         if (imageLinkElement && imageLinkElement.tagName === 'A') {
             const imgElement = imageLinkElement.querySelector('img');
             if (imgElement) {
-                imageUrl = imgElement.src;
+                imageUrl = imgElement.dataset.fullSrc || imgElement.src;
             }
         }
         if (imageUrl) {
@@ -0,0 +1,63 @@
+import pytest
+
+from app import create_app
+from models import db, User
+from utils.server_session import ServerSideSessionInterface, SQLiteSessionStore
+
+
+@pytest.fixture
+def app(tmp_path):
+    app = create_app('testing')
+    app.session_interface = ServerSideSessionInterface(SQLiteSessionStore(str(tmp_path / 'sessions.db')))
+    with app.app_context():
+        db.create_all()
+        user = User(username='victim', email='victim@example.com')
+        user.set_password('victim-password')
+        db.session.add(user)
+        db.session.commit()
+    yield app
+    with app.app_context():
+        db.drop_all()
+
+
+def set_session_id(app, client, sid):
+    client.set_cookie(app.config['SESSION_COOKIE_NAME'], app.session_interface._signer(app).sign(sid).decode('utf-8'))
+
+
+def plant_session(app, client):
+    """Store a session and give its cookie to client, as an attacker would; returns the session ID."""
+    interface = app.session_interface
+    sid = 'planted-session-id'
+    interface.store.save(sid, interface.serializer.dumps({'planted': True}), 3600)
+    set_session_id(app, client, sid)
+    return sid
+
+
+def session_id(app, client):
+    cookie = client.get_cookie(app.config['SESSION_COOKIE_NAME'])
+    return app.session_interface._signer(app).unsign(cookie.value).decode('utf-8')
+
+
+def test_login_rejects_session_id_set_before_login(app):
+    victim = app.test_client()
+    sid = plant_session(app, victim)
+
+    response = victim.post('/login', data={'username': 'victim', 'password': 'victim-password'})
+    assert response.status_code == 302
+    assert session_id(app, victim) != sid
+    assert app.session_interface.store.load(sid) is None
+    # Data in the session before login is kept under the new ID
+    assert app.session_interface.store.load(session_id(app, victim)) is not None
+
+    attacker = app.test_client()
+    set_session_id(app, attacker, sid)
+    assert attacker.get('/my-outfits').status_code == 302
+
+
+def test_logout_moves_session_to_new_id(app):
+    client = app.test_client()
+    client.post('/login', data={'username': 'victim', 'password': 'victim-password'})
+    sid = session_id(app, client)
+
+    client.get('/logout')
+    assert app.session_interface.store.load(sid) is None
@@ -1,4 +1,4 @@
-import openai
+from utils.llm_client import chat_completion
 from PIL import Image
 import io
 import os
@@ -28,7 +28,8 @@ def get_weather_recommendations(weather_data):
         }}
         """
 
-        response = openai.ChatCompletion.create(
+        response = chat_completion(
+            'get_weather_recommendations',
             model="gpt-4o-mini",
             messages=[
                 {
@@ -71,7 +72,8 @@ def process_user_feedback(outfit_id, rating, user_preferences):
         }}
         """
 
-        response = openai.ChatCompletion.create(
+        response = chat_completion(
+            'process_user_feedback',
             model="gpt-4o-mini",
             messages=[
                 {
@@ -0,0 +1,170 @@
+from datetime import datetime
+import json
+import math
+import re
+
+# Rough average for English text with the GPT-4o tokenizer
+CHARS_PER_TOKEN = 4
+
+# Share of the budget given to outfits; feedback gets the rest plus anything left over
+OUTFIT_BUDGET_SHARE = 0.75
+
+# Score given to something that happened this many days ago halves
+RECENCY_HALF_LIFE_DAYS = 30
+
+_WORD_RE = re.compile(r"[a-z0-9']+")
+_TAG_RE = re.compile(r'<[^>]+>')
+_STOP_WORDS = {
+    'a', 'an', 'and', 'are', 'at', 'be', 'can', 'do', 'for', 'i', 'in', 'is', 'it', 'me', 'my',
+    'of', 'on', 'or', 'should', 'the', 'to', 'what', 'wear', 'with', 'you', 'null',
+}
+
+
+def estimate_tokens(text):
+    """Approximate the token count of text without loading a tokenizer."""
+    return math.ceil(len(text) / CHARS_PER_TOKEN)
+
+
+def compact_json(data):
+    return json.dumps(data, separators=(',', ':'), ensure_ascii=False, default=str)
+
+
+def strip_html(text):
+    """Turn the <strong>/<br> analysis markup into plain one-line text."""
+    if not text:
+        return text
+    text = _TAG_RE.sub('', re.sub(r'<br\s*/?>', '\n', text))
+    compact = ''
+    for line in text.splitlines():
+        line = ' '.join(line.strip().lstrip('-').split())
+        if not line:
+            continue
+        if not compact:
+            compact = line
+        elif compact.endswith(':'):
+            compact += ' ' + line
+        else:
+            compact += '; ' + line
+    return compact
+
+
+def keywords(text):
+    return {word for word in _WORD_RE.findall((text or '').lower()) if word not in _STOP_WORDS and len(word) > 1}
+
+
+def _recency_score(created_at, now):
+    if not created_at:
+        return 0.0
+    age_days = max((now - created_at).total_seconds() / 86400, 0)
+    return 0.5 ** (age_days / RECENCY_HALF_LIFE_DAYS)
+
+
+def _keyword_score(query_words, text):
+    if not query_words:
+        return 0.0
+    return len(query_words & keywords(text)) / len(query_words)
+
+
+def score_outfit(outfit, query_words, weather=None, now=None):
+    """Relevance of an Outfit to the current question, roughly in [0, 4]."""
+    now = now or datetime.utcnow()
+    score = _recency_score(outfit.created_at, now)
+    score += 2 * _keyword_score(query_words, f"{outfit.analysis or ''} {outfit.occasion or ''}")
+    if outfit.occasion and outfit.occasion.lower() in query_words:
+        score += 0.5
+    if weather and isinstance(outfit.weather, dict) and outfit.weather.get('condition') == weather.get('condition'):
+        score += 0.25
+    if outfit.rating == 1:
+        # Favorited outfits
+        score += 0.25
+    return score
+
+
+def score_feedback(entry, query_words, now=None):
+    now = now or datetime.utcnow()
+    return _recency_score(entry.created_at, now) + 2 * _keyword_score(
+        query_words, f"{entry.question} {entry.recommendation}"
+    )
+
+
+def _select_within_budget(scored_entries, budget_tokens):
+    """Take entries in score order until the token budget is spent."""
+    selected = []
+    used = 0
+    for _, entry in sorted(scored_entries, key=lambda pair: pair[0], reverse=True):
+        cost = estimate_tokens(compact_json(entry)) + 1
+        if used + cost > budget_tokens:
+            continue
+        selected.append(entry)
+        used += cost
+    return selected, used
+
+
+def item_info(item):
+    """Compact prompt entry for a ClothingItem."""
+    info = {
+        'id': item.id,
+        'type': item.type,
+        'color': item.color,
+        'material': item.material,
+        'brand': item.brand,
+        'key_features': item.key_features,
+        'overall_vibe': item.overall_vibe,
+        'short_description': item.short_description,
+        'image_url': item.image_url,
+    }
+    return {key: value for key, value in info.items() if value}
+
+
+def build_wardrobe_context(message, outfits, feedback, budget_tokens, weather=None, items=None):
+    """Pick the outfits and feedback most relevant to message that fit in budget_tokens.
+
+    items, if given, are ClothingItems retrieved for message in relevance
+    order (see utils.wardrobe_index). They are listed first, and outfits that
+    have detected items are then left out, so an outfit only shows up in the
+    prompt through its matching items.
+
+    Returns (outfits_info, feedback_info) as lists of compact dicts, ready to be
+    serialized with compact_json.
+    """
+    now = datetime.utcnow()
+    query_words = keywords(message)
+    outfit_budget = int(budget_tokens * OUTFIT_BUDGET_SHARE)
+
+    outfits_info = []
+    used = 0
+    if items:
+        # Already ranked by retrieval score, so give them descending scores
+        outfits_info, used = _select_within_budget(
+            [(-rank, item_info(item)) for rank, item in enumerate(items)],
+            outfit_budget
+        )
+
+    scored_outfits = []
+    for outfit in outfits:
+        if items and outfit.items:
+            continue
+        info = {
+            'image_url': outfit.image_url,
+            'analysis': strip_html(outfit.analysis),
+            'occasion': outfit.occasion,
+            'weather': outfit.weather,
+        }
+        info = {key: value for key, value in info.items() if value}
+        scored_outfits.append((score_outfit(outfit, query_words, weather, now), info))
+
+    scored_feedback = []
+    for entry in feedback:
+        info = {
+            'recommendation': entry.recommendation,
+            'feedback': entry.feedback,
+            'context': entry.context,
+        }
+        info = {key: value for key, value in info.items() if value}
+        scored_feedback.append((score_feedback(entry, query_words, now), info))
+
+    selected_outfits, outfits_used = _select_within_budget(scored_outfits, outfit_budget - used)
+    outfits_info += selected_outfits
+    used += outfits_used
+    feedback_info, _ = _select_within_budget(scored_feedback, budget_tokens - used)
+    return outfits_info, feedback_info
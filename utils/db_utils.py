@@ -0,0 +1,137 @@
+from contextlib import contextmanager
+from flask import g, has_request_context
+from sqlalchemy import event
+from sqlalchemy.engine import make_url
+from sqlalchemy.dialects.postgresql import insert as postgresql_insert
+from sqlalchemy.dialects.sqlite import insert as sqlite_insert
+from models import db
+from utils import metrics
+import time
+
+
+class QueryCounter:
+    """SQL statements executed while counting, most recent last."""
+
+    def __init__(self):
+        self.statements = []
+
+    @property
+    def count(self):
+        return len(self.statements)
+
+    def __call__(self, conn, cursor, statement, parameters, context, executemany):
+        self.statements.append(statement)
+
+
+@contextmanager
+def count_queries(engine=None):
+    """Count the SQL statements run inside the block.
+
+        with count_queries() as queries:
+            client.get('/my-outfits')
+        print(queries.count)
+
+    Needs an application context when no engine is given.
+    """
+    engine = engine or db.engine
+    counter = QueryCounter()
+    event.listen(engine, 'before_cursor_execute', counter)
+    try:
+        yield counter
+    finally:
+        event.remove(engine, 'before_cursor_execute', counter)
+
+
+@contextmanager
+def assert_max_queries(limit, engine=None):
+    """Fail if the block runs more than `limit` SQL statements, e.g. because of an N+1 loop."""
+    with count_queries(engine) as counter:
+        yield counter
+    if counter.count > limit:
+        listing = '\n'.join(f"  {statement}" for statement in counter.statements)
+        raise AssertionError(f"Expected at most {limit} queries, got {counter.count}:\n{listing}")
+
+
+def upsert(model, values, index_elements, update_fields):
+    """Insert a row, or update update_fields of the row it collides with on index_elements.
+
+    On SQLite and PostgreSQL this is a single INSERT ... ON CONFLICT DO
+    UPDATE statement; other databases get an UPDATE followed by an INSERT
+    when nothing matched. Runs in the current session; the caller commits.
+    """
+    dialect = db.session.get_bind().dialect.name
+    if dialect in ('sqlite', 'postgresql'):
+        insert = sqlite_insert if dialect == 'sqlite' else postgresql_insert
+        statement = insert(model).values(**values)
+        statement = statement.on_conflict_do_update(
+            index_elements=index_elements,
+            set_={field: statement.excluded[field] for field in update_fields}
+        )
+        db.session.execute(statement)
+        return
+
+    updated = model.query.filter_by(**{key: values[key] for key in index_elements})\
+        .update({field: values[field] for field in update_fields}, synchronize_session=False)
+    if not updated:
+        db.session.add(model(**values))
+
+
+def engine_options(config):
+    """SQLALCHEMY_ENGINE_OPTIONS built from the DB_* settings.
+
+    SQLite gets no pool sizing: Flask-SQLAlchemy picks its pool for it.
+    """
+    options = {
+        'pool_pre_ping': config['DB_POOL_PRE_PING'],
+        'pool_recycle': config['DB_POOL_RECYCLE'],
+    }
+    if make_url(config['SQLALCHEMY_DATABASE_URI']).get_backend_name() != 'sqlite':
+        options.update(
+            pool_size=config['DB_POOL_SIZE'],
+            max_overflow=config['DB_MAX_OVERFLOW'],
+            pool_timeout=config['DB_POOL_TIMEOUT'],
+        )
+    return options
+
+
+def configure_sqlite(engine, config):
+    """Set the SQLITE_* pragmas on every new connection of a SQLite engine."""
+    pragmas = [
+        f"PRAGMA busy_timeout = {int(config['SQLITE_BUSY_TIMEOUT'])}",
+        f"PRAGMA journal_mode = {config['SQLITE_JOURNAL_MODE']}",
+        f"PRAGMA synchronous = {config['SQLITE_SYNCHRONOUS']}",
+    ]
+
+    @event.listens_for(engine, 'connect')
+    def set_pragmas(dbapi_connection, connection_record):
+        cursor = dbapi_connection.cursor()
+        try:
+            for pragma in pragmas:
+                cursor.execute(pragma)
+        finally:
+            cursor.close()
+
+
+def instrument_engine(engine):
+    """Record the count and duration of every SQL statement, by operation, in utils.metrics.
+
+    Inside a request the statements are also counted on flask.g.db_queries,
+    for the per-route query count.
+    """
+    def before_cursor_execute(conn, cursor, statement, parameters, context, executemany):
+        conn.info.setdefault('query_start', []).append(time.perf_counter())
+
+    def after_cursor_execute(conn, cursor, statement, parameters, context, executemany):
+        elapsed = time.perf_counter() - conn.info['query_start'].pop()
+        operation = statement.lstrip().split(None, 1)[0].upper() if statement.strip() else 'OTHER'
+        metrics.histogram(
+            'db_query_duration_seconds',
+            'SQL statement latency by operation',
+            labels={'operation': operation}
+        ).observe(elapsed)
+        if has_request_context():
+            g.db_queries = g.get('db_queries', 0) + 1
+            g.db_time = g.get('db_time', 0.0) + elapsed
+
+    event.listen(engine, 'before_cursor_execute', before_cursor_execute)
+    event.listen(engine, 'after_cursor_execute', after_cursor_execute)
@@ -0,0 +1,93 @@
+from PIL import Image, ImageOps
+import io
+import os
+import threading
+import logging
+
+logger = logging.getLogger(__name__)
+
+MIME_TYPES = {
+    'JPEG': 'image/jpeg',
+    'WEBP': 'image/webp',
+    'PNG': 'image/png',
+}
+
+# Resized copies live in these folders next to the original upload
+DERIVATIVE_DIRS = {
+    'thumb': 'thumbs',
+    'medium': 'medium',
+}
+
+
+def _load_image(source):
+    """Open an image from bytes or a path with EXIF orientation applied, as RGB."""
+    image = Image.open(io.BytesIO(source) if isinstance(source, bytes) else source)
+    image = ImageOps.exif_transpose(image)
+    if image.mode in ('RGBA', 'LA', 'P'):
+        # Flatten transparency onto white so it doesn't turn black in JPEG
+        image = image.convert('RGBA')
+        background = Image.new('RGB', image.size, (255, 255, 255))
+        background.paste(image, mask=image.split()[-1])
+        return background
+    return image.convert('RGB')
+
+
+def prepare_image_for_vision(image_data, max_edge=1024, image_format='JPEG', quality=85):
+    """Downscale and re-encode an upload before it is base64-encoded for the vision API.
+
+    Returns (image_bytes, mime_type). If the bytes can't be decoded as an image
+    the original data is returned unchanged.
+    """
+    image_format = image_format.upper()
+    try:
+        image = _load_image(image_data)
+        image.thumbnail((max_edge, max_edge), Image.LANCZOS)
+        output = io.BytesIO()
+        image.save(output, format=image_format, quality=quality, optimize=True)
+        prepared = output.getvalue()
+        logger.info(f"Prepared image for vision: {len(image_data)} -> {len(prepared)} bytes, {image.size[0]}x{image.size[1]}")
+        return prepared, MIME_TYPES.get(image_format, 'image/jpeg')
+    except Exception as e:
+        logger.error(f"Error preparing image, sending original: {str(e)}")
+        return image_data, 'image/jpeg'
+
+
+def derivative_path_for(image_path, size):
+    """Path of a resized copy stored next to an upload (uploads/<id>/<dir>/<name>.jpg)."""
+    directory, filename = os.path.split(image_path)
+    return os.path.join(directory, DERIVATIVE_DIRS[size], os.path.splitext(filename)[0] + '.jpg')
+
+
+def create_derivative(image_path, size, max_edge, quality=80):
+    """Write the `size` derivative of image_path, capped at max_edge px, and return its path.
+
+    Returns None if the image can't be read.
+    """
+    derivative_path = derivative_path_for(image_path, size)
+    if os.path.exists(derivative_path):
+        # Uploads are named by content hash, so an existing derivative is current
+        return derivative_path
+    try:
+        image = _load_image(image_path)
+        image.thumbnail((max_edge, max_edge), Image.LANCZOS)
+        os.makedirs(os.path.dirname(derivative_path), exist_ok=True)
+        # Write to a temp file first so a concurrent request never serves half an image
+        tmp_path = f"{derivative_path}.{os.getpid()}.{threading.get_ident()}.tmp"
+        image.save(tmp_path, format='JPEG', quality=quality, optimize=True)
+        os.replace(tmp_path, derivative_path)
+        return derivative_path
+    except Exception as e:
+        logger.error(f"Error creating {size} image for {image_path}: {str(e)}")
+        return None
+
+
+def create_derivatives(image_path, sizes, quality=80):
+    """Create every derivative in sizes ({name: max_edge}) for an upload."""
+    return {size: create_derivative(image_path, size, max_edge, quality) for size, max_edge in sizes.items()}
+
+
+def delete_derivatives(image_path):
+    for size in DERIVATIVE_DIRS:
+        derivative_path = derivative_path_for(image_path, size)
+        if os.path.exists(derivative_path):
+            os.remove(derivative_path)
@@ -0,0 +1,149 @@
+import threading
+import logging
+import time
+from config import Config
+from utils import metrics, traffic_recorder
+
+logger = logging.getLogger(__name__)
+
+_client = None
+_client_lock = threading.Lock()
+# Caps how many OpenAI requests this process has in flight at once
+_semaphore = None
+# Settings of the app passed to init_app; Config's defaults until then
+_config = None
+
+
+def init_app(app):
+    """Use app.config's OpenAI settings. The client and concurrency limit are rebuilt on next use."""
+    global _client, _semaphore, _config
+    with _client_lock:
+        _config = app.config
+        _client = None
+        _semaphore = None
+
+
+def setting(name):
+    return _config[name] if _config is not None and name in _config else getattr(Config, name)
+
+
+def get_semaphore():
+    global _semaphore
+    if _semaphore is None:
+        with _client_lock:
+            if _semaphore is None:
+                _semaphore = threading.BoundedSemaphore(setting('LLM_MAX_CONCURRENCY'))
+    return _semaphore
+
+
+def get_openai_client():
+    """Return the shared OpenAI client, creating it on first use.
+
+    The client keeps a pooled keep-alive HTTP connection pool and retries
+    connection errors, 429 and 5xx responses with exponential backoff.
+    openai is imported here rather than at module level, as it adds about
+    half a second to every worker's startup.
+    """
+    global _client
+    if _client is None:
+        with _client_lock:
+            if _client is None:
+                from openai import OpenAI
+                import httpx
+                _client = OpenAI(
+                    api_key=setting('OPENAI_API_KEY'),
+                    base_url=setting('OPENAI_BASE_URL'),
+                    timeout=setting('LLM_DEFAULT_TIMEOUT'),
+                    max_retries=setting('LLM_MAX_RETRIES'),
+                    http_client=httpx.Client(
+                        limits=httpx.Limits(
+                            max_connections=setting('LLM_MAX_CONNECTIONS'),
+                            max_keepalive_connections=setting('LLM_MAX_CONNECTIONS')
+                        )
+                    )
+                )
+    return _client
+
+
+def chat_completion(call_site, **kwargs):
+    """Create a chat completion through the shared client.
+
+    call_site names the caller (e.g. 'chat_message') and selects its timeout
+    from the LLM_TIMEOUTS setting unless a timeout is passed explicitly.
+    """
+    if kwargs.get('timeout') is None:
+        kwargs['timeout'] = setting('LLM_TIMEOUTS').get(call_site, setting('LLM_DEFAULT_TIMEOUT'))
+    with get_semaphore():
+        start = time.perf_counter()
+        try:
+            response = get_openai_client().chat.completions.create(**kwargs)
+        except Exception as e:
+            _record_call(call_site, kwargs.get('model'), start, error=e)
+            raise
+        _record_call(call_site, kwargs.get('model'), start, usage=response.usage)
+        return response
+
+
+def stream_chat_completion(call_site, **kwargs):
+    """Yield the text deltas of a streamed chat completion.
+
+    The concurrency slot is held until the stream is exhausted or the
+    generator is closed (e.g. the HTTP client disconnected).
+    """
+    if kwargs.get('timeout') is None:
+        kwargs['timeout'] = setting('LLM_TIMEOUTS').get(call_site, setting('LLM_DEFAULT_TIMEOUT'))
+    with get_semaphore():
+        start = time.perf_counter()
+        error = None
+        try:
+            stream = get_openai_client().chat.completions.create(stream=True, **kwargs)
+        except Exception as e:
+            _record_call(call_site, kwargs.get('model'), start, error=e)
+            raise
+        try:
+            first_token = True
+            for chunk in stream:
+                if chunk.choices and chunk.choices[0].delta.content:
+                    if first_token:
+                        first_token = False
+                        metrics.histogram(
+                            'llm_time_to_first_token_seconds',
+                            'Time until a streamed OpenAI reply produced its first text',
+                            labels={'call_site': call_site}
+                        ).observe(time.perf_counter() - start)
+                    yield chunk.choices[0].delta.content
+        except Exception as e:
+            error = e
+            raise
+        finally:
+            stream.response.close()
+            _record_call(call_site, kwargs.get('model'), start, error=error)
+
+
+def _record_call(call_site, model, start, usage=None, error=None):
+    """Record latency, token usage and errors of one OpenAI call, and add it to the request's traffic trace.
+
+    Streamed replies carry no usage, so only their latency and errors are
+    recorded.
+    """
+    outcome = 'error' if error is not None else 'success'
+    elapsed = time.perf_counter() - start
+    metrics.histogram(
+        'llm_request_duration_seconds',
+        'OpenAI chat completion latency per call site',
+        labels={'call_site': call_site, 'outcome': outcome}
+    ).observe(elapsed)
+    traffic_recorder.record_upstream('openai', call_site, elapsed, outcome)
+    if error is not None:
+        metrics.counter(
+            'llm_errors_total',
+            'Failed OpenAI calls per call site and error type',
+            labels={'call_site': call_site, 'error': type(error).__name__}
+        ).inc()
+    if usage is not None:
+        for kind in ('prompt', 'completion'):
+            metrics.counter(
+                'llm_tokens_total',
+                'OpenAI tokens used per call site and model',
+                labels={'call_site': call_site, 'model': model or 'unknown', 'type': kind}
+            ).inc(getattr(usage, f'{kind}_tokens', 0) or 0)
@@ -0,0 +1,195 @@
+from contextlib import contextmanager
+import threading
+import time
+
+# Latency buckets in seconds
+DEFAULT_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10, 30, 60)
+
+_registry = {}
+_registry_lock = threading.Lock()
+
+
+class Counter:
+    """Monotonic count. With fn, the value is read from fn() instead, e.g. an existing stats dict."""
+
+    type = 'counter'
+
+    def __init__(self, name, description='', labels=None, fn=None):
+        self.name = name
+        self.description = description
+        self.labels = labels or {}
+        self.fn = fn
+        self._value = 0
+        self._lock = threading.Lock()
+
+    @property
+    def value(self):
+        return self.fn() if self.fn else self._value
+
+    def inc(self, amount=1):
+        with self._lock:
+            self._value += amount
+
+    def snapshot(self):
+        return {'value': self.value}
+
+
+class Gauge(Counter):
+    """Value that can go up and down."""
+
+    type = 'gauge'
+
+    def set(self, value):
+        with self._lock:
+            self._value = value
+
+    def dec(self, amount=1):
+        self.inc(-amount)
+
+
+class Histogram:
+    """Cumulative bucket histogram, compatible with the Prometheus data model."""
+
+    type = 'histogram'
+
+    def __init__(self, name, description='', labels=None, buckets=DEFAULT_BUCKETS):
+        self.name = name
+        self.description = description
+        self.labels = labels or {}
+        self.buckets = tuple(sorted(buckets))
+        self.bucket_counts = [0] * len(self.buckets)
+        self.count = 0
+        self.sum = 0.0
+        self._lock = threading.Lock()
+
+    def observe(self, value):
+        with self._lock:
+            self.count += 1
+            self.sum += value
+            for i, bound in enumerate(self.buckets):
+                if value <= bound:
+                    self.bucket_counts[i] += 1
+                    break
+
+    @contextmanager
+    def time(self):
+        start = time.perf_counter()
+        try:
+            yield
+        finally:
+            self.observe(time.perf_counter() - start)
+
+    def quantile(self, q):
+        """Estimate a quantile by interpolating within the matching bucket."""
+        with self._lock:
+            if not self.count:
+                return None
+            rank = q * self.count
+            seen = 0
+            lower = 0.0
+            for bound, bucket_count in zip(self.buckets, self.bucket_counts):
+                if bucket_count and seen + bucket_count >= rank:
+                    return lower + (bound - lower) * (rank - seen) / bucket_count
+                seen += bucket_count
+                lower = bound
+            return self.buckets[-1]
+
+    def snapshot(self):
+        with self._lock:
+            cumulative = []
+            running = 0
+            for bound, bucket_count in zip(self.buckets, self.bucket_counts):
+                running += bucket_count
+                cumulative.append((bound, running))
+            snapshot = {
+                'count': self.count,
+                'sum': self.sum,
+                'buckets': cumulative,
+            }
+        snapshot.update({
+            'p50': self.quantile(0.5),
+            'p95': self.quantile(0.95),
+            'p99': self.quantile(0.99),
+        })
+        return snapshot
+
+
+def _get_or_create(cls, name, description, labels, **kwargs):
+    key = (name, tuple(sorted((labels or {}).items())))
+    with _registry_lock:
+        metric = _registry.get(key)
+        if metric is None:
+            metric = cls(name, description, labels, **kwargs)
+            _registry[key] = metric
+        return metric
+
+
+def counter(name, description='', labels=None, fn=None):
+    """Get or create the counter for name + labels."""
+    return _get_or_create(Counter, name, description, labels, fn=fn)
+
+
+def gauge(name, description='', labels=None, fn=None):
+    """Get or create the gauge for name + labels."""
+    return _get_or_create(Gauge, name, description, labels, fn=fn)
+
+
+def histogram(name, description='', labels=None, buckets=DEFAULT_BUCKETS):
+    """Get or create the histogram for name + labels."""
+    return _get_or_create(Histogram, name, description, labels, buckets=buckets)
+
+
+def all_metrics():
+    with _registry_lock:
+        return list(_registry.values())
+
+
+def _escape(value):
+    return str(value).replace('\\', '\\\\').replace('\n', '\\n').replace('"', '\\"')
+
+
+def _escape_help(text):
+    return text.replace('\\', '\\\\').replace('\n', '\\n')
+
+
+def _format_labels(labels):
+    if not labels:
+        return ''
+    return '{' + ','.join(f'{key}="{_escape(value)}"' for key, value in sorted(labels.items())) + '}'
+
+
+def _format_value(value):
+    if value == float('inf'):
+        return '+Inf'
+    return repr(float(value)) if isinstance(value, float) else str(value)
+
+
+def render_prometheus():
+    """Every registered metric in the Prometheus text exposition format (version 0.0.4)."""
+    by_name = {}
+    for metric in all_metrics():
+        by_name.setdefault(metric.name, []).append(metric)
+
+    lines = []
+    for name in sorted(by_name):
+        family = by_name[name]
+        description = next((m.description for m in family if m.description), '')
+        lines.append(f"# HELP {name} {_escape_help(description)}")
+        lines.append(f"# TYPE {name} {family[0].type}")
+        for metric in family:
+            if metric.type != 'histogram':
+                try:
+                    value = metric.value
+                except Exception:
+                    # A failing callback shouldn't break the whole scrape
+                    continue
+                if value is not None:
+                    lines.append(f"{name}{_format_labels(metric.labels)} {_format_value(value)}")
+                continue
+            snapshot = metric.snapshot()
+            for bound, count in snapshot['buckets'] + [(float('inf'), snapshot['count'])]:
+                labels = dict(metric.labels, le=_format_value(float(bound)))
+                lines.append(f"{name}_bucket{_format_labels(labels)} {count}")
+            lines.append(f"{name}_sum{_format_labels(metric.labels)} {_format_value(float(snapshot['sum']))}")
+            lines.append(f"{name}_count{_format_labels(metric.labels)} {snapshot['count']}")
+    return '\n'.join(lines) + '\n'
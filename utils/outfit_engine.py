@@ -0,0 +1,253 @@
+from itertools import product
+import math
+import re
+from utils.context_builder import keywords
+
+SLOTS = ('top', 'bottom', 'shoes', 'outerwear', 'accessory')
+
+# Dresses, jumpsuits etc. fill both the top and bottom slots
+ONE_PIECE = 'one_piece'
+
+SLOT_KEYWORDS = {
+    'shoes': {'shoes', 'shoe', 'sneakers', 'sneaker', 'boots', 'boot', 'sandals', 'sandal', 'loafers', 'loafer',
+              'heels', 'flats', 'slippers', 'trainers', 'oxfords', 'mules', 'clogs', 'slides', 'espadrilles',
+              'footwear'},
+    'outerwear': {'jacket', 'coat', 'blazer', 'parka', 'windbreaker', 'raincoat', 'trench', 'puffer', 'cardigan',
+                  'overcoat', 'anorak', 'gilet', 'shacket', 'peacoat'},
+    ONE_PIECE: {'dress', 'jumpsuit', 'romper', 'overalls', 'gown', 'playsuit'},
+    'bottom': {'jeans', 'pants', 'trousers', 'shorts', 'skirt', 'chinos', 'leggings', 'joggers', 'slacks',
+               'sweatpants', 'cargos', 'culottes'},
+    'top': {'shirt', 'tshirt', 'tee', 'blouse', 'sweater', 'hoodie', 'sweatshirt', 'polo', 'top', 'tank', 'jersey',
+            'turtleneck', 'pullover', 'camisole', 'henley', 'tunic', 'vest'},
+    'accessory': {'hat', 'cap', 'beanie', 'scarf', 'belt', 'watch', 'bag', 'backpack', 'sunglasses', 'glasses',
+                  'necklace', 'bracelet', 'earrings', 'ring', 'gloves', 'tie', 'umbrella', 'purse', 'handbag',
+                  'tote'},
+}
+
+WARM_WORDS = {'wool', 'fleece', 'down', 'puffer', 'parka', 'thermal', 'cashmere', 'knit', 'sweater', 'hoodie',
+              'sweatshirt', 'coat', 'boots', 'turtleneck', 'flannel', 'corduroy', 'beanie', 'gloves', 'scarf',
+              'insulated', 'sherpa', 'quilted'}
+LIGHT_WORDS = {'linen', 'shorts', 'tank', 'sandals', 'sleeveless', 'mesh', 'slides', 'crop', 'tee', 'tshirt',
+               'camisole', 'breathable', 'lightweight'}
+WATERPROOF_WORDS = {'waterproof', 'rain', 'raincoat', 'boots', 'windbreaker', 'anorak', 'nylon', 'gore', 'umbrella'}
+WET_WEATHER_BAD_WORDS = {'suede', 'sandals', 'canvas', 'slides', 'espadrilles'}
+BREATHABLE_WORDS = {'linen', 'cotton', 'breathable', 'moisture', 'wicking', 'mesh', 'dri'}
+
+STYLE_KEYWORDS = {
+    'casual': {'casual', 'jeans', 'tshirt', 'tee', 'sneakers', 'hoodie', 'denim', 'relaxed'},
+    'formal': {'formal', 'blazer', 'suit', 'slacks', 'oxfords', 'loafers', 'button', 'dress', 'tailored', 'tie'},
+    'business': {'business', 'blazer', 'slacks', 'chinos', 'button', 'loafers', 'oxfords', 'polo', 'tailored'},
+    'sporty': {'sporty', 'athletic', 'running', 'track', 'joggers', 'leggings', 'sneakers', 'jersey', 'trainers'},
+    'bohemian': {'bohemian', 'boho', 'flowy', 'maxi', 'embroidered', 'fringe', 'linen', 'floral', 'crochet'},
+}
+
+PRECIPITATION = {'rain', 'drizzle', 'thunderstorm', 'snow'}
+
+# The temperature rules of utils.weather_utils.get_weather_recommendations
+# (10/15/20/25 °C) converted to the Fahrenheit the weather data is in, with
+# the total outfit warmth each band calls for
+TEMPERATURE_BANDS = ((50, 3), (59, 2), (68, 1), (77, 0))
+HOT_TARGET_WARMTH = -2
+# Below this an outer layer is expected
+OUTERWEAR_BELOW = 59
+
+WARMTH_WEIGHT = 0.5
+# Widest warmth gap between two pieces of one outfit before it's penalized
+MAX_WARMTH_SPREAD = 3
+
+_WORD_RE = re.compile(r'[a-z]+')
+
+
+def _words(text):
+    # "t-shirt" -> "tshirt" so it doesn't read as a lone "t" and "shirt"
+    return _WORD_RE.findall((text or '').lower().replace('t-shirt', 'tshirt'))
+
+
+def slot_for(item):
+    """Slot of a ClothingItem, or None if it isn't something to wear.
+
+    The last recognised word of the type wins, so "dress shoes" are shoes
+    and "denim jacket" is outerwear.
+    """
+    for text in (item.type, item.short_description):
+        for word in reversed(_words(text)):
+            for slot, slot_words in SLOT_KEYWORDS.items():
+                if word in slot_words:
+                    return slot
+    return None
+
+
+def item_name(item):
+    name = item.type or 'item'
+    if item.color and item.color.lower() not in name.lower():
+        name = f"{item.color} {name}"
+    return name.title()
+
+
+def target_warmth(temperature):
+    if temperature is None:
+        return 0
+    for below, warmth in TEMPERATURE_BANDS:
+        if temperature < below:
+            return warmth
+    return HOT_TARGET_WARMTH
+
+
+def _item_features(item, slot, weather, preferences, feedback, relevance):
+    """Warmth and standalone score of one item."""
+    words = set(_words(' '.join(filter(None, [
+        item.type, item.material, item.key_features, item.short_description, item.overall_vibe
+    ]))))
+    warmth = len(words & WARM_WORDS) - len(words & LIGHT_WORDS)
+    warmth = max(-1, min(2, warmth)) + (1 if slot == 'outerwear' else 0)
+
+    temperature = weather.get('feels_like', weather.get('temperature'))
+    score = 0.0
+    if temperature is not None:
+        if temperature >= TEMPERATURE_BANDS[-1][0] and warmth > 0:
+            score -= 0.5 * warmth
+        elif temperature < TEMPERATURE_BANDS[0][0] and warmth < 0:
+            score += 0.5 * warmth
+
+    if weather.get('condition') in PRECIPITATION:
+        score += 0.5 * bool(words & WATERPROOF_WORDS) - 0.5 * bool(words & WET_WEATHER_BAD_WORDS)
+    if (weather.get('humidity') or 0) > 70:
+        score += 0.25 * bool(words & BREATHABLE_WORDS)
+
+    vibe = (item.overall_vibe or '').lower()
+    style_score = 0.0
+    for style in preferences.get('styles', []):
+        if style in vibe or words & STYLE_KEYWORDS.get(style, set()):
+            style_score += 0.5
+    custom_words = keywords(preferences.get('custom_style'))
+    if custom_words & words:
+        style_score += 0.5
+    score += min(style_score, 1.0)
+
+    # Items named in liked recommendations go up, in disliked ones down
+    type_words = keywords(item.type)
+    color_words = keywords(item.color)
+    for entry_words, value in feedback:
+        if type_words and type_words <= entry_words:
+            score += value * (0.5 + 0.25 * bool(color_words & entry_words))
+
+    score += relevance.get(item.id, 0.0)
+    return warmth, score
+
+
+def _pick_diverse(combos, scores, count, max_shared):
+    """Best-scoring combos, skipping ones sharing more than max_shared items with a pick."""
+    import numpy as np
+    chosen = []
+    for index in np.argsort(-scores):
+        combo = combos[index]
+        worn = combo[combo >= 0]
+        if all(np.isin(worn, combos[other]).sum() <= max_shared for other in chosen):
+            chosen.append(index)
+            if len(chosen) == count:
+                break
+    return chosen
+
+
+def generate_outfits(items, weather, preferences=None, feedback=None, relevance=None, count=3, slot_candidates=6):
+    """Build and rank complete outfits from a user's ClothingItems.
+
+    feedback is a list of RecommendationFeedback rows and relevance an
+    optional {item_id: score} bonus (e.g. similarity to a weather query).
+    Each slot keeps its slot_candidates best items, every valid combination
+    of those is scored at once with NumPy, and the best `count` reasonably
+    different outfits are returned as
+    [{'items': [ClothingItem], 'score': float, 'confidence': float, 'reasons': [str]}].
+    """
+    # Imported here so loading the app doesn't pay for NumPy
+    import numpy as np
+    weather = weather or {}
+    preferences = preferences or {}
+    relevance = relevance or {}
+    feedback_words = [
+        (keywords(entry.recommendation), 1 if entry.feedback == 'like' else -1)
+        for entry in (feedback or [])
+        if entry.feedback in ('like', 'dislike')
+    ]
+
+    by_slot = {slot: [] for slot in SLOTS + (ONE_PIECE,)}
+    warmth = []
+    item_scores = []
+    wearable = []
+    for item in items:
+        slot = slot_for(item)
+        if slot is None:
+            continue
+        item_warmth, item_score = _item_features(item, slot, weather, preferences, feedback_words, relevance)
+        by_slot[slot].append(len(wearable))
+        wearable.append(item)
+        warmth.append(item_warmth)
+        item_scores.append(item_score)
+    if not wearable:
+        return []
+
+    # Index len(wearable) is an empty slot with no warmth or score
+    empty = len(wearable)
+    warmth = np.array(warmth + [0], dtype=np.float32)
+    item_scores = np.array(item_scores + [0], dtype=np.float32)
+
+    def best(slot, optional):
+        indexes = sorted(by_slot[slot], key=lambda i: -item_scores[i])[:slot_candidates]
+        return indexes + [empty] if optional or not indexes else indexes
+
+    bases = [(top, bottom) for top, bottom in product(best('top', False), best('bottom', False))]
+    bases += [(dress, empty) for dress in best(ONE_PIECE, False) if dress != empty]
+    rest = list(product(best('shoes', False), best('outerwear', True), best('accessory', True)))
+    combos = np.array([base + other for base in bases for other in rest], dtype=np.int64)
+    # An outfit needs something on top or a one-piece, plus at least one other piece
+    combos = combos[(combos[:, 0] != empty) & ((combos != empty).sum(axis=1) >= 2)]
+    if not len(combos):
+        return []
+
+    temperature = weather.get('feels_like', weather.get('temperature'))
+    scores = item_scores[combos].sum(axis=1)
+    combo_warmth = warmth[combos]
+    scores -= WARMTH_WEIGHT * np.abs(combo_warmth.sum(axis=1) - target_warmth(temperature))
+    # Shorts under a wool coat average out fine but don't make sense together
+    worn = combos != empty
+    spread = np.where(worn, combo_warmth, -np.inf).max(axis=1) - np.where(worn, combo_warmth, np.inf).min(axis=1)
+    scores -= WARMTH_WEIGHT * np.clip(spread - MAX_WARMTH_SPREAD, 0, None)
+    has_outerwear = combos[:, 3] != empty
+    needs_outerwear = (temperature is not None and temperature < OUTERWEAR_BELOW) or \
+        weather.get('condition') in PRECIPITATION
+    if needs_outerwear:
+        scores -= 1.0 * ~has_outerwear
+    elif temperature is not None and temperature >= TEMPERATURE_BANDS[-1][0]:
+        scores -= 1.0 * has_outerwear
+
+    combos[combos == empty] = -1
+    outfits = []
+    for index in _pick_diverse(combos, scores, count, max_shared=1) or _pick_diverse(combos, scores, count, 4):
+        chosen = [wearable[i] for i in combos[index] if i >= 0]
+        score = float(scores[index])
+        reasons = []
+        if temperature is not None:
+            reasons.append(f"suited to {temperature}°F")
+        if has_outerwear[index] and needs_outerwear:
+            reasons.append(f"the {item_name(wearable[combos[index][3]]).lower()} for the "
+                           f"{'wet' if weather.get('condition') in PRECIPITATION else 'cold'}")
+        styles = [style for style in preferences.get('styles', []) if style in STYLE_KEYWORDS]
+        if styles:
+            reasons.append(f"in line with your {' and '.join(styles)} style")
+        outfits.append({
+            'items': chosen,
+            'score': score,
+            # Squash the open-ended score into 0-1
+            'confidence': round(1 / (1 + math.exp(-score / 2)), 2),
+            'reasons': reasons,
+        })
+    return outfits
+
+
+def describe_outfit(outfit):
+    """One-line explanation built from the engine's own reasons, for when no LLM is used."""
+    names = [item_name(item) for item in outfit['items']]
+    listed = names[0] if len(names) == 1 else f"{', '.join(names[:-1])} and {names[-1]}"
+    if not outfit['reasons']:
+        return f"{listed}."
+    return f"{listed}: {', '.join(outfit['reasons'])}."
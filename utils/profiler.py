@@ -0,0 +1,244 @@
+from collections import Counter
+from contextlib import contextmanager
+from datetime import datetime
+import cProfile
+import functools
+import json
+import logging
+import os
+import sys
+import threading
+import time
+import tracemalloc
+import uuid
+
+logger = logging.getLogger(__name__)
+
+MODES = ('cprofile', 'sample', 'memory')
+DEFAULT_MODES = ('cprofile', 'sample')
+
+# Lines of the tracemalloc report
+MEMORY_TOP_LINES = 30
+
+# From Python 3.12 cProfile hooks into sys.monitoring, which allows a single
+# active profiler per process, so profiled requests take turns
+_cprofile_lock = threading.Lock()
+_tracemalloc_users = 0
+_tracemalloc_lock = threading.Lock()
+
+
+class StackSampler:
+    """Samples one thread's Python stack every `interval` seconds into folded stacks.
+
+    The output (`frame;frame;frame count` per line) is what flamegraph.pl,
+    speedscope and most flame graph viewers read.
+    """
+
+    def __init__(self, thread_id, interval=0.005):
+        self.thread_id = thread_id
+        self.interval = interval
+        self.stacks = Counter()
+        self._stop = threading.Event()
+        self._thread = None
+
+    def _sample(self):
+        frame = sys._current_frames().get(self.thread_id)
+        stack = []
+        while frame is not None:
+            code = frame.f_code
+            stack.append(f"{code.co_name} ({os.path.basename(code.co_filename)}:{code.co_firstlineno})")
+            frame = frame.f_back
+        if stack:
+            self.stacks[';'.join(reversed(stack))] += 1
+
+    def _run(self):
+        while not self._stop.wait(self.interval):
+            self._sample()
+
+    def start(self):
+        self._thread = threading.Thread(target=self._run, name=f'stack-sampler-{self.thread_id}', daemon=True)
+        self._thread.start()
+
+    def stop(self):
+        self._stop.set()
+        if self._thread is not None:
+            self._thread.join()
+
+    def folded(self):
+        return ''.join(f"{stack} {count}\n" for stack, count in self.stacks.most_common())
+
+
+class Profile:
+    """cProfile, stack sampling and/or tracemalloc data for one request or task on the current thread."""
+
+    def __init__(self, profile_id, modes=DEFAULT_MODES, sample_interval=0.005):
+        self.profile_id = profile_id
+        self.modes = [mode for mode in modes if mode in MODES]
+        self.sample_interval = sample_interval
+        self.sections = {}
+        self.started_at = None
+        self.duration = None
+        self._profiler = None
+        self._sampler = None
+        self._memory_start = None
+        self._memory_end = None
+        self._memory_peak = None
+        self._start = None
+
+    def start(self):
+        global _tracemalloc_users
+        self.started_at = datetime.utcnow()
+        if 'memory' in self.modes:
+            with _tracemalloc_lock:
+                if not tracemalloc.is_tracing():
+                    tracemalloc.start(10)
+                _tracemalloc_users += 1
+            self._memory_start = tracemalloc.take_snapshot()
+        if 'sample' in self.modes:
+            self._sampler = StackSampler(threading.get_ident(), self.sample_interval)
+            self._sampler.start()
+        if 'cprofile' in self.modes and _cprofile_lock.acquire(blocking=False):
+            self._profiler = cProfile.Profile()
+            self._profiler.enable()
+        self._start = time.perf_counter()
+
+    def stop(self):
+        global _tracemalloc_users
+        self.duration = time.perf_counter() - self._start
+        if self._profiler is not None:
+            self._profiler.disable()
+            _cprofile_lock.release()
+        if self._sampler is not None:
+            self._sampler.stop()
+        if self._memory_start is not None:
+            self._memory_end = tracemalloc.take_snapshot()
+            self._memory_peak = tracemalloc.get_traced_memory()[1]
+            with _tracemalloc_lock:
+                _tracemalloc_users -= 1
+                if not _tracemalloc_users:
+                    tracemalloc.stop()
+
+    @contextmanager
+    def section(self, name):
+        start = time.perf_counter()
+        try:
+            yield
+        finally:
+            self.sections[name] = self.sections.get(name, 0.0) + time.perf_counter() - start
+
+    def save(self, directory, **metadata):
+        """Write <id>.prof, <id>.folded, <id>.memory.txt and <id>.json to directory."""
+        os.makedirs(directory, exist_ok=True)
+        files = []
+        if self._profiler is not None:
+            self._profiler.dump_stats(os.path.join(directory, f"{self.profile_id}.prof"))
+            files.append(f"{self.profile_id}.prof")
+        if self._sampler is not None and self._sampler.stacks:
+            with open(os.path.join(directory, f"{self.profile_id}.folded"), 'w') as f:
+                f.write(self._sampler.folded())
+            files.append(f"{self.profile_id}.folded")
+        if self._memory_end is not None:
+            # Leave out the sampler's and tracemalloc's own allocations
+            filters = [tracemalloc.Filter(False, __file__), tracemalloc.Filter(False, tracemalloc.__file__)]
+            stats = self._memory_end.filter_traces(filters).compare_to(
+                self._memory_start.filter_traces(filters), 'lineno'
+            )
+            with open(os.path.join(directory, f"{self.profile_id}.memory.txt"), 'w') as f:
+                f.write(f"Allocations that grew during {self.profile_id}, largest first\n\n")
+                for stat in stats[:MEMORY_TOP_LINES]:
+                    f.write(f"{stat}\n")
+                # Process-wide while tracing, so it includes concurrent requests
+                f.write(f"\nPeak traced memory: {self._memory_peak / 1024 / 1024:.1f} MiB\n")
+            files.append(f"{self.profile_id}.memory.txt")
+
+        metadata.update({
+            'id': self.profile_id,
+            'started_at': self.started_at.isoformat(),
+            'duration_ms': round(self.duration * 1000, 2),
+            'modes': self.modes,
+            'cprofile_skipped': 'cprofile' in self.modes and self._profiler is None,
+            'sections_ms': {name: round(seconds * 1000, 2) for name, seconds in self.sections.items()},
+            'files': files,
+        })
+        with open(os.path.join(directory, f"{self.profile_id}.json"), 'w') as f:
+            json.dump(metadata, f, indent=2)
+        return metadata
+
+
+def new_profile_id(label):
+    safe_label = ''.join(c if c.isalnum() else '-' for c in label or 'request')[:40]
+    return f"{datetime.utcnow():%Y%m%dT%H%M%S}-{safe_label}-{uuid.uuid4().hex[:8]}"
+
+
+def list_profiles(directory):
+    """Metadata of the saved profiles, newest first."""
+    if not os.path.isdir(directory):
+        return []
+    profiles = []
+    for name in os.listdir(directory):
+        if name.endswith('.json'):
+            try:
+                with open(os.path.join(directory, name)) as f:
+                    profiles.append(json.load(f))
+            except (OSError, ValueError):
+                continue
+    return sorted(profiles, key=lambda profile: profile['started_at'], reverse=True)
+
+
+def prune_profiles(directory, keep):
+    """Delete all but the `keep` newest profiles."""
+    for profile in list_profiles(directory)[keep:]:
+        for name in profile['files'] + [f"{profile['id']}.json"]:
+            try:
+                os.remove(os.path.join(directory, name))
+            except FileNotFoundError:
+                pass
+
+
+# The profile of the request being handled, if any. Set by routes.profiler.
+_current = threading.local()
+
+
+def current_profile():
+    return getattr(_current, 'profile', None)
+
+
+def set_current_profile(profile):
+    _current.profile = profile
+
+
+@contextmanager
+def section(name):
+    """Time a named part of the request (e.g. prompt construction) when it is being profiled."""
+    profile = current_profile()
+    if profile is None:
+        yield
+        return
+    with profile.section(name):
+        yield
+
+
+def follow(fn, directory, label):
+    """Wrap fn so calls on other threads (e.g. upload workers) are profiled too, if the current request is.
+
+    Each call is saved as its own profile, linked to the request's profile ID.
+    """
+    parent = current_profile()
+    if parent is None:
+        return fn
+
+    @functools.wraps(fn)
+    def wrapper(*args, **kwargs):
+        profile = Profile(f"{parent.profile_id}-{label}-{uuid.uuid4().hex[:4]}", parent.modes, parent.sample_interval)
+        profile.start()
+        set_current_profile(profile)
+        try:
+            return fn(*args, **kwargs)
+        finally:
+            set_current_profile(None)
+            profile.stop()
+            try:
+                profile.save(directory, parent=parent.profile_id, task=label)
+            except Exception as e:
+                logger.error(f"Error saving profile {profile.profile_id}: {str(e)}")
+    return wrapper
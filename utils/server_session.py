@@ -0,0 +1,286 @@
+from flask import current_app, session
+from flask.json.tag import TaggedJSONSerializer
+from flask.sessions import SessionInterface, SessionMixin
+from itsdangerous import BadSignature, Signer
+from werkzeug.datastructures import CallbackDict
+import json
+import logging
+import os
+import secrets
+import sqlite3
+import threading
+import time
+
+logger = logging.getLogger(__name__)
+
+# Seconds between sweeps of expired sessions in the SQLite and filesystem stores
+CLEANUP_INTERVAL = 10 * 60
+
+
+class ServerSideSession(CallbackDict, SessionMixin):
+    """Session data kept on the server; the cookie only carries `sid`."""
+
+    def __init__(self, initial=None, sid=None, new=False):
+        def on_update(session):
+            session.modified = True
+        super().__init__(initial, on_update)
+        self.sid = sid
+        self.new = new
+        self.modified = False
+
+
+class SQLiteSessionStore:
+    """Sessions in a SQLite file, shared by every worker process on the host."""
+
+    def __init__(self, path):
+        self.path = path
+        self._db_ready = False
+        self._last_cleanup = 0
+        self._lock = threading.Lock()
+
+    def _connect(self):
+        conn = sqlite3.connect(self.path, timeout=5)
+        if not self._db_ready:
+            conn.execute('PRAGMA journal_mode=WAL')
+            conn.execute(
+                'CREATE TABLE IF NOT EXISTS sessions '
+                '(id TEXT PRIMARY KEY, data TEXT NOT NULL, expires_at REAL NOT NULL)'
+            )
+            conn.commit()
+            self._db_ready = True
+        return conn
+
+    def load(self, sid):
+        conn = self._connect()
+        try:
+            row = conn.execute(
+                'SELECT data FROM sessions WHERE id = ? AND expires_at > ?', (sid, time.time())
+            ).fetchone()
+        finally:
+            conn.close()
+        return row[0] if row else None
+
+    def save(self, sid, data, lifetime):
+        now = time.time()
+        conn = self._connect()
+        try:
+            conn.execute(
+                'INSERT OR REPLACE INTO sessions (id, data, expires_at) VALUES (?, ?, ?)',
+                (sid, data, now + lifetime)
+            )
+            with self._lock:
+                cleanup = now - self._last_cleanup > CLEANUP_INTERVAL
+                if cleanup:
+                    self._last_cleanup = now
+            if cleanup:
+                conn.execute('DELETE FROM sessions WHERE expires_at <= ?', (now,))
+            conn.commit()
+        finally:
+            conn.close()
+
+    def delete(self, sid):
+        conn = self._connect()
+        try:
+            conn.execute('DELETE FROM sessions WHERE id = ?', (sid,))
+            conn.commit()
+        finally:
+            conn.close()
+
+
+class FileSystemSessionStore:
+    """One JSON file per session in `directory`."""
+
+    def __init__(self, directory):
+        self.directory = directory
+        self._last_cleanup = 0
+        self._lock = threading.Lock()
+        os.makedirs(directory, exist_ok=True)
+
+    def _path(self, sid):
+        return os.path.join(self.directory, sid)
+
+    def _read(self, path):
+        try:
+            with open(path) as f:
+                return json.load(f)
+        except (OSError, ValueError):
+            return None
+
+    def load(self, sid):
+        entry = self._read(self._path(sid))
+        if entry is None or entry['expires_at'] <= time.time():
+            return None
+        return entry['data']
+
+    def save(self, sid, data, lifetime):
+        now = time.time()
+        path = self._path(sid)
+        # Write then rename so readers never see a partial file
+        tmp_path = f"{path}.{threading.get_ident()}.tmp"
+        with open(tmp_path, 'w') as f:
+            json.dump({'data': data, 'expires_at': now + lifetime}, f)
+        os.replace(tmp_path, path)
+
+        with self._lock:
+            if now - self._last_cleanup <= CLEANUP_INTERVAL:
+                return
+            self._last_cleanup = now
+        for name in os.listdir(self.directory):
+            entry_path = os.path.join(self.directory, name)
+            entry = self._read(entry_path)
+            if entry is not None and entry['expires_at'] <= now:
+                try:
+                    os.remove(entry_path)
+                except OSError:
+                    pass
+
+    def delete(self, sid):
+        try:
+            os.remove(self._path(sid))
+        except FileNotFoundError:
+            pass
+
+
+class RedisSessionStore:
+    """Sessions in Redis, or anything speaking its get/setex/delete API (Valkey, KeyDB, ...).
+
+    Entries expire on their own, so no cleanup is needed.
+    """
+
+    def __init__(self, client, key_prefix='session:'):
+        self.client = client
+        self.key_prefix = key_prefix
+
+    def load(self, sid):
+        data = self.client.get(self.key_prefix + sid)
+        return data.decode('utf-8') if isinstance(data, bytes) else data
+
+    def save(self, sid, data, lifetime):
+        self.client.setex(self.key_prefix + sid, int(lifetime), data)
+
+    def delete(self, sid):
+        self.client.delete(self.key_prefix + sid)
+
+
+class ServerSideSessionInterface(SessionInterface):
+    """Keeps session data in `store`; the cookie holds a signed random session ID.
+
+    Sessions are only written when they change (or on every request for
+    permanent sessions with SESSION_REFRESH_EACH_REQUEST), and requests for
+    static files never touch the store.
+    """
+
+    serializer = TaggedJSONSerializer()
+
+    def __init__(self, store):
+        self.store = store
+
+    def _signer(self, app):
+        return Signer(app.secret_key, salt='server-side-session')
+
+    def _new_session(self):
+        return ServerSideSession(sid=secrets.token_urlsafe(32), new=True)
+
+    def regenerate(self, session):
+        """Move the session to a new ID and delete the old one from the store.
+
+        Call whenever the login state changes, so an ID planted or seen
+        before login can't be used afterwards (session fixation).
+        """
+        if not session.new:
+            try:
+                self.store.delete(session.sid)
+            except Exception as e:
+                logger.error(f"Error deleting session: {str(e)}")
+        session.sid = secrets.token_urlsafe(32)
+        session.modified = True
+
+    def open_session(self, app, request):
+        cookie = request.cookies.get(self.get_cookie_name(app))
+        if not cookie:
+            return self._new_session()
+        try:
+            sid = self._signer(app).unsign(cookie).decode('utf-8')
+        except BadSignature:
+            return self._new_session()
+        if app.static_url_path and request.path.startswith(f"{app.static_url_path}/"):
+            return ServerSideSession(sid=sid)
+
+        try:
+            data = self.store.load(sid)
+        except Exception as e:
+            logger.error(f"Error loading session: {str(e)}")
+            data = None
+        if data is None:
+            # Unknown or expired IDs are never reused
+            return self._new_session()
+        return ServerSideSession(self.serializer.loads(data), sid=sid)
+
+    def save_session(self, app, session, response):
+        name = self.get_cookie_name(app)
+        domain = self.get_cookie_domain(app)
+        path = self.get_cookie_path(app)
+        secure = self.get_cookie_secure(app)
+        samesite = self.get_cookie_samesite(app)
+        httponly = self.get_cookie_httponly(app)
+
+        if session.accessed:
+            response.vary.add('Cookie')
+
+        if not session:
+            if session.modified and not session.new:
+                self.store.delete(session.sid)
+                response.delete_cookie(name, domain=domain, path=path, secure=secure,
+                                       samesite=samesite, httponly=httponly)
+                response.vary.add('Cookie')
+            return
+
+        if not self.should_set_cookie(app, session):
+            return
+
+        lifetime = app.permanent_session_lifetime.total_seconds()
+        self.store.save(session.sid, self.serializer.dumps(dict(session)), lifetime)
+        response.set_cookie(
+            name,
+            self._signer(app).sign(session.sid).decode('utf-8'),
+            expires=self.get_expiration_time(app, session),
+            httponly=httponly,
+            domain=domain,
+            path=path,
+            secure=secure,
+            samesite=samesite
+        )
+        response.vary.add('Cookie')
+
+
+def regenerate_session():
+    """Give the current session a new ID, if it is kept server-side; see ServerSideSessionInterface.regenerate."""
+    interface = current_app.session_interface
+    if isinstance(interface, ServerSideSessionInterface):
+        interface.regenerate(session)
+
+
+def init_session(app):
+    """Install the session backend chosen by SESSION_BACKEND.
+
+    'cookie' keeps Flask's signed cookie sessions; 'sqlite' and 'filesystem'
+    default to files in the instance folder; 'redis' needs the redis package
+    and SESSION_REDIS_URL.
+    """
+    backend = app.config.get('SESSION_BACKEND', 'sqlite')
+    if backend == 'cookie':
+        return
+    if backend == 'sqlite':
+        path = app.config.get('SESSION_SQLITE_PATH') or os.path.join(app.instance_path, 'sessions.db')
+        os.makedirs(os.path.dirname(os.path.abspath(path)), exist_ok=True)
+        store = SQLiteSessionStore(path)
+    elif backend == 'filesystem':
+        store = FileSystemSessionStore(
+            app.config.get('SESSION_FILE_DIR') or os.path.join(app.instance_path, 'sessions')
+        )
+    elif backend == 'redis':
+        import redis
+        store = RedisSessionStore(redis.from_url(app.config['SESSION_REDIS_URL']))
+    else:
+        raise ValueError(f"Unknown SESSION_BACKEND: {backend}")
+    app.session_interface = ServerSideSessionInterface(store)
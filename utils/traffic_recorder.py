@@ -0,0 +1,124 @@
+from datetime import datetime, timezone
+import hashlib
+import hmac
+import json
+import logging
+import os
+import threading
+import time
+
+logger = logging.getLogger(__name__)
+
+# Query arguments whose values are kept; any other value only has its length recorded
+SAFE_QUERY_ARGS = ('page', 'mode', 'refresh')
+
+_write_lock = threading.Lock()
+
+
+class Trace:
+    """What one request did, without its content: timing, sizes, SQL and upstream calls."""
+
+    def __init__(self):
+        self.started_at = time.time()
+        self._start = time.perf_counter()
+        self.upstream = []
+
+    @property
+    def timestamp(self):
+        return datetime.fromtimestamp(self.started_at, timezone.utc).isoformat()
+
+    def elapsed_ms(self):
+        return round((time.perf_counter() - self._start) * 1000, 2)
+
+    def add_upstream(self, service, operation, seconds, outcome):
+        self.upstream.append({
+            'service': service,
+            'operation': operation,
+            'offset_ms': round(self.elapsed_ms() - seconds * 1000, 2),
+            'duration_ms': round(seconds * 1000, 2),
+            'outcome': outcome,
+        })
+
+
+def pseudonymize(user_id, secret):
+    """A stable per-user token that can't be mapped back to the user ID without the secret."""
+    if user_id is None:
+        return None
+    digest = hmac.new(secret.encode('utf-8'), str(user_id).encode('utf-8'), hashlib.sha256).hexdigest()
+    return f"u-{digest[:12]}"
+
+
+def describe(value):
+    """Replace a request value by its shape: booleans and nulls are kept, anything else becomes its type and size."""
+    if value is None or isinstance(value, bool):
+        return value
+    if isinstance(value, str):
+        return f"str:{len(value)}"
+    if isinstance(value, (int, float)):
+        return 'number'
+    if isinstance(value, list):
+        return f"list:{len(value)}"
+    if isinstance(value, dict):
+        return {key: describe(item) for key, item in value.items()}
+    return type(value).__name__
+
+
+def describe_query(args):
+    return {
+        key: value if key in SAFE_QUERY_ARGS else describe(value)
+        for key, value in args.items()
+    }
+
+
+def write_trace(path, entry, max_bytes):
+    """Append entry to the JSONL file at path, moving a full file to <path>.1 first."""
+    line = json.dumps(entry, separators=(',', ':')) + '\n'
+    with _write_lock:
+        directory = os.path.dirname(path)
+        if directory:
+            os.makedirs(directory, exist_ok=True)
+        try:
+            if max_bytes and os.path.getsize(path) + len(line) > max_bytes:
+                os.replace(path, f"{path}.1")
+        except FileNotFoundError:
+            pass
+        with open(path, 'a') as f:
+            f.write(line)
+
+
+def read_traces(path):
+    """Yield the traces of a JSONL file in order, skipping lines that don't parse."""
+    with open(path) as f:
+        for number, line in enumerate(f, 1):
+            if not line.strip():
+                continue
+            try:
+                yield json.loads(line)
+            except ValueError:
+                logger.warning(f"Skipping unreadable trace on line {number} of {path}")
+
+
+def trace_timestamp(trace):
+    return datetime.fromisoformat(trace['ts']).timestamp()
+
+
+# The trace of the request being handled, if it is recorded. Set by routes.traffic.
+_current = threading.local()
+
+
+def current_trace():
+    return getattr(_current, 'trace', None)
+
+
+def set_current_trace(trace):
+    _current.trace = trace
+
+
+def record_upstream(service, operation, seconds, outcome):
+    """Add an OpenAI or weather API call to the current request's trace, if it is recorded.
+
+    Calls made on other threads (e.g. upload workers) are not part of any trace.
+    """
+    trace = current_trace()
+    if trace is not None:
+        trace.add_upstream(service, operation, seconds, outcome)
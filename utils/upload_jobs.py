@@ -0,0 +1,117 @@
+from concurrent.futures import ThreadPoolExecutor
+from datetime import datetime
+import threading
+import logging
+import uuid
+
+logger = logging.getLogger(__name__)
+
+# In-memory job registry. Jobs live in the process that accepted the upload,
+# so the status endpoint has to be served by the same worker process.
+_jobs = {}
+_jobs_lock = threading.Lock()
+_executor = None
+_executor_lock = threading.Lock()
+
+# Finished jobs are kept around this long so the client can still poll them
+JOB_RETENTION_SECONDS = 60 * 60
+
+
+def get_executor(max_workers=4):
+    """Return the shared worker pool, creating it on first use."""
+    global _executor
+    if _executor is None:
+        with _executor_lock:
+            if _executor is None:
+                _executor = ThreadPoolExecutor(max_workers=max_workers, thread_name_prefix='upload-worker')
+    return _executor
+
+
+def _prune_jobs():
+    now = datetime.utcnow()
+    expired = [
+        job_id for job_id, job in _jobs.items()
+        if job['finished_at'] and (now - job['finished_at']).total_seconds() > JOB_RETENTION_SECONDS
+    ]
+    for job_id in expired:
+        del _jobs[job_id]
+
+
+def create_job(user_id, total):
+    """Register a new job for user_id covering `total` files and return its id."""
+    job_id = uuid.uuid4().hex
+    with _jobs_lock:
+        _prune_jobs()
+        _jobs[job_id] = {
+            'id': job_id,
+            'user_id': user_id,
+            'status': 'queued',
+            'total': total,
+            'completed': 0,
+            'files': [],
+            'error': None,
+            'created_at': datetime.utcnow(),
+            'finished_at': None,
+        }
+    return job_id
+
+
+def get_job(job_id):
+    """Return a snapshot of the job, or None if it is unknown or expired."""
+    with _jobs_lock:
+        job = _jobs.get(job_id)
+        if not job:
+            return None
+        return dict(job, files=list(job['files']))
+
+
+def _update_job(job_id, **fields):
+    with _jobs_lock:
+        job = _jobs.get(job_id)
+        if job:
+            job.update(fields)
+
+
+def _append_result(job_id, result):
+    """Add a finished file's result; returns True once every file of the job is done."""
+    with _jobs_lock:
+        job = _jobs.get(job_id)
+        if not job:
+            return False
+        job['files'].append(result)
+        job['completed'] += 1
+        return job['completed'] >= job['total']
+
+
+def submit_job(app, job_id, process_file, tasks):
+    """Run process_file(task) for every task on the worker pool, one task per file.
+
+    The files of a job are analysed in parallel, up to UPLOAD_WORKERS at a
+    time. Each call runs inside an application context so it can use the
+    database. process_file must return a result dict which is appended to
+    the job; if it raises, the file's result and the job carry the error.
+    The job is done once every file has a result.
+    """
+    def run(task):
+        _update_job(job_id, status='processing')
+        try:
+            with app.app_context():
+                result = process_file(task)
+        except Exception as e:
+            logger.error(f"Error processing upload task in job {job_id}: {str(e)}")
+            result = {
+                'message': 'Image uploaded successfully (processing failed)',
+                'image_url': task.get('image_url'),
+                'error': str(e)
+            }
+            _update_job(job_id, error=str(e))
+        if _append_result(job_id, result):
+            _update_job(job_id, status='done', finished_at=datetime.utcnow())
+
+    executor = get_executor(app.config.get('UPLOAD_WORKERS', 4))
+    try:
+        for task in tasks:
+            executor.submit(run, task)
+    except Exception as e:
+        logger.error(f"Upload job {job_id} failed: {str(e)}")
+        _update_job(job_id, status='failed', error=str(e), finished_at=datetime.utcnow())
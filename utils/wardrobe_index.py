@@ -0,0 +1,173 @@
+from flask import current_app
+from sqlalchemy import func
+import threading
+import logging
+from models import ClothingItem
+from utils.cache import TTLCache
+
+logger = logging.getLogger(__name__)
+
+N_FEATURES = 2 ** 18
+
+_vectorizer = None
+_vectorizer_lock = threading.Lock()
+
+
+def get_vectorizer():
+    """Return the shared HashingVectorizer, importing scikit-learn on first use.
+
+    HashingVectorizer is stateless, so items can be added to an index one at
+    a time without refitting anything. Vectors stay sparse: with 2**18
+    buckets hash collisions between wardrobe words are rare.
+    """
+    global _vectorizer
+    if _vectorizer is None:
+        with _vectorizer_lock:
+            if _vectorizer is None:
+                from sklearn.feature_extraction.text import HashingVectorizer
+                _vectorizer = HashingVectorizer(
+                    n_features=N_FEATURES,
+                    ngram_range=(1, 2),
+                    alternate_sign=False,
+                    norm='l2',
+                    stop_words='english'
+                )
+    return _vectorizer
+
+ITEM_TEXT_FIELDS = ('type', 'color', 'material', 'key_features', 'short_description', 'overall_vibe', 'brand')
+
+
+def item_text(item):
+    return ' '.join(str(getattr(item, field)) for field in ITEM_TEXT_FIELDS if getattr(item, field))
+
+
+def embed(texts):
+    """L2-normalized sparse float32 vectors, one row per text."""
+    import numpy as np
+    return get_vectorizer().transform(texts).astype(np.float32).tocsr()
+
+
+class WardrobeIndex:
+    """Cosine-similarity index over one user's ClothingItems."""
+
+    def __init__(self):
+        import numpy as np
+        import scipy.sparse as sp
+        self.ids = np.empty(0, dtype=np.int64)
+        self.vectors = sp.csr_matrix((0, N_FEATURES), dtype=np.float32)
+        self._lock = threading.Lock()
+
+    def add(self, items):
+        import numpy as np
+        import scipy.sparse as sp
+        items = [item for item in items if item.id is not None]
+        if not items:
+            return
+        vectors = embed([item_text(item) for item in items])
+        ids = np.array([item.id for item in items], dtype=np.int64)
+        with self._lock:
+            # Re-adding an item replaces its old vector
+            keep = ~np.isin(self.ids, ids)
+            self.ids = np.concatenate([self.ids[keep], ids])
+            self.vectors = sp.vstack([self.vectors[keep], vectors], format='csr')
+
+    def remove(self, item_ids):
+        import numpy as np
+        with self._lock:
+            keep = ~np.isin(self.ids, np.asarray(list(item_ids), dtype=np.int64))
+            self.ids = self.ids[keep]
+            self.vectors = self.vectors[keep]
+
+    def signature(self):
+        with self._lock:
+            return len(self.ids), int(self.ids.max()) if len(self.ids) else None
+
+    def search(self, query, k=20):
+        """Return [(item_id, score)] for the k items most similar to query."""
+        import numpy as np
+        with self._lock:
+            ids, vectors = self.ids, self.vectors
+        if not len(ids):
+            return []
+        scores = (vectors @ embed([query]).T).toarray().ravel()
+        # Break ties (e.g. a query with no matching words) in favor of newer items
+        scores = scores + 1e-6 * ids / ids.max()
+        k = min(k, len(ids))
+        top = np.argpartition(-scores, k - 1)[:k]
+        top = top[np.argsort(-scores[top])]
+        return [(int(ids[i]), float(scores[i])) for i in top]
+
+
+_indexes = None
+_indexes_lock = threading.Lock()
+
+
+def get_index_cache():
+    """Return the shared user_id -> WardrobeIndex cache, creating it on first use.
+
+    Least recently used indexes are dropped once WARDROBE_INDEX_CACHE_SIZE
+    users have one, and any index is rebuilt after WARDROBE_INDEX_CACHE_TTL.
+    """
+    global _indexes
+    if _indexes is None:
+        with _indexes_lock:
+            if _indexes is None:
+                _indexes = TTLCache(
+                    max_entries=current_app.config.get('WARDROBE_INDEX_CACHE_SIZE', 256),
+                    ttl=current_app.config.get('WARDROBE_INDEX_CACHE_TTL', 60 * 60)
+                )
+    return _indexes
+
+
+def _db_signature(user_id):
+    count, max_id = ClothingItem.query.with_entities(func.count(ClothingItem.id), func.max(ClothingItem.id))\
+        .filter_by(user_id=user_id).one()
+    return count, max_id
+
+
+def get_index(user_id):
+    """Return the user's index, (re)building it if it is out of sync with the database.
+
+    Uploads handled by another worker process won't have updated this
+    process's copy, so the item count and highest id are compared first.
+    """
+    index = get_index_cache().get(user_id)
+    if index is not None and index.signature() == _db_signature(user_id):
+        return index
+
+    index = WardrobeIndex()
+    index.add(ClothingItem.query.filter_by(user_id=user_id).all())
+    get_index_cache().set(user_id, index)
+    logger.info(f"Built wardrobe index for user {user_id} with {len(index.ids)} items")
+    return index
+
+
+def add_items(user_id, items):
+    """Add newly stored ClothingItems to the user's index, if it has been built."""
+    index = get_index_cache().get(user_id)
+    if index is not None:
+        index.add(items)
+
+
+def remove_items(user_id, item_ids):
+    index = get_index_cache().get(user_id)
+    if index is not None:
+        index.remove(item_ids)
+
+
+def retrieve_items(user_id, query, k=20):
+    """Return the user's k ClothingItems most relevant to query, best first."""
+    results = get_index(user_id).search(query, k)
+    if not results:
+        return []
+    items_by_id = {
+        item.id: item
+        for item in ClothingItem.query.filter(ClothingItem.id.in_([item_id for item_id, _ in results])).all()
+    }
+    return [items_by_id[item_id] for item_id, _ in results if item_id in items_by_id]
+
+
+def score_items(user_id, query):
+    """Similarity of each of the user's items to query, as {item_id: score}."""
+    index = get_index(user_id)
+    return dict(index.search(query, k=len(index.ids)))
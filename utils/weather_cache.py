@@ -0,0 +1,209 @@
+from concurrent.futures import Future
+import json
+import logging
+import sqlite3
+import threading
+import time
+
+logger = logging.getLogger(__name__)
+
+
+def weather_cache_key(latitude=None, longitude=None, city=None):
+    """Normalize a location so equivalent lookups share one cache entry.
+
+    Coordinates are rounded to 2 decimals (~1 km); city names are lowercased
+    with whitespace collapsed.
+    """
+    if latitude and longitude:
+        return f"coord:{round(float(latitude), 2):.2f},{round(float(longitude), 2):.2f}"
+    if city:
+        return 'city:' + ' '.join(city.lower().split())
+    return 'city:dubai'
+
+
+class WeatherCache:
+    """Process-wide weather cache shared by every user and request.
+
+    - Entries younger than `ttl` seconds are served as-is.
+    - Entries younger than `stale_ttl` are served immediately while a
+      background refresh fetches a new value (stale-while-revalidate).
+    - Concurrent misses for the same key share a single upstream fetch.
+    - If `db_path` is set, entries are also stored in a SQLite file so other
+      worker processes can reuse them. It is read whenever the in-process
+      entry is missing or stale, and again before every fetch, so a value
+      another worker already refreshed is picked up instead of refetched.
+    """
+
+    def __init__(self, ttl=30 * 60, stale_ttl=3 * 60 * 60, max_entries=1024, db_path=None):
+        self.ttl = ttl
+        self.stale_ttl = max(stale_ttl, ttl)
+        self.max_entries = max_entries
+        self.db_path = db_path
+        self._entries = {}
+        self._inflight = {}
+        self._lock = threading.Lock()
+        self._db_ready = False
+        self.stats_counters = {
+            'hits': 0,
+            'stale_hits': 0,
+            'misses': 0,
+            'coalesced': 0,
+            'fetches': 0,
+            'fetch_errors': 0,
+            'refreshes': 0,
+        }
+
+    def _count(self, name):
+        with self._lock:
+            self.stats_counters[name] += 1
+
+    # Shared SQLite layer
+
+    def _connect(self):
+        conn = sqlite3.connect(self.db_path, timeout=5)
+        if not self._db_ready:
+            conn.execute('PRAGMA journal_mode=WAL')
+            conn.execute(
+                'CREATE TABLE IF NOT EXISTS weather_cache '
+                '(key TEXT PRIMARY KEY, data TEXT NOT NULL, fetched_at REAL NOT NULL)'
+            )
+            conn.commit()
+            self._db_ready = True
+        return conn
+
+    def _db_get(self, key):
+        if not self.db_path:
+            return None
+        try:
+            conn = self._connect()
+            try:
+                row = conn.execute('SELECT data, fetched_at FROM weather_cache WHERE key = ?', (key,)).fetchone()
+            finally:
+                conn.close()
+            return (json.loads(row[0]), row[1]) if row else None
+        except Exception as e:
+            logger.error(f"Error reading weather cache db: {str(e)}")
+            return None
+
+    def _db_set(self, key, value, fetched_at):
+        if not self.db_path:
+            return
+        try:
+            conn = self._connect()
+            try:
+                conn.execute(
+                    'INSERT OR REPLACE INTO weather_cache (key, data, fetched_at) VALUES (?, ?, ?)',
+                    (key, json.dumps(value), fetched_at)
+                )
+                conn.commit()
+            finally:
+                conn.close()
+        except Exception as e:
+            logger.error(f"Error writing weather cache db: {str(e)}")
+
+    # Cache operations
+
+    def _is_fresh(self, entry):
+        return entry is not None and time.time() - entry[1] <= self.ttl
+
+    def _lookup(self, key):
+        """The newest entry for key, reading the shared layer when the local one is missing or stale."""
+        with self._lock:
+            entry = self._entries.get(key)
+        if not self._is_fresh(entry):
+            shared = self._db_get(key)
+            if shared is not None and (entry is None or shared[1] > entry[1]):
+                self._store_local(key, *shared)
+                entry = shared
+        return entry
+
+    def _store_local(self, key, value, fetched_at):
+        with self._lock:
+            self._entries[key] = (value, fetched_at)
+            if len(self._entries) > self.max_entries:
+                # Drop the oldest entry
+                oldest = min(self._entries, key=lambda k: self._entries[k][1])
+                del self._entries[oldest]
+
+    def set(self, key, value):
+        fetched_at = time.time()
+        self._store_local(key, value, fetched_at)
+        self._db_set(key, value, fetched_at)
+
+    def peek(self, key):
+        """Return the cached value regardless of age, without fetching."""
+        entry = self._lookup(key)
+        return entry[0] if entry else None
+
+    def _fetch(self, key, fetch):
+        """Run fetch() once per key at a time; other callers wait for the same result."""
+        with self._lock:
+            future = self._inflight.get(key)
+            owner = future is None
+            if owner:
+                future = Future()
+                self._inflight[key] = future
+        if not owner:
+            self._count('coalesced')
+            return future.result()
+
+        try:
+            # Another worker may have refreshed the entry since it was looked up
+            shared = self._db_get(key)
+            if self._is_fresh(shared):
+                self._store_local(key, *shared)
+                future.set_result(shared[0])
+                return shared[0]
+            self._count('fetches')
+            value = fetch()
+            if value is None:
+                self._count('fetch_errors')
+            else:
+                self.set(key, value)
+            future.set_result(value)
+            return value
+        except Exception as e:
+            self._count('fetch_errors')
+            future.set_exception(e)
+            raise
+        finally:
+            with self._lock:
+                self._inflight.pop(key, None)
+
+    def _refresh_in_background(self, key, fetch):
+        with self._lock:
+            if key in self._inflight:
+                return
+        self._count('refreshes')
+
+        def run():
+            try:
+                self._fetch(key, fetch)
+            except Exception as e:
+                logger.error(f"Background weather refresh failed for {key}: {str(e)}")
+
+        threading.Thread(target=run, name=f'weather-refresh-{key}', daemon=True).start()
+
+    def get(self, key, fetch):
+        """Return the weather for key, calling fetch() only when needed."""
+        entry = self._lookup(key)
+        if entry is not None:
+            value, fetched_at = entry
+            age = time.time() - fetched_at
+            if age <= self.ttl:
+                self._count('hits')
+                return value
+            if age <= self.stale_ttl:
+                self._count('stale_hits')
+                self._refresh_in_background(key, fetch)
+                return value
+
+        self._count('misses')
+        return self._fetch(key, fetch)
+
+    def stats(self):
+        with self._lock:
+            stats = dict(self.stats_counters, entries=len(self._entries))
+        lookups = stats['hits'] + stats['stale_hits'] + stats['misses']
+        stats['hit_rate'] = (stats['hits'] + stats['stale_hits']) / lookups if lookups else 0.0
+        return stats
@@ -1,15 +1,143 @@
-import requests
 import os
+import threading
+import time
 from config import Config
+from utils.weather_cache import WeatherCache, weather_cache_key
+from utils.circuit_breaker import CircuitBreaker
+from utils import metrics, traffic_recorder
+
+# Shared by every user and request in this process (and across processes when
+# WEATHER_CACHE_DB is set)
+weather_cache = None
+
+# Stop hammering OpenWeatherMap while it is down; callers get the last known value
+weather_breaker = None
+
+# Settings of the app passed to init_app; Config's defaults until then. Kept
+# here rather than read from current_app because stale entries are
+# refreshed on background threads without an app context.
+_config = None
+_lock = threading.Lock()
+
+
+def init_app(app):
+    """Use app.config's weather settings, with a fresh cache, circuit breaker and HTTP session."""
+    global _config, _session
+    with _lock:
+        _config = app.config
+        _session = None
+        _build()
+
+
+def setting(name):
+    return _config[name] if _config is not None and name in _config else getattr(Config, name)
+
+
+def _build():
+    global weather_cache, weather_breaker
+    weather_cache = WeatherCache(
+        ttl=setting('WEATHER_CACHE_TTL'),
+        stale_ttl=setting('WEATHER_CACHE_STALE_TTL'),
+        db_path=setting('WEATHER_CACHE_DB')
+    )
+    weather_breaker = CircuitBreaker(
+        failure_threshold=setting('WEATHER_BREAKER_THRESHOLD'),
+        reset_timeout=setting('WEATHER_BREAKER_RESET')
+    )
+
+
+_build()
+
+# Cache hit rates, read from weather_cache.stats() when /metrics is scraped
+for _event in ('hits', 'stale_hits', 'misses', 'coalesced', 'fetches', 'fetch_errors', 'refreshes'):
+    metrics.counter(
+        'weather_cache_events_total',
+        'Weather cache lookups by result, and upstream fetches',
+        labels={'event': _event},
+        fn=lambda event=_event: weather_cache.stats()[event]
+    )
+metrics.gauge('weather_cache_hit_ratio', 'Share of weather lookups served from the cache',
+              fn=lambda: weather_cache.stats()['hit_rate'])
+metrics.gauge('weather_cache_entries', 'Locations held in the weather cache',
+              fn=lambda: weather_cache.stats()['entries'])
+
+# Circuit breaker state: 1 for the current state, 0 for the others
+for _state in (CircuitBreaker.CLOSED, CircuitBreaker.OPEN, CircuitBreaker.HALF_OPEN):
+    metrics.gauge(
+        'weather_circuit_breaker_state',
+        'Weather API circuit breaker state (1 = current)',
+        labels={'state': _state},
+        fn=lambda state=_state: int(weather_breaker.snapshot()['state'] == state)
+    )
+metrics.gauge('weather_circuit_breaker_failures', 'Consecutive failed weather API calls',
+              fn=lambda: weather_breaker.snapshot()['failures'])
+
+_session = None
+_session_lock = threading.Lock()
+
+def get_weather_session():
+    """Return the pooled keep-alive session used for weather API calls."""
+    global _session
+    if _session is None:
+        with _session_lock:
+            if _session is None:
+                # Imported on first use to keep app startup fast
+                import requests
+                from requests.adapters import HTTPAdapter
+                from urllib3.util.retry import Retry
+                session = requests.Session()
+                retry = Retry(
+                    total=setting('WEATHER_API_RETRIES'),
+                    backoff_factor=0.3,
+                    status_forcelist=(429, 500, 502, 503, 504),
+                    allowed_methods=frozenset(['GET']),
+                    respect_retry_after_header=True
+                )
+                adapter = HTTPAdapter(pool_connections=4, pool_maxsize=16, max_retries=retry)
+                session.mount('https://', adapter)
+                session.mount('http://', adapter)
+                _session = session
+    return _session
 
 def get_weather_data(latitude=None, longitude=None, city=None):
     """
     Get weather data for a specific location (returns Fahrenheit, mph, icon URL, and all important info)
+
+    Results are cached per normalized location, see utils.weather_cache. If
+    the API is failing, the last known value for the location is returned.
     """
+    key = weather_cache_key(latitude, longitude, city)
+    weather_data = weather_cache.get(key, lambda: fetch_weather_data(latitude, longitude, city))
+    if weather_data is None:
+        weather_data = weather_cache.peek(key)
+    return weather_data
+
+def get_location_weather(location):
+    """Weather for the location saved in a user's session, or None if there is none.
+
+    Sessions only keep the location; the weather itself comes from the
+    shared cache, keyed by location.
+    """
+    if not location:
+        return None
+    return get_weather_data(city=location)
+
+def fetch_weather_data(latitude=None, longitude=None, city=None):
+    """
+    Fetch weather data from OpenWeatherMap, bypassing the cache
+    """
+    from requests.exceptions import RequestException
+
+    if not weather_breaker.allow():
+        metrics.counter('weather_api_short_circuited_total', 'Weather calls skipped by the open circuit breaker').inc()
+        return None
+
+    start = time.perf_counter()
+    outcome = 'error'
     try:
         # Use OpenWeatherMap API
-        api_key = Config.WEATHER_API_KEY
-        base_url = "http://api.openweathermap.org/data/2.5/weather"
+        api_key = setting('WEATHER_API_KEY')
+        base_url = setting('WEATHER_API_URL')
 
         # Build query parameters
         params = {
@@ -33,7 +161,16 @@ def get_weather_data(latitude=None, longitude=None, city=None):
         #print(f"[DEBUG] Weather API params: {params}")
 
         # Make API request
-        response = requests.get(base_url, params=params)
+        response = get_weather_session().get(
+            base_url,
+            params=params,
+            timeout=(setting('WEATHER_CONNECT_TIMEOUT'), setting('WEATHER_READ_TIMEOUT'))
+        )
+        if response.status_code == 404:
+            # Unknown location: not an upstream failure
+            outcome = 'not_found'
+            weather_breaker.record_success()
+            return None
         response.raise_for_status()
         data = response.json()
         #print(f"[DEBUG] Raw weather API response: {data}")
@@ -44,17 +181,28 @@ def get_weather_data(latitude=None, longitude=None, city=None):
             'feels_like': round(data['main']['feels_like']),
             'condition': data['weather'][0]['main'].lower(),
             'description': data['weather'][0]['description'],
-            'icon': f"http://openweathermap.org/img/wn/{data['weather'][0]['icon']}@2x.png",
+            'icon': get_weather_icon_url(data['weather'][0]['icon']),
             'humidity': data['main']['humidity'],
             'wind_speed': round(data['wind']['speed']),  # Already in mph
         }
         #print(f"[DEBUG] Parsed weather data: {weather_data}")
 
+        outcome = 'success'
+        weather_breaker.record_success()
         return weather_data
 
-    except requests.exceptions.RequestException as e:
+    except (RequestException, KeyError, IndexError, ValueError) as e:
         print(f"Error fetching weather data: {str(e)}")
+        weather_breaker.record_failure()
         return None
+    finally:
+        elapsed = time.perf_counter() - start
+        metrics.histogram(
+            'weather_api_latency_seconds',
+            'OpenWeatherMap call latency',
+            labels={'outcome': outcome}
+        ).observe(elapsed)
+        traffic_recorder.record_upstream('weather', 'current_weather', elapsed, outcome)
 
 def get_weather_recommendations(weather_data):
     """
@@ -162,4 +310,4 @@ def get_weather_icon_url(icon_code):
     """
     Get the URL for a weather icon
     """
-    return f"http://openweathermap.org/img/wn/{icon_code}@2x.png" 
\ No newline at end of file
+    return f"https://openweathermap.org/img/wn/{icon_code}@2x.png" 
\ No newline at end of file